@@ -0,0 +1,176 @@
+"""
+Benchmark of the gRPC channel options on large result streams over a slow link
+
+    PYTHONPATH=. python benchmarks/bench_channel.py [rows] [megabytes_per_second]
+
+An in-process gRPC server answers ExecuteStreamingSql with the rows of the fake backend, and the calls go
+through a local proxy which limits the bandwidth from the server to the client, as a bastion link does,
+and counts the bytes. The server answers in the encoding of the request, as Spanner does.
+"""
+import base64
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+from google.auth.credentials import AnonymousCredentials
+from google.cloud.spanner_v1 import types
+from google.cloud.spanner_v1.streamed import StreamedResultSet
+from google.protobuf import struct_pb2
+
+from spannercli.channel import COMPRESSIONS, ChannelOptions
+from spannercli.config import EnvironmentVariables
+from spannercli.fake import FakeClient, type_code
+
+SCHEMA = [
+    "CREATE TABLE Singers (SingerId INT64 NOT NULL, FirstName STRING(1024), LastName STRING(1024),"
+    " Score FLOAT64, Info BYTES(MAX)) PRIMARY KEY (SingerId)",
+]
+SESSION = "projects/fake-project/instances/instance/databases/db/sessions/bench"
+SQL = "SELECT * FROM Singers"
+#: rows in a PartialResultSet
+CHUNK_ROWS = 1000
+
+
+def load(database, rows: int):
+    def insert(transaction):
+        for start in range(0, rows, 500):
+            values = ", ".join(f"({n}, 'first{n}', 'last{n % 97}', {n * 0.5}, X'{n:08x}')"
+                               for n in range(start, min(rows, start + 500)))
+            transaction.execute_update(f"INSERT INTO Singers (SingerId, FirstName, LastName, Score, Info)"
+                                       f" VALUES {values}")
+    database.run_in_transaction(insert)
+
+
+def encode(value, code: types.TypeCode):
+    if value is None:
+        return None
+    if code == types.TypeCode.INT64:
+        return str(value)
+    if code == types.TypeCode.BYTES:
+        return base64.b64encode(value).decode()
+    return value
+
+
+def partial_result_sets(database, sql: str):
+    names, rows = database.execute(sql)
+    codes = [type_code([r[i] for r in rows]) for i in range(len(names))]
+    metadata = types.ResultSetMetadata(row_type=types.StructType(fields=[
+        types.StructType.Field(name=n, type_=types.Type(code=c)) for n, c in zip(names, codes)]))
+    for start in range(0, max(1, len(rows)), CHUNK_ROWS):
+        values = struct_pb2.ListValue()
+        values.extend([encode(v, c) for row in rows[start:start + CHUNK_ROWS] for v, c in zip(row, codes)])
+        message = types.PartialResultSet.pb(types.PartialResultSet(metadata=metadata if start == 0 else None))
+        message.values.extend(values.values)
+        yield message
+
+
+def serve(database, compression: grpc.Compression) -> (grpc.Server, int):
+    # encoded once, the cost of the server is not measured
+    responses = {SQL: list(partial_result_sets(database, SQL))}
+
+    def execute_streaming_sql(request, context):  # pylint: disable=unused-argument
+        return iter(responses.get(request.sql) or partial_result_sets(database, request.sql))
+
+    handler = grpc.method_handlers_generic_handler("google.spanner.v1.Spanner", {
+        "ExecuteStreamingSql": grpc.unary_stream_rpc_method_handler(
+            execute_streaming_sql, request_deserializer=types.ExecuteSqlRequest.deserialize,
+            response_serializer=lambda message: message.SerializeToString()),
+    })
+    server = grpc.server(ThreadPoolExecutor(max_workers=8), handlers=[handler], compression=compression)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, port
+
+
+class Link(object):
+    """TCP proxy to the port, at `bandwidth` bytes per second from the server to the client"""
+
+    def __init__(self, port: int, bandwidth: float):
+        self.port = port
+        self.bandwidth = bandwidth
+        self.received = 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self._listener.getsockname()[1]}"
+
+    def accept(self):
+        while True:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            server = socket.create_connection(("127.0.0.1", self.port))
+            threading.Thread(target=self.pump, args=(client, server, False), daemon=True).start()
+            threading.Thread(target=self.pump, args=(server, client, True), daemon=True).start()
+
+    def pump(self, source: socket.socket, target: socket.socket, downstream: bool):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if downstream:
+                    with self._lock:
+                        self.received += len(data)
+                        self._next = max(self._next, time.monotonic()) + len(data) / self.bandwidth
+                        wait = self._next - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            target.close()
+            source.close()
+
+    def close(self):
+        self._listener.close()
+
+
+def read_all(api) -> int:
+    responses = api.execute_streaming_sql(request=types.ExecuteSqlRequest(session=SESSION, sql=SQL))
+    return sum(1 for _ in StreamedResultSet(iter(responses)))
+
+
+def bench(name: str, database, options: ChannelOptions, bandwidth: float, streams: int):
+    server, port = serve(database, COMPRESSIONS[options.compression])
+    link = Link(port, bandwidth)
+    os.environ[EnvironmentVariables.SPANNER_EMULATOR_HOST] = link.address
+    api = options.spanner_api(AnonymousCredentials())
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=streams) as executor:
+            rows = sum(executor.map(lambda _: read_all(api), range(streams)))
+        elapsed = time.perf_counter() - started
+    finally:
+        options.close()
+        link.close()
+        server.stop(None)
+    print(f"{name:<28} {elapsed * 1000:10.1f} ms {link.received / 1024 / 1024:8.1f} MiB received"
+          f" {rows / elapsed:12,.0f} rows/s")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    bandwidth = float(sys.argv[2]) * 1024 * 1024 if len(sys.argv) > 2 else 1024 * 1024
+    database = FakeClient().create_database("instance", "db", SCHEMA)
+    load(database, rows)
+    print(f"{rows:,} rows, {bandwidth / 1024 / 1024:g} MiB/s")
+    bench("default", database, ChannelOptions(), bandwidth, 1)
+    bench("compression gzip", database, ChannelOptions("gzip"), bandwidth, 1)
+    bench("4 streams, 1 channel", database, ChannelOptions(), bandwidth, 4)
+    bench("4 streams, 4 channels", database, ChannelOptions(channels=4), bandwidth, 4)
+    bench("4 streams, 4 channels, gzip", database, ChannelOptions("gzip", channels=4), bandwidth, 4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark of the cli end to end on the in-process fake backend
+
+    PYTHONPATH=. python benchmarks/bench_cli.py [rows] [rows_per_second]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from spannercli import config
+from spannercli.fake import FakeClient
+from spannercli.main import SpannerCli
+
+SCHEMA = [
+    "CREATE TABLE Singers (SingerId INT64 NOT NULL, FirstName STRING(1024), LastName STRING(1024),"
+    " Score FLOAT64, Info BYTES(MAX)) PRIMARY KEY (SingerId)",
+]
+
+
+@contextlib.contextmanager
+def pipe_input():
+    # create_pipe_input of older prompt_toolkit is not a context manager
+    inp = create_pipe_input()
+    if hasattr(inp, "__enter__"):
+        with inp as entered:
+            yield entered
+    else:
+        try:
+            yield inp
+        finally:
+            inp.close()
+
+
+def bench(name, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<24} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+def quiet(func, *args):
+    with open(os.devnull, "w", encoding="utf8") as devnull, contextlib.redirect_stdout(devnull):
+        return func(*args)
+
+
+def load(cli: SpannerCli, rows: int):
+    batch = 500
+    for start in range(0, rows, batch):
+        values = ", ".join(f"({n}, 'first{n}', 'last{n % 97}', {n * 0.5}, X'{n:08x}')"
+                           for n in range(start, min(rows, start + batch)))
+        cli.query(f"INSERT INTO Singers (SingerId, FirstName, LastName, Score, Info) VALUES {values}")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows_per_second = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    client = FakeClient(rows_per_second=rows_per_second)
+    client.create_database("instance", "db", SCHEMA)
+    with tempfile.TemporaryDirectory() as tmp, pipe_input() as inp:
+        os.environ[config.EnvironmentVariables.HISTORY_DB] = os.path.join(tmp, "history.sqlite3")
+        os.environ[config.EnvironmentVariables.HISTORY_FILE] = os.path.join(tmp, "history")
+        cli = SpannerCli(project=client.project, instance="instance", database="db", inp=inp, output=DummyOutput(),
+                         client=client)
+        bench(f"insert {rows:,} rows", load, cli, rows)
+        sql = "SELECT * FROM Singers"
+        result = bench("read_query all", cli.read_query, sql, None)
+        print(f"{len(result):,} rows")
+        bench("read_query first page", cli.read_query, sql)
+        cli.close_cursor()
+        bench("output table", quiet, cli.output, result)
+        result.meta["format"] = "tsv"
+        bench("output tsv", quiet, cli.output, result)
+        cli.connections.close()
+        cli.query_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark of the statement tokenizer on multi-megabyte scripts
+
+    PYTHONPATH=. python benchmarks/bench_queryutils.py [megabytes]
+"""
+import sys
+import time
+
+from spannercli import queryutils
+
+STATEMENTS = [
+    "SELECT s.SingerId, s.FirstName, a.AlbumTitle FROM Singers s JOIN Albums a ON s.SingerId = a.SingerId"
+    " WHERE s.LastName = 'O''Brien; -- not a comment' AND a.MarketingBudget > 1000.5",
+    "-- update the budget\nUPDATE Albums SET MarketingBudget = MarketingBudget * 2 WHERE SingerId IN (1, 2, 3)",
+    "/* bulk; insert */ INSERT INTO Singers (SingerId, FirstName, LastName) VALUES (1, \"Marc\", 'Richards')",
+    "WITH recent AS (SELECT SingerId FROM Albums WHERE ReleaseDate > DATE '2020-01-01')"
+    " DELETE FROM Singers WHERE SingerId IN (SELECT SingerId FROM recent)",
+    "@{USE_ADDITIONAL_PARALLELISM=TRUE} SELECT COUNT(*) FROM Singers@{FORCE_INDEX=SingersByLastName}",
+    "CREATE INDEX AlbumsByTitle ON Albums (AlbumTitle) STORING (MarketingBudget)",
+    "PARTITIONED DELETE FROM Performances WHERE Revenue IS NULL",
+    "SELECT '''multi\nline; string''', b'bytes', r'raw\\d' FROM Singers",
+]
+
+
+def script(megabytes: float) -> str:
+    size = int(megabytes * 1024 * 1024)
+    parts = []
+    length = 0
+    i = 0
+    while length < size:
+        s = STATEMENTS[i % len(STATEMENTS)] + (";\n" if i % 5 else "\\G\n")
+        parts.append(s)
+        length += len(s)
+        i += 1
+    return "".join(parts)
+
+
+def bench(name, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<24} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    text = script(megabytes)
+    print(f"script: {len(text) / 1024 / 1024:.1f} MiB")
+    tokens = bench("tokenize", lambda: sum(1 for _ in queryutils.tokenize(text)))
+    statements = bench("split", queryutils.split, text)
+    print(f"{tokens:,} tokens, {len(statements):,} statements")
+    bench("classify each", lambda: [queryutils.classify(s.text) for s in statements])
+    bench("fingerprint each", lambda: [queryutils.fingerprint(s.text) for s in statements])
+
+
+if __name__ == "__main__":
+    main()
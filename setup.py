@@ -18,7 +18,7 @@ setup(
             "spanner-cli=spannercli:main.main",
         ]
     },
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     setup_requires=[],
     include_package_data=True,
 )
@@ -0,0 +1,215 @@
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+variable = re.compile(r"\$(\w+)")
+
+#: size of each table, of the last hour
+TABLE_SIZES_SQL = "SELECT TABLE_NAME, USED_BYTES FROM SPANNER_SYS.TABLE_SIZES_STATS_1HOUR"\
+                  " WHERE INTERVAL_END = (SELECT MAX(INTERVAL_END) FROM SPANNER_SYS.TABLE_SIZES_STATS_1HOUR)"
+
+FULL_TABLE_SCAN = "Full table scan"
+FULL_INDEX_SCAN = "Full index scan"
+BACK_JOIN = "Back join"
+DISTRIBUTED_CROSS_APPLY = "Distributed cross apply"
+
+
+class PlanNode(object):
+    """google.cloud.spanner_v1.types.PlanNode, as plain values"""
+
+    def __init__(self, index: int, kind: str, name: str, metadata: dict, children: List, description: str = ""):
+        self.index = index
+        self.kind = kind
+        self.name = name
+        self.metadata = metadata
+        # list of (child index, link type, variable)
+        self.children = children
+        self.description = description
+
+    @classmethod
+    def from_proto(cls, node) -> "PlanNode":
+        description = ""
+        if node.short_representation:
+            description = node.short_representation.description
+        return cls(
+            index=node.index,
+            kind=node.kind.name,
+            name=node.display_name,
+            metadata=dict(node.metadata) if node.metadata else {},
+            children=[(c.child_index, c.type_, c.variable) for c in node.child_links],
+            description=description,
+        )
+
+    def is_scan(self) -> bool:
+        return self.kind == "RELATIONAL" and self.name == "Scan"
+
+    def is_full_scan(self) -> bool:
+        return self.is_scan() and str(self.metadata.get("Full scan", "")).lower() == "true"
+
+    @property
+    def scan_type(self) -> str:
+        return self.metadata.get("scan_type", "")
+
+    @property
+    def scan_target(self) -> str:
+        return self.metadata.get("scan_target", "")
+
+
+class Index(object):
+    def __init__(self, table: str, name: str, index_type: str):
+        self.table = table
+        self.name = name
+        self.index_type = index_type
+        self.columns: List[str] = []
+        self.storing: List[str] = []
+
+
+class Finding(object):
+    def __init__(self, kind: str, target: str, detail: str, suggestion: str = "", table: Optional[str] = None):
+        self.kind = kind
+        self.target = target
+        self.detail = detail
+        self.suggestion = suggestion
+        # base table of the target
+        self.table = table or target
+
+    def is_full_scan(self) -> bool:
+        return self.kind in (FULL_TABLE_SCAN, FULL_INDEX_SCAN)
+
+    def row(self) -> List[str]:
+        return [self.kind, self.target, self.detail, self.suggestion]
+
+
+def parse_plan(query_plan) -> List[PlanNode]:
+    return [PlanNode.from_proto(n) for n in query_plan.plan_nodes]
+
+
+def parse_indexes(rows) -> Dict[str, "OrderedDict[str, Index]"]:
+    """
+    :param rows: TABLE_NAME, INDEX_NAME, INDEX_TYPE, COLUMN_NAME, ORDINAL_POSITION, see `Schema.index_columns`
+    :return: table name to indexes (including PRIMARY_KEY) by name
+    """
+    tables = {}
+    for table, name, index_type, column, position in rows:
+        indexes = tables.setdefault(table, OrderedDict())
+        index = indexes.setdefault(name, Index(table, name, index_type))
+        if position is None:
+            index.storing.append(column)
+        else:
+            index.columns.append(column)
+    return tables
+
+
+def subtree(nodes: List[PlanNode], root: PlanNode) -> List[PlanNode]:
+    found = []
+    stack = [root]
+    while stack:
+        n = stack.pop()
+        found.append(n)
+        stack.extend(nodes[c[0]] for c in reversed(n.children))
+    return found
+
+
+def scalar_variables(nodes: List[PlanNode], node: PlanNode) -> Set[str]:
+    """columns referenced in the scalar children of the node, e.g. conditions of a filter"""
+    columns = set()
+    for child_index, _, _ in node.children:
+        child = nodes[child_index]
+        if child.kind == "SCALAR":
+            for n in subtree(nodes, child):
+                columns.update(variable.findall(n.description))
+    return columns
+
+
+def scanned_columns(scan: PlanNode) -> Set[str]:
+    """columns read by the scan"""
+    return {v for _, _, v in scan.children if v}
+
+
+def filter_columns(nodes: List[PlanNode], scan: PlanNode) -> Set[str]:
+    """columns in the filters applied to the scan"""
+    columns = set()
+    for n in nodes:
+        if "Filter" not in n.name:
+            continue
+        if scan in subtree(nodes, n):
+            columns.update(scalar_variables(nodes, n))
+    return columns
+
+
+def index_name(table: str, columns: List[str]) -> str:
+    return "IX_" + "_".join([table] + columns)
+
+
+def full_scan_finding(nodes: List[PlanNode], scan: PlanNode,
+                      indexes: Dict[str, "OrderedDict[str, Index]"], table: str) -> Finding:
+    table_indexes = indexes.get(table, OrderedDict())
+    keys = table_indexes["PRIMARY_KEY"].columns if "PRIMARY_KEY" in table_indexes else []
+    filtered = sorted(filter_columns(nodes, scan))
+    suggestion = ""
+    if filtered:
+        usable = [i for i in table_indexes.values()
+                  if i.index_type == "INDEX" and i.columns and i.columns[0] in filtered]
+        if usable:
+            suggestion = f"{table}@{{FORCE_INDEX={usable[0].name}}}"
+        else:
+            storing = sorted(scanned_columns(scan) - set(filtered) - set(keys))
+            suggestion = f"CREATE INDEX {index_name(table, filtered)} ON {table} ({', '.join(filtered)})"
+            if storing:
+                suggestion += f" STORING ({', '.join(storing)})"
+    kind = FULL_TABLE_SCAN if scan.scan_type == "TableScan" else FULL_INDEX_SCAN
+    detail = f"filtered by {', '.join(filtered)}" if filtered else "no filter on the scan"
+    return Finding(kind, scan.scan_target, detail, suggestion, table)
+
+
+def back_join_finding(nodes: List[PlanNode], index: Index, indexes: Dict[str, "OrderedDict[str, Index]"]) -> Finding:
+    """index scan joined back to the base table to read the columns not in the index"""
+    table = index.table
+    keys = indexes[table]["PRIMARY_KEY"].columns if "PRIMARY_KEY" in indexes[table] else []
+    missing = set()
+    for s in nodes:
+        if s.is_scan() and s.scan_type == "TableScan" and s.scan_target == table:
+            missing.update(scanned_columns(s))
+    missing = sorted(missing - set(index.columns) - set(index.storing) - set(keys))
+    suggestion = ""
+    if missing:
+        suggestion = f"add STORING ({', '.join(index.storing + missing)}) to {index.name}"
+    return Finding(BACK_JOIN, index.name, f"joined back to {table}", suggestion, table)
+
+
+def advise(nodes: List[PlanNode], indexes: Dict[str, "OrderedDict[str, Index]"]) -> List[Finding]:
+    """
+    :param nodes: the query plan
+    :param indexes: indexes of the database, from `parse_indexes`
+    :return: full scans, back joins and distributed cross applies in the plan
+    """
+    findings = []
+    index_tables = {i.name: i.table for t in indexes.values() for i in t.values()}
+    table_scans = {n.scan_target for n in nodes if n.is_scan() and n.scan_type == "TableScan"}
+
+    for n in nodes:
+        if n.is_full_scan():
+            findings.append(full_scan_finding(nodes, n, indexes, index_tables.get(n.scan_target, n.scan_target)))
+        elif n.is_scan() and n.scan_type == "IndexScan" and index_tables.get(n.scan_target) in table_scans:
+            findings.append(back_join_finding(nodes, indexes[index_tables[n.scan_target]][n.scan_target], indexes))
+
+    for n in nodes:
+        if n.name == "Distributed Cross Apply":
+            targets = [s.scan_target for s in subtree(nodes, n) if s.is_scan()]
+            findings.append(Finding(DISTRIBUTED_CROSS_APPLY, ", ".join(targets),
+                                    "remote calls for each batch of input rows"))
+    return findings
+
+
+def full_scan_tables(findings: List[Finding]) -> List[str]:
+    return list(OrderedDict.fromkeys(f.table for f in findings if f.is_full_scan()))
+
+
+def format_bytes(size: Optional[int]) -> str:
+    if size is None:
+        return "unknown size"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
@@ -0,0 +1,154 @@
+import datetime
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from spannercli.structures import ResultContainer
+
+timestamp_like = re.compile(r"^\d{4}-?\d{2}-?\d{2}")
+numeric_like = re.compile(r"^\d+$")
+
+#: epoch ranges of 2000-01-01 .. 2100-01-01 in seconds, milliseconds, microseconds and nanoseconds
+EPOCH_RANGES = [(946684800 * m, 4102444800 * m) for m in (1, 10 ** 3, 10 ** 6, 10 ** 9)]
+
+HISTOGRAM_BUCKETS = 16
+HISTOGRAM_BAR_WIDTH = 40
+
+
+def quote(name: str) -> str:
+    """quoted identifier, each part of the name of a table in a named schema is quoted"""
+    return ".".join(f"`{part}`" for part in name.split("."))
+
+
+def sample_sql(table: str, columns: List[str], rows: int) -> str:
+    """
+    :param table: table name of the schema model, e.g. "sales.Orders" in a named schema
+    :param columns: column names of the schema model
+    """
+    return f"SELECT {', '.join(quote(c) for c in columns)} FROM {quote(table)} TABLESAMPLE RESERVOIR ({rows} ROWS)"
+
+
+def estimate_distinct(values: List, total_rows: int) -> int:
+    """estimate the number of distinct values in the table from a uniform sample (Haas and Stokes, Duj1)"""
+    n = len(values)
+    if n == 0:
+        return 0
+    counts = Counter(values)
+    d = len(counts)
+    if total_rows <= n:
+        return d
+    f1 = len([c for c in counts.values() if c == 1])
+    q = n / total_rows
+    denominator = 1 - (1 - q) * f1 / n
+    if denominator <= 0:
+        return total_rows
+    return min(total_rows, int(round(d / denominator)))
+
+
+def detect_pattern(values: List, type_name: str, total_rows: int) -> Tuple[str, str]:
+    """classify the leading key
+
+    :return: risk (HIGH, MEDIUM, LOW), and the reason
+    """
+    present = [v for v in values if v is not None]
+    if not present:
+        return "LOW", "no sampled values"
+    if type_name in ("TIMESTAMP", "DATE"):
+        return "HIGH", f"{type_name} leading key, new rows are written to the end of the key space"
+    if type_name == "INT64":
+        return detect_int64_pattern(present, total_rows)
+    if type_name.startswith("STRING"):
+        return detect_string_pattern([str(v) for v in present])
+    return "LOW", f"{type_name} leading key"
+
+
+def detect_int64_pattern(present: List[int], total_rows: int) -> Tuple[str, str]:
+    low, high = min(present), max(present)
+    if any(start <= low and high <= end for start, end in EPOCH_RANGES):
+        return "HIGH", "timestamp-like INT64 (epoch) leading key"
+    span = high - low + 1
+    if low >= 0 and span <= max(total_rows, len(present)) * 2:
+        return "HIGH", f"sequential INT64 leading key, {span:,} wide range for {total_rows:,} rows"
+    return "LOW", "INT64 leading key is spread over the key space"
+
+
+def detect_string_pattern(strings: List[str]) -> Tuple[str, str]:
+    if all(timestamp_like.match(s) for s in strings):
+        return "HIGH", "timestamp-like STRING leading key"
+    if all(numeric_like.match(s) for s in strings) and len({len(s) for s in strings}) == 1:
+        return "HIGH", "zero-padded sequential number STRING leading key"
+    prefix, count = Counter(s[:4] for s in strings).most_common(1)[0]
+    if len(strings) >= 10 and count / len(strings) > 0.5:
+        return "MEDIUM", f"{count / len(strings):.0%} of the keys start with {prefix!r}"
+    return "LOW", "STRING leading key is spread over the key space"
+
+
+def bucket_label(value) -> str:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()[:10]
+    if isinstance(value, bytes):
+        return value[:2].decode("ascii", errors="replace")
+    return str(value)[:2]
+
+
+def histogram(values: List, type_name: str, buckets: int = HISTOGRAM_BUCKETS) -> List[Tuple[str, int]]:
+    """histogram of the leading key, by equal-width range for INT64, by prefix (or date) for the others"""
+    present = [v for v in values if v is not None]
+    counts = Counter()
+    if type_name == "INT64" and present:
+        low, high = min(present), max(present)
+        width = max(1, -(-(high - low + 1) // buckets))
+        for v in present:
+            counts[(v - low) // width] += 1
+        return [(f"[{low + b * width}, {low + (b + 1) * width})", counts[b]) for b in range(buckets)
+                if low + b * width <= high]
+    for v in present:
+        counts[bucket_label(v)] += 1
+    nulls = len(values) - len(present)
+    result = sorted(counts.items())
+    if len(result) > buckets:
+        # keep the largest buckets
+        result = sorted(sorted(result, key=lambda r: r[1], reverse=True)[:buckets])
+    if nulls:
+        result.insert(0, ("<null>", nulls))
+    return result
+
+
+def histogram_rows(hist: List[Tuple[str, int]], sampled: int) -> List[List]:
+    """rows of the histogram with the ratio to the sampled rows, and the bars scaled to the largest bucket"""
+    largest = max((c for _, c in hist), default=0)
+    return [[label, count, f"{count / sampled:.1%}",
+             "#" * (int(HISTOGRAM_BAR_WIDTH * count / largest) if largest else 0)] for label, count in hist]
+
+
+def analyze(table: str, key_columns: List[Tuple[str, str]], parent: Optional[str], rows: List,
+            total_rows: int) -> ResultContainer:
+    """
+    :param table: table name
+    :param key_columns: list of (column name, spanner type) of the primary key
+    :param parent: parent table name if interleaved
+    :param rows: sampled primary keys
+    :param total_rows: estimated number of rows
+    :return: histogram of the leading key, and findings as the message
+    """
+    leading, type_name = key_columns[0]
+    values = [r[0] for r in rows]
+    risk, reason = detect_pattern(values, type_name, total_rows)
+    cardinality = estimate_distinct(values, total_rows)
+
+    hist = histogram(values, type_name)
+
+    message = [
+        f"table: {table}" + (f" (interleaved in {parent})" if parent else ""),
+        f"primary key: {', '.join(f'{n} {t}' for n, t in key_columns)}",
+        f"estimated rows: {total_rows:,}, sampled: {len(values):,}",
+        f"estimated distinct {leading}: {cardinality:,}",
+        f"hotspot risk: {risk}, {reason}",
+    ]
+    if parent and hist:
+        # rows of each parent are stored together, skewed parents make hot splits
+        share = max(c for _, c in hist) / len(values)
+        if share > 0.5:
+            message.append(f"skewed: {share:.0%} of the sampled rows are in a single {leading} bucket")
+    return ResultContainer(data=histogram_rows(hist, len(values)), header=[f"{leading} bucket", "Rows", "Ratio", ""],
+                           message="\n".join(message))
@@ -0,0 +1,190 @@
+"""
+gRPC channels of the Spanner API with the options of the cli.
+
+The client library opens a channel with its own options for each database. When an option is changed,
+a SpannerClient on channels with the options is created once and shared by all the databases instead,
+on the endpoint of the client. Its streaming calls are cancelled at once when the job running them is cancelled,
+on the channel of the client library a job stops at the next row.
+"""
+import itertools
+import os
+from typing import List, Optional, Tuple
+
+import google.auth.credentials
+import grpc
+from google.api_core.gapic_v1 import client_info as gapic_client_info
+from google.cloud.spanner_v1.services.spanner import SpannerClient
+from google.cloud.spanner_v1.services.spanner.transports.grpc import SpannerGrpcTransport
+
+from spannercli import jobs
+from spannercli.config import Constants, EnvironmentVariables
+
+COMPRESSIONS = {"none": grpc.Compression.NoCompression, "gzip": grpc.Compression.Gzip}
+
+SPANNER_DATA_SCOPE = "https://www.googleapis.com/auth/spanner.data"
+
+
+def client_endpoint(client) -> Optional[str]:
+    """api_endpoint of the client_options of google.cloud.spanner.Client, None for the default endpoint"""
+    # the client library has no public accessor of its options
+    return getattr(getattr(client, "_client_options", None), "api_endpoint", None)
+
+
+class RoundRobin(object):
+    """multi-callable of the same method on each channel, a call goes to the next channel"""
+
+    def __init__(self, callables: List, counter: "itertools.count"):
+        self.callables = callables
+        self.counter = counter
+
+    def next(self):
+        return self.callables[next(self.counter) % len(self.callables)]
+
+    def __call__(self, *args, **kwargs):
+        return self.next()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # with_call and future of the unary calls
+        return getattr(self.next(), name)
+
+
+class ChannelPool(grpc.Channel):
+    """channels used in turn by the calls, to spread the streams over several connections.
+    Spanner sessions are not bound to a connection, so any call can go to any channel.
+    """
+
+    def __init__(self, channels: List[grpc.Channel]):
+        self.channels = channels
+        self._counter = itertools.count()
+
+    def _multi_callable(self, kind: str, *args, **kwargs) -> RoundRobin:
+        return RoundRobin([getattr(c, kind)(*args, **kwargs) for c in self.channels], self._counter)
+
+    def unary_unary(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        return self._multi_callable("unary_unary", *args, **kwargs)
+
+    def unary_stream(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        return self._multi_callable("unary_stream", *args, **kwargs)
+
+    def stream_unary(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        return self._multi_callable("stream_unary", *args, **kwargs)
+
+    def stream_stream(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        return self._multi_callable("stream_stream", *args, **kwargs)
+
+    def subscribe(self, callback, try_to_connect=False):
+        for c in self.channels:
+            c.subscribe(callback, try_to_connect)
+
+    def unsubscribe(self, callback):
+        for c in self.channels:
+            c.unsubscribe(callback)
+
+    def close(self):
+        for c in self.channels:
+            c.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+
+class CancelWithJob(grpc.UnaryStreamClientInterceptor):
+    """cancel the streaming calls with the job, a worker may be blocked reading the stream of a slow query"""
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        call = continuation(client_call_details, request)
+        unregister = jobs.on_cancel(call.cancel)
+        if not call.add_callback(unregister):
+            # already terminated
+            unregister()
+        return call
+
+
+class ChannelOptions(object):
+    """
+    :param compression: "gzip" to compress the messages of the calls, Spanner answers in the same encoding
+    :param max_receive_message_size: bytes of the largest message to receive, None for no limit
+    :param keepalive: seconds between the pings to keep an idle connection
+    :param channels: number of the channels, the calls are spread over them in turn
+    """
+
+    def __init__(self, compression: str = "none", max_receive_message_size: Optional[int] = None,
+                 keepalive: float = Constants.CHANNEL_KEEPALIVE, channels: int = 1):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression: {compression}, one of {', '.join(COMPRESSIONS)}")
+        if channels < 1 or keepalive <= 0:
+            raise ValueError("channels and keepalive must be positive")
+        self.compression = compression
+        self.max_receive_message_size = max_receive_message_size
+        self.keepalive = keepalive
+        self.channels = channels
+        self._spanner_api: Optional[SpannerClient] = None
+
+    def is_default(self) -> bool:
+        """the same as the channel of the client library"""
+        return self.compression == "none" and self.max_receive_message_size is None \
+            and self.keepalive == Constants.CHANNEL_KEEPALIVE and self.channels == 1
+
+    def grpc_options(self) -> List[Tuple[str, int]]:
+        return [
+            ("grpc.max_send_message_length", -1),
+            ("grpc.max_receive_message_length", self.max_receive_message_size or -1),
+            ("grpc.keepalive_time_ms", int(self.keepalive * 1000)),
+            # a connection for each channel, channels with the same options share one by default
+            ("grpc.use_local_subchannel_pool", 1),
+        ]
+
+    def create_channel(self, host: str, **kwargs) -> grpc.Channel:
+        """channel of SpannerGrpcTransport, the arguments are the same as SpannerGrpcTransport.create_channel"""
+        kwargs.update(options=self.grpc_options(), compression=COMPRESSIONS[self.compression])
+        emulator_host = os.environ.get(EnvironmentVariables.SPANNER_EMULATOR_HOST)
+        channels = [
+            grpc.insecure_channel(emulator_host, options=kwargs["options"], compression=kwargs["compression"])
+            if emulator_host else SpannerGrpcTransport.create_channel(host, **kwargs)
+            for _ in range(self.channels)
+        ]
+        return channels[0] if len(channels) == 1 else ChannelPool(channels)
+
+    def spanner_api(self, credentials=None,
+                    client_info: gapic_client_info.ClientInfo = gapic_client_info.DEFAULT_CLIENT_INFO,
+                    api_endpoint: Optional[str] = None) -> SpannerClient:
+        """the SpannerClient on the channels, created at the first call
+
+        :param api_endpoint: host of the Spanner API, e.g. a regional endpoint. the default endpoint if None
+        """
+        if self._spanner_api is None:
+            if os.environ.get(EnvironmentVariables.SPANNER_EMULATOR_HOST):
+                credentials = google.auth.credentials.AnonymousCredentials()
+            elif isinstance(credentials, google.auth.credentials.Scoped):
+                credentials = credentials.with_scopes((SPANNER_DATA_SCOPE,))
+            # older client libraries take only an instance of the channel, which has the credentials
+            host = api_endpoint or SpannerClient.DEFAULT_ENDPOINT
+            if ":" not in host:
+                host += ":443"
+            channel = grpc.intercept_channel(self.create_channel(host, credentials=credentials), CancelWithJob())
+            transport = SpannerGrpcTransport(channel=channel, client_info=client_info)
+            self._spanner_api = SpannerClient(transport=transport, client_info=client_info)
+        return self._spanner_api
+
+    def apply(self, database, credentials=None,
+              client_info: gapic_client_info.ClientInfo = gapic_client_info.DEFAULT_CLIENT_INFO,
+              api_endpoint: Optional[str] = None):
+        """use the channels for the google.cloud.spanner_v1.database.Database, nothing if the options are default
+
+        :param api_endpoint: see client_endpoint()
+        """
+        if self.is_default():
+            return
+        # the client library has no option for the channel of a database,
+        # Database.spanner_api creates a SpannerClient only when it is not set yet
+        # pylint: disable=protected-access
+        database._spanner_api = self.spanner_api(credentials, client_info, api_endpoint)
+
+    def close(self):
+        if self._spanner_api is not None:
+            self._spanner_api.transport.close()
+            self._spanner_api = None
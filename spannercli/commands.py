@@ -1,14 +1,30 @@
+# pylint: disable=too-many-lines
 from abc import ABCMeta, abstractmethod
 from collections import OrderedDict
 from typing import List, Optional
+import datetime
+import os
 import re
+import shlex
+import shutil
+import time
 import webbrowser
 
+import click
 from google.api_core import exceptions as api_exceptions
+from google.cloud.spanner_v1 import param_types
+from . import analyze, ddl, keyread, queryutils, spannersys, watch
 from .structures import ResultContainer
+from .table import full_text
 from .queryutils import clean, find_last_word
 
 
+HISTORY_SEARCH_LIMIT = 50
+TOP_LIMIT = 10
+TOP_INTERVAL = 5
+ANALYZE_SAMPLE_ROWS = 10000
+
+
 class CommandNotFound(Exception):
     pass
 
@@ -120,14 +136,19 @@ class ChangeDatabase(Command):
             raise CommandError(
                 "Invalid call to change database, try `use dbname`")
         dbname = clean(inputs[1])
+        exists = cli.connections.exists(dbname)
+        if exists is False:
+            raise CommandError(f"Database not found: {dbname}")
         current_id = cli.database.database_id
-        cli.change_database(dbname)
-
         try:
-            cli.query("SELECT 1")
+            cli.change_database(dbname)
+            if exists is None:
+                # could not list databases, e.g. permission denied
+                cli.wait_job(cli.jobs.submit("SELECT 1", lambda: cli.query("SELECT 1")))
         except api_exceptions.NotFound as e:
             # rollback to current if not found
             cli.change_database(current_id)
+            cli.connections.discard(dbname)
             raise CommandError(e) from e
 
         meta = dict(message="change database to {0}".format(dbname))
@@ -147,8 +168,7 @@ class ListTable(Command):
         return "\\lt", True
 
     def handler(self, cli, **kwargs) -> ResultContainer:
-        sql = "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_CATALOG='' AND TABLE_SCHEMA='';"
-        return cli.query(sql)
+        return ResultContainer(data=cli.schema().show_tables(), header=["TABLE_NAME"])
 
     def help_message(self) -> List[str]:
         return [self.command()[0], self.alias()[0], "List tables."]
@@ -168,10 +188,10 @@ class DescribeTable(Command):
         if len(query.split()) != 2:
             return ResultContainer(data=[], header=[], message="Missing table name.")
 
-        table = find_last_word(query)
-        sql = "SELECT COLUMN_NAME, SPANNER_TYPE, COLUMN_DEFAULT, IS_NULLABLE  FROM INFORMATION_SCHEMA.COLUMNS t"\
-              " WHERE t.TABLE_NAME = '{0}' ORDER BY ORDINAL_POSITION ASC;"
-        return cli.query(sql.format(table))
+        schema = cli.schema()
+        table = find_table(schema, query.split()[-1])
+        return ResultContainer(data=schema.describe(table),
+                               header=["COLUMN_NAME", "SPANNER_TYPE", "COLUMN_DEFAULT", "IS_NULLABLE"])
 
     def help_message(self) -> List[str]:
         return [self.command()[0], "\\dt[+], desc [table] ", "Describe table."]
@@ -205,23 +225,386 @@ class ShowIndexCommand(Command):
 
     def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
         query = clean(kwargs.get("text"))
-        table = find_last_word(query)
-        # https://cloud.google.com/spanner/docs/information-schema
-        sql = "SELECT c.TABLE_NAME, c.INDEX_NAME, c.INDEX_TYPE, c.COLUMN_NAME, c.SPANNER_TYPE, c.IS_NULLABLE,"\
-              " c.COLUMN_ORDERING, i.PARENT_TABLE_NAME, i.IS_UNIQUE, i.IS_NULL_FILTERED, i.INDEX_STATE"\
-              " FROM INFORMATION_SCHEMA.INDEX_COLUMNS c"\
-              " LEFT JOIN INFORMATION_SCHEMA.INDEXES i ON c.TABLE_NAME = i.TABLE_NAME AND i.INDEX_NAME = c.INDEX_NAME"\
-              " WHERE c.TABLE_SCHEMA='' AND c.TABLE_SCHEMA=''"
-
-        if table.upper() != "INDEX":
-            sql = sql + " AND c.TABLE_NAME='{0}' AND i.TABLE_NAME = '{0}'"
-        sql = sql + " ORDER BY c.TABLE_NAME, c.INDEX_NAME ASC, c.ORDINAL_POSITION ASC;"
-        return cli.query(sql.format(table))
+        table = query.split()[-1]
+        schema = cli.schema()
+        # same columns as INFORMATION_SCHEMA.INDEX_COLUMNS joined with INDEXES
+        header = ["TABLE_NAME", "INDEX_NAME", "INDEX_TYPE", "COLUMN_NAME", "SPANNER_TYPE", "IS_NULLABLE",
+                  "COLUMN_ORDERING", "PARENT_TABLE_NAME", "IS_UNIQUE", "IS_NULL_FILTERED", "INDEX_STATE"]
+        if table.upper() == "INDEX":
+            return ResultContainer(data=schema.show_index(states=cli.index_states()), header=header)
+        return ResultContainer(data=schema.show_index(find_table(schema, table), cli.index_states()), header=header)
 
     def help_message(self) -> List[str]:
         return [self.command()[0], "", "Show Index (from Table)."]
 
 
+class ShowCreateTableCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "SHOW CREATE TABLE", False
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        # not available
+        return None, False
+
+    def handler(self, cli, **kwargs) -> ResultContainer:
+        query = clean(kwargs.get("text"))
+        if len(query.split()) != 4:
+            raise CommandError("Missing table name, try `SHOW CREATE TABLE table`")
+        schema = cli.schema()
+        table = find_table(schema, query.split()[-1])
+        return ResultContainer(data=[], header=[], message=schema.show_create_table(table))
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "SHOW CREATE TABLE table", "Show DDL of the table and its indexes."]
+
+
+class TreeCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\tree", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> ResultContainer:
+        lines = cli.schema().interleave_tree()
+        return ResultContainer(data=[], header=[], message="\n".join(lines) if lines else "No tables.")
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "", "Show tables as the tree of interleaving."]
+
+
+class TopQueriesCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "SHOW TOP QUERIES", False
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        # not available
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        order = find_last_word(clean(kwargs.get("text"))).upper()
+        if order not in spannersys.QUERY_ORDERS:
+            order = "CPU"
+        sql = spannersys.top_queries_sql(order, limit=str(TOP_LIMIT))
+        return cli.wait_job(cli.jobs.submit(kwargs.get("text"), lambda: cli.query(sql)))
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "[BY CPU|LATENCY|ROWS]", "Show top queries of the last minute."]
+
+
+class TopTransactionsCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "SHOW TOP TRANSACTIONS", False
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        # not available
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        sql = spannersys.top_transactions_sql(limit=str(TOP_LIMIT))
+        return cli.wait_job(cli.jobs.submit(kwargs.get("text"), lambda: cli.query(sql)))
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "", "Show top transactions by aborts of the last minute."]
+
+
+class TopLocksCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "SHOW TOP LOCKS", False
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        # not available
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        sql = spannersys.top_locks_sql(limit=str(TOP_LIMIT))
+        return cli.wait_job(cli.jobs.submit(kwargs.get("text"), lambda: cli.query(sql)))
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "", "Show the hottest lock keys of the last minute."]
+
+
+class TopCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\top", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> None:
+        interval = TOP_INTERVAL
+        order = "CPU"
+        for arg in clean(kwargs.get("text")).split()[1:]:
+            if arg.isdigit() and int(arg) > 0:
+                interval = int(arg)
+            elif arg.upper() in spannersys.QUERY_ORDERS:
+                order = arg.upper()
+            else:
+                raise CommandError("Invalid call to top, try `\\top [seconds] [CPU|LATENCY|ROWS]`")
+
+        # the same statement with the same parameter for every refresh, to reuse the query plan
+        sql, panels = spannersys.dashboard_sql(order)
+        params = {"limit": TOP_LIMIT}
+        types = {"limit": param_types.INT64}
+        try:
+            while True:
+                started = time.monotonic()
+                with cli.database.snapshot() as snapshot:
+                    row = list(snapshot.execute_sql(sql, params=params, param_types=types,
+                                                    request_options=cli.request_options()))[0]
+                elapsed = time.monotonic() - started
+                header = "{now} {database}, every {interval}s, refreshed in {elapsed:.0f} msecs." \
+                         " Ctrl-C to quit.".format(now=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                                   database=cli.database.database_id, interval=interval,
+                                                   elapsed=elapsed * 1000)
+                # move to home and clear the screen, then redraw
+                click.echo("\033[H\033[J" + "\n".join([header] + self.panel_lines(cli.renderer, panels, row)))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    @staticmethod
+    def panel_lines(renderer, panels: List, row: List) -> List[str]:
+        """
+        :param panels: list of (title, columns) of spannersys.dashboard_sql
+        :param row: the row of the dashboard query, rows of each panel
+        """
+        lines = []
+        for (title, columns), rows in zip(panels, row):
+            lines.extend(["", title])
+            if rows:
+                lines.extend(renderer.render(rows, columns))
+            else:
+                lines.append("(no data)")
+        return lines
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\top [seconds] [CPU|LATENCY|ROWS]",
+                "Refresh top queries, transactions and locks."]
+
+
+class WatchCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\watch", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> None:
+        inputs = clean(kwargs.get("text")).split(maxsplit=2)
+        try:
+            interval = float(inputs[1])
+        except (IndexError, ValueError):
+            interval = 0
+        if len(inputs) != 3 or interval <= 0:
+            raise CommandError("Invalid call to watch, try `\\watch seconds SELECT ...`")
+        sql = inputs[2]
+        if queryutils.classify(sql, is_command) != queryutils.QUERY:
+            raise CommandError("\\watch runs a read query only")
+        runner = watch.Watch(cli.database, sql, interval, cli.renderer.max_width,
+                             lambda: shutil.get_terminal_size().lines, cli.request_options())
+        try:
+            runner.run(lambda out: click.echo(out, nl=False))
+        except KeyboardInterrupt:
+            pass
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\watch seconds sql", "Rerun a query, redrawing the changed cells."]
+
+
+class AnalyzeCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\analyze", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        inputs = clean(kwargs.get("text")).split()
+        if len(inputs) != 2:
+            raise CommandError("Invalid call to analyze, try `\\analyze table`")
+        table_name = inputs[1]
+        # the reservoir sample scans the table, Ctrl-C cancels it
+        return cli.wait_job(cli.jobs.submit(kwargs.get("text"), lambda: self.analyze(cli, table_name)))
+
+    @staticmethod
+    def analyze(cli, table_name: str) -> ResultContainer:
+        table = find_table(cli.schema(), table_name)
+        if table.view:
+            raise CommandError(f"{table.name} is a view, only tables can be analyzed")
+        key_columns = [(c, table.columns[c].spanner_type) for c, _ in table.primary_key]
+        # the reservoir sample reads all rows, so rows_scanned is the number of rows in the table
+        sample = cli.read_query(analyze.sample_sql(table.name, [c for c, _ in key_columns], ANALYZE_SAMPLE_ROWS),
+                                page_size=None)
+        total_rows = sample.meta.get('query_stats', {}).get('rows_scanned', len(sample))
+        return analyze.analyze(table.name, key_columns, table.parent, list(sample.data), total_rows)
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\analyze table", "Show key distribution and hotspot risk (scans the table)."]
+
+
+class AdviseCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\advise", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        inputs = kwargs.get("text").strip().split(maxsplit=1)
+        if len(inputs) != 2:
+            raise CommandError("Missing query, try `\\advise SELECT ...`")
+        if queryutils.classify(inputs[1], is_command) != queryutils.QUERY:
+            raise CommandError("Only queries can be advised.")
+        findings = cli.wait_job(cli.jobs.submit(kwargs.get("text"), lambda: cli.advise(inputs[1])))
+        if findings is None:
+            # cancelled
+            return None
+        message = f"{len(findings)} findings." if findings else "No full scans or back joins found in the plan."
+        return ResultContainer(data=[f.row() for f in findings], header=["Finding", "Target", "Detail", "Suggestion"],
+                               message=message)
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\advise sql", "Find full scans and back joins in the plan, suggest indexes."]
+
+
+class SetCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\set", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> ResultContainer:
+        inputs = clean(kwargs.get("text")).split(maxsplit=2)
+        header = ["Name", "Value", "Description"]
+        rows = cli.settings.rows()
+        if len(inputs) == 1:
+            return ResultContainer(data=rows, header=header)
+        key = inputs[1].lower()
+        if len(inputs) == 3:
+            try:
+                cli.settings.set(key, inputs[2])
+            except KeyError as e:
+                raise CommandError(f"Unknown setting: {key}") from e
+            except ValueError as e:
+                raise CommandError(f"Invalid value for {key}: {e}") from e
+            rows = cli.settings.rows()
+        data = [r for r in rows if r[0] == key]
+        if not data:
+            raise CommandError(f"Unknown setting: {key}")
+        return ResultContainer(data=data, header=header)
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\set [name [value]]", "Show or change settings."]
+
+
+class DdlCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\ddl", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        inputs = clean(kwargs.get("text")).split()
+        if len(inputs) != 2 or inputs[1].lower() not in ("begin", "apply", "show", "abort"):
+            raise CommandError("Invalid call to ddl, try `\\ddl begin|apply|show|abort`")
+        action = inputs[1].lower()
+        if action == "begin":
+            if cli.ddl_batch is not None:
+                raise CommandError("Already in a DDL batch, try `\\ddl apply` or `\\ddl abort`")
+            cli.ddl_batch = ddl.DdlBatch(cli.database.database_id)
+            cli.prompt_message = cli.get_prompt_message()
+            return ResultContainer(data=[], header=[],
+                                   message="DDL statements are buffered until `\\ddl apply`.")
+        batch = cli.ddl_batch
+        if batch is None:
+            raise CommandError("Not in a DDL batch, try `\\ddl begin`")
+        if action == "show":
+            return ResultContainer(data=[[i + 1, s] for i, s in enumerate(batch.statements)], header=["#", "Statement"])
+        if action == "apply" and batch.database_id != cli.database.database_id:
+            raise CommandError(f"The batch is for {batch.database_id}, try `use {batch.database_id}`")
+        cli.ddl_batch = None
+        cli.prompt_message = cli.get_prompt_message()
+        if action == "abort":
+            return ResultContainer(data=[], header=[], message=f"{len(batch.statements)} statements discarded.")
+        if not batch.statements:
+            return ResultContainer(data=[], header=[], message="Nothing to apply.")
+        statements = batch.statements
+        return cli.wait_job(cli.jobs.submit("\\ddl apply", lambda: cli.update_ddl(statements)))
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\ddl begin|apply|show|abort", "Buffer DDL and apply as a single schema change."]
+
+
+class OperationsCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\ops", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> ResultContainer:
+        inputs = clean(kwargs.get("text")).split()
+        if len(inputs) == 1:
+            data = []
+            for op in cli.operations.list():
+                percent = op.percent()
+                data.append([
+                    op.op_id,
+                    op.status(),
+                    None if percent is None else f"{percent}%",
+                    op.started.strftime("%Y-%m-%d %H:%M:%S"),
+                    f"{op.elapsed():.0f}s",
+                    op.database_id,
+                    op.statement(),
+                ])
+            return ResultContainer(data=data,
+                                   header=["ID", "Status", "Progress", "Started", "Elapsed", "Database", "Statement"])
+        usage = "Invalid call to ops, try `\\ops [ID]` or `\\ops cancel ID`"
+        if len(inputs) > 3 or not inputs[-1].isdigit() or (len(inputs) == 3 and inputs[1].lower() != "cancel"):
+            raise CommandError(usage)
+        op = cli.operations.get(int(inputs[-1]))
+        if op is None:
+            raise CommandError("No such operation.")
+        if len(inputs) == 3:
+            if op.done:
+                raise CommandError(f"Operation [{op.op_id}] is already {op.status()}.")
+            op.cancel()
+            return ResultContainer(data=[], header=[], message=f"Cancelling operation [{op.op_id}].")
+        data = [[s, None if p is None else f"{p}%", "committed" if c else None] for s, p, c in op.progress()]
+        message = f"operation {op.summary()}"
+        return ResultContainer(data=data, header=["Statement", "Progress", "Status"], message=message)
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\ops [ID], \\ops cancel ID", "Show or cancel schema changes in background."]
+
+
 class ListDatabaseCommand(Command):
     @classmethod
     def command(cls) -> (str, bool):
@@ -242,6 +625,297 @@ class ListDatabaseCommand(Command):
         return [self.command()[0], self.alias()[0], "List databases in current instance."]
 
 
+class NextPageCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\next", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return "\\more", True
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        inputs = clean(kwargs.get("text")).split()
+        size = None
+        if len(inputs) == 2:
+            if not inputs[1].isdigit() or int(inputs[1]) == 0:
+                raise CommandError("Invalid number of rows, try `\\next 100`")
+            size = int(inputs[1])
+        elif len(inputs) > 2:
+            raise CommandError("Invalid call to fetch rows, try `\\more` or `\\next N`")
+        cursor = cli.cursor
+        if cursor is None:
+            raise CommandError("No more rows to fetch.")
+        return cli.wait_job(cli.jobs.submit(kwargs.get("text"), lambda: cli.fetch_page(cursor, size)))
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\more, \\next [N]", "Fetch next rows of the last query."]
+
+
+class CellCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\cell", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> ResultContainer:
+        inputs = clean(kwargs.get("text")).split()
+        if len(inputs) != 3 or not inputs[1].isdigit():
+            raise CommandError("Invalid call to cell, try `\\cell row column`")
+        result = cli.last_result
+        if result is None:
+            raise CommandError("No result to show.")
+        row = int(inputs[1])
+        if not 1 <= row <= len(result):
+            raise CommandError(f"Row out of range: {row}, the last result has {len(result):,} rows")
+        column = inputs[2]
+        if column.isdigit() and 1 <= int(column) <= len(result.header):
+            index = int(column) - 1
+        else:
+            names = [h.lower() for h in result.header]
+            if column.strip("`").lower() not in names:
+                raise CommandError(f"Column not found: {column}")
+            index = names.index(column.strip("`").lower())
+        value = result.data[row - 1][index]
+        text = full_text(value, result.meta["types"][index])
+        return ResultContainer(data=[[text]], header=[result.header[index]], format="vertical",
+                               message=f"row {row}, {len(text):,} characters")
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\cell row column", "Show a whole cell of the last result."]
+
+
+def split_index(args: List[str]) -> (List[str], Optional[str]):
+    """remove the trailing `USING INDEX idx` from the arguments"""
+    if len(args) >= 3 and [a.upper() for a in args[-3:-1]] == ["USING", "INDEX"]:
+        return args[:-3], args[-1]
+    return args, None
+
+
+class GetCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\get", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        try:
+            args, index = split_index(shlex.split(kwargs.get("text").strip())[1:])
+        except ValueError as e:
+            raise CommandError(e) from e
+        if len(args) < 2:
+            raise CommandError("Missing key, try `\\get table key... [USING INDEX idx]`")
+        try:
+            return cli.wait_job(cli.jobs.submit(kwargs.get("text"), lambda: cli.read_keys(args[0], [args[1:]], index)))
+        except ValueError as e:
+            raise CommandError(e) from e
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\get table key... [USING INDEX idx]",
+                "Read rows by the (leading) key columns with the Read API."]
+
+
+class LookupCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\lookup", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        try:
+            args, index = split_index(shlex.split(kwargs.get("text").strip())[1:])
+        except ValueError as e:
+            raise CommandError(e) from e
+        if len(args) != 2:
+            raise CommandError("Invalid call to lookup, try `\\lookup table file [USING INDEX idx]`")
+        path = os.path.expanduser(args[1])
+        if not os.path.isfile(path):
+            raise CommandError(f"File not found: {args[1]}")
+        try:
+            return cli.wait_job(cli.jobs.submit(kwargs.get("text"),
+                                                lambda: cli.read_keys(args[0], keyread.read_key_file(path), index)))
+        except ValueError as e:
+            raise CommandError(e) from e
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\lookup table file [USING INDEX idx]",
+                "Read rows of the keys in the file (a key per line, comma separated columns)."]
+
+
+class DiffCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\diff", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        inputs = kwargs.get("text").strip().split()
+        if len(inputs) != 3:
+            raise CommandError("Invalid call to diff, try `\\diff table database[.table]`")
+        try:
+            return cli.wait_job(cli.jobs.submit(kwargs.get("text"), lambda: cli.diff_table(inputs[1], inputs[2])))
+        except ValueError as e:
+            raise CommandError(e) from e
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\diff table database[.table]",
+                "Compare the rows of the table with another database or table."]
+
+
+class FanoutCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\fanout", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        inputs = kwargs.get("text").strip().split(maxsplit=1)
+        if len(inputs) != 2:
+            raise CommandError("Missing query, try `\\fanout [-d glob] SELECT ...`")
+        sql = inputs[1]
+        pattern = None
+        if sql.startswith("-d "):
+            options = sql.split(maxsplit=2)
+            if len(options) != 3:
+                raise CommandError("Missing query, try `\\fanout [-d glob] SELECT ...`")
+            pattern, sql = options[1], options[2]
+        try:
+            return cli.wait_job(cli.jobs.submit(kwargs.get("text"), lambda: cli.fanout_query(sql, pattern)))
+        except ValueError as e:
+            raise CommandError(e) from e
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\fanout [-d glob] sql", "Run a query on all databases."]
+
+
+class BackgroundCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\bg", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> ResultContainer:
+        inputs = kwargs.get("text").strip().split(maxsplit=1)
+        if len(inputs) != 2:
+            raise CommandError("Missing query, try `\\bg SELECT ...`")
+        sql = inputs[1]
+        job = cli.jobs.submit(sql, lambda: cli.query(sql, page_size=None), background=True)
+        return ResultContainer(data=[], header=[], message=f"[{job.job_id}] started.")
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\bg sql", "Run a query in background."]
+
+
+class JobsCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\jobs", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> ResultContainer:
+        data = []
+        for job in cli.jobs.list():
+            data.append([job.job_id, job.status(), f"{job.rows:,}", f"{job.elapsed():.1f}s", job.sql])
+        return ResultContainer(data=data, header=["Job", "Status", "Rows", "Elapsed", "Query"])
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "", "List background queries."]
+
+
+class ForegroundCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\fg", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> Optional[ResultContainer]:
+        inputs = clean(kwargs.get("text")).split()
+        job_id = None
+        if len(inputs) == 2:
+            if not inputs[1].isdigit():
+                raise CommandError("Invalid job id, try `\\fg 1`")
+            job_id = int(inputs[1])
+        elif len(inputs) > 2:
+            raise CommandError("Invalid call to foreground, try `\\fg [job]`")
+        job = cli.jobs.get(job_id)
+        if job is None:
+            raise CommandError("No such job.")
+        return cli.wait_job(job)
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\fg [job]", "Wait for a background query and show the result."]
+
+
+class HistoryCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\history", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> ResultContainer:
+        inputs = kwargs.get("text").strip().split(maxsplit=1)
+        prefix = inputs[1] if len(inputs) == 2 else ""
+        search = getattr(cli.history, "search", None)
+        if search is None:
+            raise CommandError("History search is not available.")
+        data = []
+        for text, created, database, duration, rows in search(prefix, limit=HISTORY_SEARCH_LIMIT):
+            data.append([
+                datetime.datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S"),
+                database,
+                None if duration is None else f"{duration:.3f}s",
+                rows,
+                text,
+            ])
+        return ResultContainer(data=data, header=["Time", "Database", "Duration", "Rows", "Query"])
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "\\history [prefix]", "Search query history."]
+
+
+class StatsCommand(Command):
+    @classmethod
+    def command(cls) -> (str, bool):
+        return "\\stats", True
+
+    @classmethod
+    def alias(cls) -> (str, bool):
+        return None, False
+
+    def handler(self, cli, **kwargs) -> ResultContainer:
+        return cli.query_log.stats()
+
+    def help_message(self) -> List[str]:
+        return [self.command()[0], "", "Show latency summary of queries in this session."]
+
+
 class BrowserCommand(Command):
     @classmethod
     def command(cls) -> (str, bool):
@@ -272,7 +946,30 @@ for cmd in (
         DescribeTable(),
         DescTable(),
         ShowIndexCommand(),
+        ShowCreateTableCommand(),
+        TreeCommand(),
+        TopQueriesCommand(),
+        TopTransactionsCommand(),
+        TopLocksCommand(),
+        TopCommand(),
+        WatchCommand(),
+        AnalyzeCommand(),
+        AdviseCommand(),
+        DdlCommand(),
+        OperationsCommand(),
         ListDatabaseCommand(),
+        NextPageCommand(),
+        CellCommand(),
+        GetCommand(),
+        LookupCommand(),
+        DiffCommand(),
+        FanoutCommand(),
+        BackgroundCommand(),
+        JobsCommand(),
+        ForegroundCommand(),
+        HistoryCommand(),
+        StatsCommand(),
+        SetCommand(),
         BrowserCommand(),
         HelpCommand(),
         QuitCommand()):
@@ -286,6 +983,17 @@ for cmd in (
         commands[name] = cmd
 
 
+def find_table(schema, table_name: str):
+    """
+    :param schema: spannercli.schema.Schema
+    :return: the table or view in the schema
+    """
+    table = schema.table(table_name.replace("`", ""))
+    if table is None:
+        raise CommandError(f"Table not found: {table_name}")
+    return table
+
+
 def execute(cli, text: str) -> ResultContainer:
     """
 
@@ -338,7 +1046,8 @@ def find_command(key: str) -> Optional[Command]:
 
 
 def startswith(key: str) -> Optional[Command]:
-    _names = list(commands.keys())
+    # the longest name, e.g. \lookup rather than \l
+    _names = sorted(commands.keys(), key=len, reverse=True)
     for n in _names:
         if key.startswith(n):
             return commands.get(n)
@@ -347,3 +1056,19 @@ def startswith(key: str) -> Optional[Command]:
 
 def keys() -> List[str]:
     return list(commands.keys())
+
+
+#: leading words of the client commands, to tell a statement is not a command without searching them
+_leading_words = frozenset(k.split()[0].lower() for k in commands)
+
+
+def is_command(text: str) -> bool:
+    """the text is a client command, see queryutils.classify"""
+    words = text.split(maxsplit=1)
+    if not words or words[0].lower() not in _leading_words:
+        return False
+    try:
+        find(text)
+    except CommandNotFound:
+        return False
+    return True
@@ -1,9 +1,10 @@
-from typing import Iterable, List
+from collections import OrderedDict
+from typing import Dict, Iterable, List
 
 from prompt_toolkit.completion import Completer, Completion
 
-from spannercli.lexer import syntax, keywords, functions, datatypes, ddl
-from spannercli import queryutils, commands
+from spannercli.lexer import syntax, keywords, functions, datatypes, ddl as ddl_keywords
+from spannercli import ddl, queryutils, commands
 
 
 class SQLCompleter(Completer):
@@ -11,6 +12,10 @@ class SQLCompleter(Completer):
     tables: List[str] = []
     columns: List[str] = []
 
+    def __init__(self):
+        # table name to its column names
+        self.catalog: Dict[str, List[str]] = OrderedDict()
+
     def set_databases(self, databases: List[str]):
         self.databases = databases
 
@@ -20,15 +25,66 @@ class SQLCompleter(Completer):
     def set_columns(self, columns: List[str]):
         self.columns = columns
 
+    def set_catalog(self, catalog: Dict[str, List[str]]):
+        self.catalog = OrderedDict(catalog)
+        self._rebuild()
+
+    def set_table(self, table: str, columns: List[str]):
+        """add or replace the table"""
+        self.catalog[table] = list(columns)
+        self._rebuild()
+
+    def drop_table(self, table: str):
+        self.catalog.pop(table, None)
+        self._rebuild()
+
+    def rename_table(self, table: str, new_name: str):
+        self.catalog[new_name] = self.catalog.pop(table, [])
+        self._rebuild()
+
+    def add_columns(self, table: str, columns: List[str]):
+        existing = self.catalog.setdefault(table, [])
+        existing.extend(c for c in columns if c not in existing)
+        self._rebuild()
+
+    def drop_columns(self, table: str, columns: List[str]):
+        if table in self.catalog:
+            self.catalog[table] = [c for c in self.catalog[table] if c not in columns]
+            self._rebuild()
+
+    def apply(self, change: ddl.SchemaChange) -> bool:
+        """apply the change of the schema, False if the columns have to be read from the database"""
+        if change.action == ddl.CREATE_TABLE:
+            self.set_table(change.table, list(change.names))
+        elif change.action == ddl.DROP_TABLE:
+            self.drop_table(change.table)
+        elif change.action == ddl.RENAME_TABLE:
+            self.rename_table(change.table, change.names[0])
+        elif change.action == ddl.ADD_COLUMN:
+            self.add_columns(change.table, list(change.names))
+        elif change.action == ddl.DROP_COLUMN:
+            self.drop_columns(change.table, list(change.names))
+        elif change.action != ddl.NONE:
+            return False
+        return True
+
+    def _rebuild(self):
+        self.tables = list(self.catalog)
+        self.columns = list(OrderedDict.fromkeys(c for columns in self.catalog.values() for c in columns))
+
     def all_candidates(self):
-        return set(list(syntax) + list(keywords) + list(functions) + list(datatypes) + list(ddl) + commands.keys()
-                   + self.databases + self.tables + self.columns)
+        return set(list(syntax) + list(keywords) + list(functions) + list(datatypes) + list(ddl_keywords)
+                   + commands.keys() + self.databases + self.tables + self.columns)
 
     def get_completions(self, document, complete_event) -> Iterable[Completion]:
         word_before_cursor = document.get_word_before_cursor()
-        if len(document.text.split()) == 1:
-            # first word
-            return self.find_matches(word_before_cursor, set(list(syntax) + list(ddl) + commands.keys()))
+        tokens = queryutils.last_statement(document.text_before_cursor)
+        if tokens is None:
+            # in a comment or a string
+            return []
+        if len(tokens) <= 1:
+            # first word of the statement
+            return self.find_matches(word_before_cursor, set(list(syntax) + list(ddl_keywords) + commands.keys()))
         return self.find_matches(word_before_cursor, self.all_candidates())
 
     # pylint: disable=no-self-use
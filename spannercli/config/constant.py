@@ -1,6 +1,35 @@
 class Constants(object):
     HISTORY_FILE = "~/.spanner-cli-history"
+    HISTORY_DB = "~/.spanner-cli-history.sqlite3"
+    HISTORY_LOAD_SIZE = 1000
     MAX_RESULT = 1000
+    CURSOR_IDLE_TIMEOUT = 300
+    SPINNER_INTERVAL = 0.1
+    DDL_POLL_INTERVAL = 1
+    OPERATION_POLL_INTERVAL = 2
+    OPERATION_HISTORY_SIZE = 50
+    FANOUT_WORKERS = 8
+    LOOKUP_WORKERS = 8
+    LOOKUP_CHUNK_SIZE = 500
+    DIFF_RANGES = 64
+    DIFF_WORKERS = 8
+    DIFF_ROW_LIMIT = 10000
+    DIFF_MAX_DIFFERENCES = 1000
+    DATABASE_CACHE_SIZE = 64
+    DATABASE_IDLE_TIMEOUT = 1800
+    DATABASE_LIST_TTL = 60
+    TABLE_SAMPLE_ROWS = 100
+    TABLE_MAX_COLUMN_WIDTH = 80
+    TABLE_CELL_MAX_LINES = 10
+    SCAN_GUARD_BYTES = 1024 ** 3
     PYGMENT_STYLE = "monokai"
     LOGFILE = "~/.spanner-cli.log"
+    QUERY_LOG_SESSION_SIZE = 10000
     LESS_FLAG = "-RXF"
+    PRIORITIES = ("UNSPECIFIED", "LOW", "MEDIUM", "HIGH")
+    TAG_MAX_LENGTH = 50
+    MAX_RETRIES = 10
+    RETRY_DELAY = 0.25
+    RETRY_MAX_DELAY = 32.0
+    RETRY_MULTIPLIER = 1.3
+    CHANNEL_KEEPALIVE = 120.0
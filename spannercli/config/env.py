@@ -34,6 +34,12 @@ class EnvironmentVariables(object):
     HISTORY_FILE = "SPANNER_CLI_HISTORY"
     """
     path to query history file, default is `~/.spanner-cli-history` defined as Constants.HISTORY_FILE
+    it is imported into HISTORY_DB at the first time.
+    """
+
+    HISTORY_DB = "SPANNER_CLI_HISTORY_DB"
+    """
+    path to SQLite query history, default is `~/.spanner-cli-history.sqlite3` defined as Constants.HISTORY_DB
     """
 
     PAGER = "PAGER"
@@ -51,3 +57,13 @@ class EnvironmentVariables(object):
     The builtin styles of PYGMENT. default is Constants.PYGMENT_STYLE
     see https://pygments.org/docs/styles/
     """
+
+    QUERY_LOG = "SPANNER_CLI_QUERY_LOG"
+    """
+    path to structured query log, one JSON line for each statement. disabled by default.
+    """
+
+    SPANNER_EMULATOR_HOST = "SPANNER_EMULATOR_HOST"
+    """
+    host:port of the Cloud Spanner emulator, the client library connects to it instead of Cloud Spanner if set.
+    """
@@ -0,0 +1,148 @@
+import contextlib
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Iterable, List, Optional
+
+from google.api_core import exceptions as api_exceptions
+from google.cloud import spanner
+
+logger = logging.getLogger('spanner-cli')
+
+
+class Connection(object):
+    """Database handle with its own session pool"""
+
+    def __init__(self, database_id: str, database, pool):
+        self.database_id = database_id
+        self.database = database
+        self.pool = pool
+        self.last_used = time.monotonic()
+        # completion catalog of the database, spannercli.completion.SQLCompleter
+        self.completer = None
+        # schema model of the database, spannercli.schema.Schema
+        self.schema = None
+
+    def close(self):
+        try:
+            self.pool.clear()
+        except api_exceptions.GoogleAPIError as e:
+            logger.debug("failed to clear session pool of %s: %s", self.database_id, e)
+
+
+class DatabaseManager(object):
+    """Keep recently used databases warm.
+
+    Database handles and their session pools are kept in LRU order, up to `capacity` databases.
+    Databases idle for `idle_timeout` seconds are evicted and their sessions are deleted,
+    except the current database and the databases pinned while in use, e.g. by a fan-out query.
+    The list of databases in the instance is cached for `list_ttl` seconds.
+    `on_open` is called with each database handle created, e.g. to replace its channel.
+    """
+
+    def __init__(self, instance, capacity: int, idle_timeout: float, list_ttl: float,
+                 pool_factory: Callable = spanner.BurstyPool, on_open: Optional[Callable] = None):
+        self.instance = instance
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.list_ttl = list_ttl
+        self.pool_factory = pool_factory
+        self.on_open = on_open
+        self.current: Optional[str] = None
+        self._connections = OrderedDict()
+        self._pins = Counter()
+        self._lock = threading.RLock()
+        self._database_ids: Optional[List[str]] = None
+        self._listed_at = 0.0
+
+    def get(self, database_id: str) -> Connection:
+        with self._lock:
+            conn = self._connections.get(database_id)
+            if conn is None:
+                pool = self.pool_factory()
+                database = self.instance.database(database_id, pool=pool)
+                if self.on_open is not None:
+                    self.on_open(database)
+                conn = Connection(database_id, database, pool)
+                self._connections[database_id] = conn
+            self._connections.move_to_end(database_id)
+            conn.last_used = time.monotonic()
+            self.evict()
+            return conn
+
+    def peek(self, database_id: str) -> Optional[Connection]:
+        """the connection if it is open, without making it recently used"""
+        with self._lock:
+            return self._connections.get(database_id)
+
+    def use(self, database_id: str) -> Connection:
+        """get the database and make it current"""
+        with self._lock:
+            self.current = database_id
+            return self.get(database_id)
+
+    @contextlib.contextmanager
+    def pinned(self, database_ids: Iterable[str]):
+        """keep the databases open in the block, even more than `capacity` of them"""
+        database_ids = list(database_ids)
+        with self._lock:
+            self._pins.update(database_ids)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins.subtract(database_ids)
+                self._pins += Counter()
+                self.evict()
+
+    def evict(self):
+        with self._lock:
+            now = time.monotonic()
+            for database_id, conn in list(self._connections.items()):
+                if database_id == self.current or self._pins[database_id]:
+                    continue
+                if len(self._connections) > self.capacity or now - conn.last_used > self.idle_timeout:
+                    logger.debug("evict database %s", database_id)
+                    del self._connections[database_id]
+                    conn.close()
+
+    def discard(self, database_id: str):
+        with self._lock:
+            conn = self._connections.pop(database_id, None)
+        if conn is not None:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+
+    def list_databases(self, refresh: bool = False) -> List[str]:
+        with self._lock:
+            if not refresh and self._database_ids is not None and time.monotonic() - self._listed_at < self.list_ttl:
+                return list(self._database_ids)
+        database_ids = [d.database_id for d in self.instance.list_databases()]
+        with self._lock:
+            self._database_ids = database_ids
+            self._listed_at = time.monotonic()
+        return list(database_ids)
+
+    def invalidate(self):
+        """forget the cached list of databases, e.g. after CREATE DATABASE"""
+        with self._lock:
+            self._database_ids = None
+
+    def exists(self, database_id: str) -> Optional[bool]:
+        """check the database is in the (cached) list of databases. None if it is unknown"""
+        try:
+            database_ids = self.list_databases()
+        except api_exceptions.GoogleAPIError as e:
+            logger.debug("failed to list databases: %s", e)
+            return None
+        if database_id in database_ids:
+            return True
+        # might be created after cached
+        return database_id in self.list_databases(refresh=True)
@@ -0,0 +1,154 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from typing import List, Optional
+
+from google.api_core import exceptions as api_exceptions
+
+from spannercli import jobs
+
+logger = logging.getLogger('spanner-cli')
+
+
+def cancel_stream(result_set):
+    """Stop reading a streamed result set.
+    closing the response generator drops the underlying gRPC call, which cancels it on the server side.
+    """
+    # StreamedResultSet does not expose a public way to cancel the stream
+    response_iterator = getattr(result_set, "_response_iterator", None)
+    close = getattr(response_iterator, "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except (ValueError, RuntimeError) as e:
+        # generator already executing in another thread
+        logger.debug("failed to close the stream: %s", e)
+
+
+class ResultCursor(object):
+    """Open result stream of a query, read page by page.
+
+    The snapshot (and the session checked out for it) is held until the stream is exhausted,
+    the cursor is closed, or nobody fetched from it for `idle_timeout` seconds.
+    The next page is prefetched in background while the current page is displayed,
+    closing the cursor cancels the stream of a prefetch blocked on a slow query.
+    """
+
+    def __init__(self, checkout, result_set, page_size: int, idle_timeout: float):
+        self.checkout = checkout
+        self.result_set = result_set
+        self.page_size = page_size
+        self.idle_timeout = idle_timeout
+        self.exhausted = False
+        self.closed = False
+        self.fetched = 0
+        # output options of the query, e.g. format
+        self.meta = {}
+        self._iter = iter(result_set)
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spanner-cli-cursor")
+        self._prefetch = None
+        self._timer = None
+        # the calls of the stream, cancelled on close
+        self._scope = jobs.CancelScope()
+
+    @classmethod
+    def open(cls, database, sql: str, page_size: int, idle_timeout: float, **kwargs) -> "ResultCursor":
+        checkout = database.snapshot()
+        snapshot = checkout.__enter__()  # pylint: disable=unnecessary-dunder-call
+        try:
+            result_set = snapshot.execute_sql(sql, **kwargs)
+        except BaseException as e:
+            checkout.__exit__(type(e), e, e.__traceback__)
+            raise
+        return cls(checkout, result_set, page_size, idle_timeout)
+
+    @property
+    def fields(self):
+        return self.result_set.fields
+
+    @property
+    def stats(self):
+        """available after the stream is exhausted"""
+        if not self.exhausted:
+            return None
+        return self.result_set.stats
+
+    def fetch(self, size: Optional[int] = None) -> List:
+        """read next `size` rows (page_size by default), and start prefetching the following page."""
+        size = size or self.page_size
+        if self._prefetch is not None:
+            # propagate errors of the background read, nothing if it was cancelled by close
+            try:
+                self._prefetch.result()
+            except CancelledError:
+                pass
+            self._prefetch = None
+        with self._lock:
+            if self.closed and not self._buffer:
+                return []
+            self._fill(size)
+            rows = [self._buffer.popleft() for _ in range(min(size, len(self._buffer)))]
+            self.fetched += len(rows)
+        if self.exhausted and not self._buffer:
+            self.close()
+        elif not self.closed:
+            self._prefetch = self._executor.submit(self._prefetch_page)
+            self._touch()
+        return rows
+
+    def has_more(self) -> bool:
+        return bool(self._buffer) or not (self.exhausted or self.closed)
+
+    def close(self):
+        # the prefetch holds the lock while it waits for the stream, stop it first
+        prefetch = self._prefetch
+        if prefetch is not None:
+            prefetch.cancel()
+        self._scope.cancel()
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+            if not self.exhausted:
+                cancel_stream(self.result_set)
+            self.checkout.__exit__(None, None, None)
+        self._executor.shutdown(wait=False)
+
+    def _fill(self, size: int):
+        with jobs.entered(self._scope):
+            while len(self._buffer) < size and not self.exhausted and not self.closed:
+                try:
+                    row = next(self._iter)
+                except StopIteration:
+                    self.exhausted = True
+                    break
+                except api_exceptions.Cancelled:
+                    if not self._scope.cancelled:
+                        raise
+                    # closed while waiting for the stream
+                    break
+                # count rows read by a job, or stop here if it is cancelled
+                jobs.checkpoint()
+                self._buffer.append(row)
+
+    def _prefetch_page(self):
+        with self._lock:
+            self._fill(self.page_size)
+
+    def _touch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self.idle_timeout:
+            self._timer = threading.Timer(self.idle_timeout, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _expire(self):
+        logger.debug("cursor idle timeout, release the stream")
+        self.close()
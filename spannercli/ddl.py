@@ -0,0 +1,187 @@
+"""
+Schema changes, submitted as a single long-running operation
+https://cloud.google.com/spanner/docs/schema-updates
+"""
+from typing import List, NamedTuple, Optional, Tuple
+
+from spannercli import queryutils
+
+#: actions of SchemaChange
+CREATE_TABLE = "create table"
+DROP_TABLE = "drop table"
+RENAME_TABLE = "rename table"
+ADD_COLUMN = "add column"
+DROP_COLUMN = "drop column"
+#: the columns of the table are unknown from the statement
+REFRESH_TABLE = "refresh table"
+#: the statement is not understood
+REFRESH = "refresh"
+#: no change of tables and columns, e.g. CREATE INDEX
+NONE = "none"
+
+#: statements which do not change tables and columns, by leading keywords
+_no_change = (
+    ("CREATE", "INDEX"), ("CREATE", "UNIQUE"), ("CREATE", "NULL_FILTERED"), ("DROP", "INDEX"), ("ALTER", "INDEX"),
+    ("CREATE", "SEARCH"), ("DROP", "SEARCH"), ("ALTER", "SEARCH"),
+    ("CREATE", "VECTOR"), ("DROP", "VECTOR"), ("ALTER", "VECTOR"),
+    ("CREATE", "CHANGE"), ("DROP", "CHANGE"), ("ALTER", "CHANGE"),
+    ("CREATE", "ROLE"), ("DROP", "ROLE"), ("GRANT",), ("REVOKE",),
+    ("CREATE", "SEQUENCE"), ("DROP", "SEQUENCE"), ("ALTER", "SEQUENCE"),
+    ("CREATE", "MODEL"), ("CREATE", "OR", "REPLACE", "MODEL"), ("DROP", "MODEL"), ("ALTER", "MODEL"),
+    ("CREATE", "PROTO"), ("ALTER", "PROTO"), ("DROP", "PROTO"),
+    ("ALTER", "DATABASE"), ("ANALYZE",),
+)
+
+
+def is_database_statement(sql: str) -> bool:
+    """CREATE DATABASE or DROP DATABASE, which are not a schema change of the database"""
+    words = [t.text.upper() for _, t in zip(range(2), queryutils.tokenize(sql))]
+    return len(words) == 2 and words[0] in ("CREATE", "DROP") and words[1] == "DATABASE"
+
+
+def validate(statement: queryutils.Statement):
+    if statement.kind != queryutils.DDL:
+        raise ValueError(f"Not a DDL statement: {statement.text}")
+    if is_database_statement(statement.text):
+        raise ValueError(f"Cannot be batched: {statement.text}, try it after `\\ddl apply` or `\\ddl abort`")
+
+
+class DdlBatch(object):
+    """DDL statements buffered by `\\ddl begin` until `\\ddl apply`"""
+
+    def __init__(self, database_id: str):
+        self.database_id = database_id
+        self.statements: List[str] = []
+
+    def add(self, sql: str) -> List[str]:
+        """validate and buffer the statements, nothing is buffered if any of them is invalid"""
+        statements = queryutils.split(sql)
+        for s in statements:
+            validate(s)
+        added = [s.text for s in statements]
+        self.statements.extend(added)
+        return added
+
+
+def progress(statements: List[str], metadata) -> List[Tuple[str, Optional[int], bool]]:
+    """
+    :param statements: submitted statements
+    :param metadata: google.cloud.spanner_admin_database_v1.types.UpdateDatabaseDdlMetadata, or None
+    :return: list of (statement, percent completed or None if not started, committed)
+    """
+    committed = len(metadata.commit_timestamps) if metadata is not None else 0
+    result = []
+    for i, sql in enumerate(statements):
+        percent = None
+        if metadata is not None and i < len(metadata.progress):
+            percent = metadata.progress[i].progress_percent
+        if i < committed:
+            percent = 100
+        result.append((sql, percent, i < committed))
+    return result
+
+
+def summary(states: List[Tuple[str, Optional[int], bool]]) -> str:
+    """one line progress, of the statement in progress"""
+    done = len([s for s in states if s[2]])
+    line = f"{done}/{len(states)} statements"
+    running = next((s for s in states if not s[2]), None)
+    if running is not None:
+        sql, percent, _ = running
+        line += f", {percent or 0}% {' '.join(sql.split())[:60]}"
+    return line
+
+
+class SchemaChange(NamedTuple):
+    action: str
+    table: Optional[str] = None
+    #: columns for CREATE_TABLE, ADD_COLUMN and DROP_COLUMN, new name for RENAME_TABLE
+    names: Tuple[str, ...] = ()
+
+
+def _name(token: queryutils.Token) -> str:
+    return queryutils.path_name(token)
+
+
+def _skip_if_exists(tokens: List[queryutils.Token], i: int) -> int:
+    """skip `IF EXISTS` or `IF NOT EXISTS`"""
+    if i < len(tokens) and tokens[i].text.upper() == "IF":
+        while i < len(tokens) and tokens[i].text.upper() != "EXISTS":
+            i += 1
+        i += 1
+    return i
+
+
+def _column_definitions(tokens: List[queryutils.Token], i: int) -> Optional[List[str]]:
+    """column names in the parentheses of CREATE TABLE, starting at tokens[i]"""
+    if i >= len(tokens) or tokens[i].text != "(":
+        return None
+    columns = []
+    depth = 0
+    # type parameters, ARRAY<STRUCT<a INT64, b STRING(MAX)>>
+    angle = 0
+    expect_name = True
+    for token in tokens[i:]:
+        if token.kind == "open":
+            depth += 1
+        elif token.kind == "close":
+            depth -= 1
+            if depth == 0:
+                return columns
+        elif depth == 1 and token.text in ("<", ">"):
+            angle += 1 if token.text == "<" else -1
+        elif depth == 1 and angle == 0 and token.text == ",":
+            expect_name = True
+        elif depth == 1 and expect_name:
+            expect_name = False
+            if token.text.upper() not in ("CONSTRAINT", "FOREIGN", "CHECK", "PRIMARY"):
+                columns.append(_name(token))
+    return None
+
+
+def _alter_table(tokens: List[queryutils.Token], table: str) -> List[SchemaChange]:
+    i = 3
+    action = " ".join(t.text.upper() for t in tokens[i:i + 2])
+    if action in ("ADD COLUMN", "DROP COLUMN"):
+        j = _skip_if_exists(tokens, i + 2)
+        if j < len(tokens):
+            return [SchemaChange(ADD_COLUMN if action == "ADD COLUMN" else DROP_COLUMN, table, (_name(tokens[j]),))]
+    if action == "RENAME TO" and len(tokens) > i + 2:
+        return [SchemaChange(RENAME_TABLE, table, (_name(tokens[i + 2]),))]
+    if i < len(tokens) and tokens[i].text.upper() in ("ALTER", "SET", "ADD", "DROP", "REPLACE"):
+        # ALTER COLUMN, SET ON DELETE, constraints and row deletion policy keep the column names
+        if action not in ("ADD SYNONYM", "DROP SYNONYM"):
+            return [SchemaChange(NONE, table)]
+    return [SchemaChange(REFRESH_TABLE, table)]
+
+
+def parse_change(sql: str) -> List[SchemaChange]:  # pylint: disable=too-many-return-statements
+    """changes of tables and columns by the DDL statement, to update the completion without reading the schema"""
+    tokens = queryutils.join_paths(queryutils.tokenize(sql))
+    words = [t.text.upper() for t in tokens[:4]]
+    if any(tuple(words[:len(p)]) == p for p in _no_change):
+        return [SchemaChange(NONE)]
+    if words[:2] == ["CREATE", "TABLE"]:
+        i = _skip_if_exists(tokens, 2)
+        if i < len(tokens):
+            table = _name(tokens[i])
+            columns = _column_definitions(tokens, i + 1)
+            if columns is None:
+                return [SchemaChange(REFRESH_TABLE, table)]
+            return [SchemaChange(CREATE_TABLE, table, tuple(columns))]
+    if words[:2] in (["DROP", "TABLE"], ["DROP", "VIEW"]):
+        i = _skip_if_exists(tokens, 2)
+        if i < len(tokens):
+            return [SchemaChange(DROP_TABLE, _name(tokens[i]))]
+    if words[:2] == ["ALTER", "TABLE"] and len(tokens) > 2:
+        return _alter_table(tokens, _name(tokens[2]))
+    if words[:2] == ["CREATE", "VIEW"] or words[:4] == ["CREATE", "OR", "REPLACE", "VIEW"]:
+        i = 2 if words[1] == "VIEW" else 4
+        if i < len(tokens):
+            return [SchemaChange(REFRESH_TABLE, _name(tokens[i]))]
+    if words[:2] == ["RENAME", "TABLE"]:
+        # RENAME TABLE a TO b, c TO d
+        names = [_name(t) for t in tokens[2:] if t.text != "," and t.text.upper() != "TO"]
+        if names and len(names) % 2 == 0:
+            return [SchemaChange(RENAME_TABLE, a, (b,)) for a, b in zip(names[::2], names[1::2])]
+    return [SchemaChange(REFRESH)]
@@ -0,0 +1,290 @@
+"""
+Row level diff of two tables, in the same or another database.
+
+The primary key space is split into ranges by the leading key column, and both sides are read at
+the same timestamp. The row count and a hash of the rows are compared per range first; only the
+ranges that differ are read row by row, split further into hash buckets when they are large.
+"""
+import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from google.cloud.spanner_v1 import param_types
+
+from spannercli import jobs, structures
+from spannercli.keyread import base_type
+from spannercli.schema import Table
+
+#: param types of the key columns
+PARAM_TYPES = {
+    "INT64": param_types.INT64,
+    "FLOAT64": param_types.FLOAT64,
+    "STRING": param_types.STRING,
+    "BYTES": param_types.BYTES,
+    "BOOL": param_types.BOOL,
+    "DATE": param_types.DATE,
+    "TIMESTAMP": param_types.TIMESTAMP,
+    "NUMERIC": param_types.NUMERIC,
+}
+# FLOAT32 is not available in older client libraries
+if hasattr(param_types, "FLOAT32"):
+    PARAM_TYPES["FLOAT32"] = param_types.FLOAT32
+
+#: sampled keys for each range, to find the boundaries
+SAMPLES_PER_RANGE = 20
+
+ONLY_IN = "only in {0}"
+CHANGED = "changed"
+
+
+def quote(name: str) -> str:
+    return f"`{name}`"
+
+
+def fingerprint(columns: List[str]) -> str:
+    """hash of the values of the columns, the same value on both sides when the values are the same"""
+    return f"FARM_FINGERPRINT(FORMAT('{'|'.join(['%T'] * len(columns))}', {', '.join(quote(c) for c in columns)}))"
+
+
+def range_condition(column: str, lo, hi) -> str:
+    """condition of the range [lo, hi) of the column, NULLs are in the first range"""
+    conditions = []
+    if lo is not None:
+        conditions.append(f"{quote(column)} >= @lo")
+    if hi is not None:
+        less = f"{quote(column)} < @hi"
+        conditions.append(less if lo is not None else f"({less} OR {quote(column)} IS NULL)")
+    return " AND ".join(conditions) or "TRUE"
+
+
+def split_points(values: List, ranges: int) -> List:
+    """boundaries of the ranges of about the same number of the sampled values"""
+    present = sorted({v for v in values if v is not None})
+    if ranges <= 1 or not present:
+        return []
+    return list(OrderedDict.fromkeys(present[len(present) * i // ranges] for i in range(1, ranges)))
+
+
+class Side(object):
+    """table to compare"""
+
+    def __init__(self, label: str, database, table: str):
+        self.label = label
+        self.database = database
+        self.table = table
+
+
+class KeyRange(object):
+    """range [lo, hi) of the leading key column, None is unbounded"""
+
+    def __init__(self, lo, hi):
+        self.lo = lo
+        self.hi = hi
+        # (row count, hash) of each side
+        self.hashes: List[Optional[Tuple[int, int]]] = [None, None]
+
+    def matched(self) -> bool:
+        return self.hashes[0] == self.hashes[1]
+
+    def rows(self) -> int:
+        return max(h[0] for h in self.hashes if h is not None)
+
+    def params(self, type_name: str) -> Tuple[Dict, Dict]:
+        params = {}
+        if self.lo is not None:
+            params["lo"] = self.lo
+        if self.hi is not None:
+            params["hi"] = self.hi
+        param_type = PARAM_TYPES[base_type(type_name)]
+        return params, {k: param_type for k in params}
+
+
+def make_ranges(points: List) -> List[KeyRange]:
+    bounds = [None] + points + [None]
+    return [KeyRange(lo, hi) for lo, hi in zip(bounds, bounds[1:])]
+
+
+def same(a, b) -> bool:
+    # NaN is not equal to itself
+    return a == b or (isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b))
+
+
+def compare_rows(source: Dict[tuple, list], target: Dict[tuple, list], columns: List[str],
+                 labels: Tuple[str, str]) -> List[List[str]]:
+    """
+    :param source: rows by the primary key
+    :param columns: names of the values of the rows
+    :return: differences, kind, key and the changed columns
+    """
+    differences = []
+    for key, row in source.items():
+        other = target.get(key)
+        if other is None:
+            differences.append([ONLY_IN.format(labels[0]), key, ""])
+            continue
+        changed = [c for c, a, b in zip(columns, row, other) if not same(a, b)]
+        if changed:
+            differences.append([CHANGED, key, ", ".join(changed)])
+    differences.extend([ONLY_IN.format(labels[1]), key, ""] for key in target if key not in source)
+    return differences
+
+
+def run_all(executor: ThreadPoolExecutor, tasks: List[Callable], label: str) -> List:
+    """run the tasks concurrently, the results in order. stop here if the job is cancelled"""
+    futures = [executor.submit(jobs.bind(t)) for t in tasks]
+    results = []
+    try:
+        for n, f in enumerate(futures):
+            jobs.checkpoint(0)
+            results.append(f.result())
+            jobs.report(f"{label} {n + 1}/{len(futures)}")
+    finally:
+        for f in futures:
+            f.cancel()
+    return results
+
+
+class TableDiff(object):
+    """diff of the rows of two tables with the same primary key
+
+    :param key_columns: list of (name, spanner type) of the primary key
+    :param columns: columns to compare, not including the key columns
+    :param request_options: google.cloud.spanner_v1.RequestOptions of the queries
+    """
+
+    def __init__(self, source: Side, target: Side, key_columns: List[Tuple[str, str]], columns: List[str],
+                 read_timestamp, row_limit: int, max_differences: int, request_options=None):
+        self.sides = (source, target)
+        self.key_columns = key_columns
+        self.columns = columns
+        self.read_timestamp = read_timestamp
+        self.row_limit = row_limit
+        self.max_differences = max_differences
+        self.request_options = request_options
+
+    @property
+    def leading(self) -> Tuple[str, str]:
+        return self.key_columns[0]
+
+    def execute(self, side: Side, sql: str, params: Dict = None, types: Dict = None) -> List:
+        with side.database.snapshot(read_timestamp=self.read_timestamp) as snapshot:
+            return list(snapshot.execute_sql(sql, params=params, param_types=types,
+                                             request_options=self.request_options))
+
+    def sample(self, rows: int) -> List:
+        """sampled values of the leading key column of the source"""
+        sql = f"SELECT {quote(self.leading[0])} FROM {quote(self.sides[0].table)} TABLESAMPLE RESERVOIR ({rows} ROWS)"
+        return [r[0] for r in self.execute(self.sides[0], sql)]
+
+    def hash_range(self, side: Side, key_range: KeyRange) -> Tuple[int, int]:
+        sql = f"SELECT COUNT(*), BIT_XOR({fingerprint(self.all_columns())}) FROM {quote(side.table)}" \
+              f" WHERE {range_condition(self.leading[0], key_range.lo, key_range.hi)}"
+        params, types = key_range.params(self.leading[1])
+        count, hashed = self.execute(side, sql, params, types)[0]
+        return count, hashed
+
+    def all_columns(self) -> List[str]:
+        return [c for c, _ in self.key_columns] + self.columns
+
+    def bucket_expression(self) -> str:
+        return f"MOD({fingerprint([c for c, _ in self.key_columns])}, @buckets)"
+
+    def hash_buckets(self, side: Side, key_range: KeyRange, buckets: int) -> Dict[int, Tuple[int, int]]:
+        sql = f"SELECT {self.bucket_expression()} AS bucket, COUNT(*), BIT_XOR({fingerprint(self.all_columns())})" \
+              f" FROM {quote(side.table)} WHERE {range_condition(self.leading[0], key_range.lo, key_range.hi)}" \
+              " GROUP BY bucket"
+        params, types = key_range.params(self.leading[1])
+        params["buckets"] = buckets
+        types["buckets"] = param_types.INT64
+        return {r[0]: (r[1], r[2]) for r in self.execute(side, sql, params, types)}
+
+    def read_rows(self, side: Side, key_range: KeyRange, buckets: int = 1, bucket: int = 0) -> Dict[tuple, list]:
+        """rows of the range (and the bucket) by the primary key"""
+        sql = f"SELECT {', '.join(quote(c) for c in self.all_columns())} FROM {quote(side.table)}" \
+              f" WHERE {range_condition(self.leading[0], key_range.lo, key_range.hi)}"
+        params, types = key_range.params(self.leading[1])
+        if buckets > 1:
+            sql += f" AND {self.bucket_expression()} = @bucket"
+            params.update(buckets=buckets, bucket=bucket)
+            types.update(buckets=param_types.INT64, bucket=param_types.INT64)
+        size = len(self.key_columns)
+        return {tuple(r[:size]): list(r[size:]) for r in self.execute(side, sql, params, types)}
+
+    def drill_down(self, key_range: KeyRange) -> List[List[str]]:
+        """row level differences of the range"""
+        source, target = self.sides
+        labels = (source.label, target.label)
+        buckets = max(1, math.ceil(key_range.rows() / self.row_limit))
+        if buckets == 1:
+            return compare_rows(self.read_rows(source, key_range), self.read_rows(target, key_range),
+                                self.columns, labels)
+        hashes = [self.hash_buckets(s, key_range, buckets) for s in self.sides]
+        differences = []
+        for bucket in sorted(set(hashes[0]) | set(hashes[1])):
+            if hashes[0].get(bucket) == hashes[1].get(bucket):
+                continue
+            differences.extend(compare_rows(self.read_rows(source, key_range, buckets, bucket),
+                                            self.read_rows(target, key_range, buckets, bucket),
+                                            self.columns, labels))
+            if len(differences) >= self.max_differences:
+                break
+        return differences
+
+    def run(self, range_count: int, workers: int, notes: Optional[List[str]] = None) -> structures.ResultContainer:
+        """
+        :param range_count: number of the ranges to split the key space into
+        :param workers: max number of queries to run at the same time
+        :param notes: added to the summary message
+        """
+        jobs.report("sampling keys")
+        key_ranges = make_ranges(split_points(self.sample(range_count * SAMPLES_PER_RANGE), range_count))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spanner-cli-diff")
+        try:
+            tasks = [(lambda s=s, r=r: self.hash_range(s, r)) for r in key_ranges for s in self.sides]
+            hashes = run_all(executor, tasks, "hashing ranges")
+            for n, r in enumerate(key_ranges):
+                r.hashes = hashes[n * 2:n * 2 + 2]
+            mismatched = [r for r in key_ranges if not r.matched()]
+            drilled = run_all(executor, [(lambda r=r: self.drill_down(r)) for r in mismatched], "comparing rows")
+        finally:
+            executor.shutdown(wait=False)
+
+        differences = [d for found in drilled for d in found]
+        rows = [[kind, ", ".join(str(v) for v in key), changed]
+                for kind, key, changed in differences[:self.max_differences]]
+        message = self.summary(key_ranges, len(mismatched), len(differences)) + (notes or [])
+        return structures.ResultContainer(data=rows, header=["Difference", "Key", "Columns"],
+                                          message="\n".join(message))
+
+    def summary(self, key_ranges: List[KeyRange], mismatched: int, differences: int) -> List[str]:
+        message = [
+            f"read at {self.read_timestamp.isoformat()}",
+            f"{len(key_ranges)} ranges by {self.leading[0]}, {mismatched} mismatched",
+        ]
+        for n, side in enumerate(self.sides):
+            message.append(f"{side.label}: {sum(r.hashes[n][0] for r in key_ranges):,} rows")
+        message.append(f"{differences:,} differences" if differences else "no differences")
+        if differences > self.max_differences:
+            message.append(f"showing the first {self.max_differences:,} differences")
+        return message
+
+
+def compared_columns(source: Table, target: Table) -> Tuple[List[Tuple[str, str]], List[str], List[str]]:
+    """
+    :return: the primary key (name, type), columns in both tables except the key,
+        and the messages for the columns only in one of them
+    """
+    if [c for c, _ in source.primary_key] != [c for c, _ in target.primary_key]:
+        raise ValueError(f"primary keys differ: {', '.join(c for c, _ in source.primary_key)}"
+                         f" and {', '.join(c for c, _ in target.primary_key)}")
+    if not source.primary_key:
+        raise ValueError(f"{source.name} has no primary key")
+    keys = [c for c, _ in source.primary_key]
+    columns = [c for c in source.columns if c in target.columns and c not in keys]
+    messages = []
+    for table, other in ((source, target), (target, source)):
+        only = [c for c in table.columns if c not in other.columns]
+        if only:
+            messages.append(f"not compared, only in {table.name}: {', '.join(only)}")
+    return [(c, source.columns[c].spanner_type) for c in keys], columns, messages
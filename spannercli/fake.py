@@ -0,0 +1,536 @@
+"""
+In-process fake of the Spanner backend, running the SQL on SQLite.
+
+SpannerCli talks to the backend only through the subset of google.cloud.spanner below,
+so `SpannerCli(client=FakeClient())` runs the whole cli offline, for tests and benchmarks.
+
+    client.instance(instance_id) -> instance
+    client.database_admin_api.get_database_ddl(database=name).statements
+    instance.display_name, instance.list_databases(), instance.database(database_id, pool=None)
+    database.database_id, database.name, database.snapshot(**kwargs), database.run_in_transaction(func),
+        database.execute_partitioned_dml(sql), database.update_ddl(statements),
+        database.create(), database.drop(), database.session()
+    session.create(), session.delete(), session.snapshot(**kwargs)
+    snapshot.execute_sql(sql, params, param_types, query_mode), snapshot.read(table, columns, keyset, index)
+    transaction.batch_update(statements), transaction.execute_update(sql, params, param_types)
+
+The `retry` and `timeout` of the calls are applied, a call slower than the timeout fails with DeadlineExceeded.
+Errors are injected with `database.inject(method, error)`, and aborted transactions are run again
+as the client library does.
+
+Queries are executed by SQLite as they are, `@name` parameters included. Spanner specific syntax and
+functions (SPANNER_SYS, TABLESAMPLE, hints) are not available, INFORMATION_SCHEMA has only the COLUMNS
+and the INDEXES read by the cli. The DDL supported is CREATE TABLE, CREATE INDEX, CREATE VIEW and DROP of them.
+"""
+import datetime
+import sqlite3
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from google.api_core import exceptions as api_exceptions
+from google.api_core.retry import Retry
+from google.cloud.spanner_admin_database_v1 import types as admin_types
+from google.cloud.spanner_v1 import types
+
+from spannercli import jobs, queryutils
+from spannercli.keyread import base_type
+from spannercli.schema import Schema, split_name
+
+#: SQLite column type of the Spanner types
+SQLITE_TYPES = {
+    "INT64": "INTEGER",
+    "BOOL": "INTEGER",
+    "FLOAT64": "REAL",
+    "FLOAT32": "REAL",
+    "BYTES": "BLOB",
+}
+
+#: Spanner type of the SQLite column types, for the columns of the views
+SPANNER_TYPES = {"INTEGER": "INT64", "REAL": "FLOAT64", "BLOB": "BYTES"}
+
+#: google.rpc.Status of batch_update
+Status = namedtuple("Status", ["code", "message"])
+
+#: keyword arguments of run_in_transaction for the client library, not passed to the function
+TRANSACTION_OPTIONS = ("timeout_secs", "default_retry_delay", "commit_request_options", "transaction_tag")
+
+#: INFORMATION_SCHEMA read by the cli, filled from the DDL statements
+INFORMATION_SCHEMA = (
+    "ATTACH DATABASE ':memory:' AS INFORMATION_SCHEMA",
+    "CREATE TABLE INFORMATION_SCHEMA.COLUMNS (TABLE_CATALOG TEXT, TABLE_SCHEMA TEXT, TABLE_NAME TEXT,"
+    " COLUMN_NAME TEXT, ORDINAL_POSITION INTEGER, COLUMN_DEFAULT TEXT, IS_NULLABLE TEXT, SPANNER_TYPE TEXT)",
+    "CREATE TABLE INFORMATION_SCHEMA.INDEXES (TABLE_CATALOG TEXT, TABLE_SCHEMA TEXT, TABLE_NAME TEXT,"
+    " INDEX_NAME TEXT, INDEX_TYPE TEXT, INDEX_STATE TEXT)",
+)
+
+#: recent calls kept in FakeDatabase.requests
+REQUEST_LOG_SIZE = 100
+
+#: seconds to retry an aborted transaction, the same as the client library
+DEFAULT_RETRY_TIMEOUT_SECS = 120
+
+PLAN = types.ExecuteSqlRequest.QueryMode.PLAN
+PROFILE = types.ExecuteSqlRequest.QueryMode.PROFILE
+
+
+def with_retry(func: Callable, kwargs: dict) -> Callable:
+    """the call with the `retry` of the keyword arguments, if given"""
+    retry = kwargs.get("retry")
+    return retry(func) if isinstance(retry, Retry) else func
+
+
+def type_code(values: List) -> types.TypeCode:
+    """type of the column, by the first non NULL value"""
+    value = next((v for v in values if v is not None), None)
+    if isinstance(value, bool):
+        return types.TypeCode.BOOL
+    if isinstance(value, int):
+        return types.TypeCode.INT64
+    if isinstance(value, float):
+        return types.TypeCode.FLOAT64
+    if isinstance(value, bytes):
+        return types.TypeCode.BYTES
+    return types.TypeCode.STRING
+
+
+def quote(name: str) -> str:
+    return f'"{name}"'
+
+
+def quote_all(names: List[str]) -> str:
+    return ", ".join(quote(n) for n in names)
+
+
+def format_msecs(seconds: float) -> str:
+    return f"{seconds * 1000:.2f} msecs"
+
+
+def defined_names(sql: str) -> set:
+    """tables and indexes created by the statement"""
+    schema = Schema([sql])
+    return set(schema.tables) | set(schema.indexes)
+
+
+def key_condition(keys: List[str], keyset) -> Tuple[str, List]:
+    """WHERE condition of the KeySet on the primary key columns, and its parameters"""
+    conditions = []
+    values = []
+    for key in keyset.keys:
+        conditions.append(" AND ".join(f"{quote(c)} = ?" for c in keys[:len(key)]))
+        values.extend(key)
+    for r in keyset.ranges:
+        bounds = []
+        for bound, operator in ((r.start_closed, ">="), (r.start_open, ">"), (r.end_closed, "<="), (r.end_open, "<")):
+            if bound:
+                bounds.append(f"({quote_all(keys[:len(bound)])}) {operator} ({', '.join('?' * len(bound))})")
+                values.extend(bound)
+        conditions.append(" AND ".join(bounds) or "TRUE")
+    return " OR ".join(f"({c})" for c in conditions) or "FALSE", values
+
+
+class FakeResultSet(object):
+    """StreamedResultSet of the rows, streamed at `rows_per_second` if given"""
+
+    def __init__(self, names: List[str], rows: List, elapsed: float, query_mode=None,
+                 rows_per_second: Optional[float] = None):
+        self.fields = [types.StructType.Field(name=name, type_=types.Type(code=type_code([r[i] for r in rows])))
+                       for i, name in enumerate(names)]
+        self.rows = rows
+        self.stats = None
+        if query_mode == PLAN:
+            self.stats = types.ResultSetStats(query_plan=types.QueryPlan())
+        elif query_mode == PROFILE:
+            self.stats = types.ResultSetStats(query_plan=types.QueryPlan(), query_stats={
+                "rows_returned": str(len(rows)),
+                "rows_scanned": str(len(rows)),
+                "elapsed_time": format_msecs(elapsed),
+                "cpu_time": format_msecs(elapsed),
+                "query_text": "",
+            })
+        self.rows_per_second = rows_per_second
+        # closed to cancel the stream, the same as the gRPC stream of StreamedResultSet
+        self._response_iterator = self._stream()
+
+    def _stream(self):
+        # the gRPC call starts at the first row and is cancelled with the job, the stream fails with CANCELLED
+        cancelled = threading.Event()
+        unregister = jobs.on_cancel(cancelled.set)
+        started = time.monotonic()
+        try:
+            for n, row in enumerate(self.rows):
+                if self.rows_per_second:
+                    wait = started + n / self.rows_per_second - time.monotonic()
+                    if wait > 0.001:
+                        cancelled.wait(wait)
+                if cancelled.is_set():
+                    raise api_exceptions.Cancelled("Locally cancelled by application!")
+                yield list(row)
+        finally:
+            unregister()
+
+    def __iter__(self):
+        return self._response_iterator
+
+    def one(self):
+        return list(self.rows[0])
+
+
+class FakeSnapshot(object):
+    def __init__(self, database: "FakeDatabase"):
+        self.database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute_sql(self, sql: str, params: Optional[Dict] = None, param_types: Optional[Dict] = None,
+                    query_mode=None, **kwargs) -> FakeResultSet:
+        # pylint: disable=unused-argument
+        self.database.requests.append(("execute_sql", kwargs.get("request_options"), None))
+        started = time.monotonic()
+        names, rows = with_retry(lambda: self.database.execute(sql, params, "execute_sql", kwargs.get("timeout")),
+                                 kwargs)()
+        if query_mode == PLAN:
+            rows = []
+        return FakeResultSet(names, rows, time.monotonic() - started, query_mode, self.database.rows_per_second)
+
+    def read(self, table: str, columns: List[str], keyset, index: str = "", limit: int = 0,
+             **kwargs) -> FakeResultSet:
+        # pylint: disable=unused-argument
+        self.database.requests.append(("read", kwargs.get("request_options"), None))
+        keys = [c for c, _ in self.database.schema().tables[table].primary_key]
+        sql = f"SELECT {quote_all(columns)} FROM {quote(table)}"
+        values = []
+        if not keyset.all_:
+            condition, values = key_condition(keys, keyset)
+            sql += f" WHERE {condition}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        started = time.monotonic()
+        names, rows = with_retry(lambda: self.database.execute(sql, values, "read", kwargs.get("timeout")), kwargs)()
+        return FakeResultSet(names, rows, time.monotonic() - started, None, self.database.rows_per_second)
+
+
+class FakeTransaction(object):
+    def __init__(self, database: "FakeDatabase", transaction_tag: Optional[str] = None):
+        self.database = database
+        self.transaction_tag = transaction_tag
+
+    def execute_update(self, sql: str, params: Optional[Dict] = None, param_types: Optional[Dict] = None,
+                       **kwargs) -> int:
+        # pylint: disable=unused-argument
+        self.database.requests.append(("execute_update", kwargs.get("request_options"), self.transaction_tag))
+        return self.database.update(sql, params)
+
+    def batch_update(self, statements: List, **kwargs):
+        # pylint: disable=unused-argument
+        self.database.requests.append(("batch_update", kwargs.get("request_options"), self.transaction_tag))
+        return with_retry(lambda: self._batch_update(statements, kwargs.get("timeout")), kwargs)()
+
+    def _batch_update(self, statements: List, timeout: Optional[float]):
+        self.database.fault("batch_update")
+        counts = []
+        for statement in statements:
+            sql, params = (statement, None) if isinstance(statement, str) else statement[:2]
+            try:
+                counts.append(self.database.update(sql, params, timeout))
+            except api_exceptions.GoogleAPICallError as e:
+                return Status(e.grpc_status_code.value[0], e.message), counts
+        return Status(0, ""), counts
+
+
+class FakeSession(object):
+    """session checked out of the pool by the caller, it keeps no state"""
+
+    def __init__(self, database: "FakeDatabase"):
+        self.database = database
+        self.created = False
+
+    def create(self):
+        self.database._check()  # pylint: disable=protected-access
+        self.created = True
+
+    def delete(self):
+        self.created = False
+
+    def snapshot(self, **kwargs) -> FakeSnapshot:
+        # pylint: disable=unused-argument
+        if not self.created:
+            raise ValueError("Session has not been created.")
+        return FakeSnapshot(self.database)
+
+
+class FakeOperation(object):
+    """finished long-running operation of the schema change"""
+
+    def __init__(self, statements: List[str], error: Optional[Exception] = None):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.metadata = admin_types.UpdateDatabaseDdlMetadata(
+            statements=statements,
+            commit_timestamps=[now] * len(statements) if error is None else [],
+            progress=[admin_types.OperationProgress(progress_percent=100) for _ in statements],
+        )
+        self.error = error
+
+    def done(self) -> bool:
+        return True
+
+    def exception(self) -> Optional[Exception]:
+        return self.error
+
+    def result(self, timeout=None):
+        # pylint: disable=unused-argument
+        if self.error is not None:
+            raise self.error
+
+    def cancel(self) -> bool:
+        return False
+
+
+class FakeDatabase(object):
+    """
+    :param latency: seconds to wait for each call
+    :param rows_per_second: rate to stream the rows of the results, None for no limit
+    """
+
+    def __init__(self, instance: "FakeInstance", database_id: str, latency: float = 0.0,
+                 rows_per_second: Optional[float] = None):
+        self.instance = instance
+        self.database_id = database_id
+        self.name = f"{instance.name}/databases/{database_id}"
+        self.latency = latency
+        self.rows_per_second = rows_per_second
+        self.ddl_statements: List[str] = []
+        self._connection = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        for sql in INFORMATION_SCHEMA:
+            self._connection.execute(sql)
+        self._lock = threading.RLock()
+        #: (method, request_options, transaction_tag) of the recent calls
+        self.requests = deque(maxlen=REQUEST_LOG_SIZE)
+        #: (method, error) to raise by the next calls of the method, see inject()
+        self.faults: List[Tuple[str, Exception]] = []
+
+    def _check(self, timeout: Optional[float] = None):
+        if self.instance.databases.get(self.database_id) is not self:
+            raise api_exceptions.NotFound(f"Database not found: {self.name}")
+        if self.latency:
+            if timeout is not None and self.latency > timeout:
+                time.sleep(timeout)
+                raise api_exceptions.DeadlineExceeded(f"Deadline exceeded after {timeout}s")
+            time.sleep(self.latency)
+
+    def inject(self, method: str, error: Exception, times: int = 1):
+        """fail the next `times` calls of the method, e.g. "execute_sql", "batch_update" or "commit" """
+        with self._lock:
+            self.faults.extend([(method, error)] * times)
+
+    def fault(self, method: str):
+        """raise the error injected for the method"""
+        with self._lock:
+            for n, (m, error) in enumerate(self.faults):
+                if m == method:
+                    del self.faults[n]
+                    raise error
+
+    def schema(self) -> Schema:
+        return Schema(self.ddl_statements)
+
+    def execute(self, sql: str, params=None, method: str = "execute_sql", timeout: Optional[float] = None):
+        """
+        :param method: name of the call, to raise the error injected for it
+        :return: column names and rows of the query
+        """
+        self._check(timeout)
+        self.fault(method)
+        with self._lock:
+            try:
+                cursor = self._connection.execute(queryutils.clean(sql), params or ())
+                rows = cursor.fetchall()
+            except sqlite3.Error as e:
+                raise api_exceptions.InvalidArgument(str(e)) from e
+        return [d[0] for d in cursor.description or []], rows
+
+    def update(self, sql: str, params=None, timeout: Optional[float] = None) -> int:
+        self._check(timeout)
+        with self._lock:
+            try:
+                return self._connection.execute(queryutils.clean(sql), params or ()).rowcount
+            except sqlite3.Error as e:
+                raise api_exceptions.InvalidArgument(str(e)) from e
+
+    def snapshot(self, **kwargs) -> FakeSnapshot:
+        # pylint: disable=unused-argument
+        return FakeSnapshot(self)
+
+    def session(self, **kwargs) -> FakeSession:
+        # pylint: disable=unused-argument
+        return FakeSession(self)
+
+    def run_in_transaction(self, func: Callable, *args, **kwargs):
+        """run the function again while the transaction is aborted, without the delay of the client library"""
+        self._check()
+        options = {k: kwargs.pop(k) for k in TRANSACTION_OPTIONS if k in kwargs}
+        transaction_tag = options.get("transaction_tag")
+        deadline = time.monotonic() + options.get("timeout_secs", DEFAULT_RETRY_TIMEOUT_SECS)
+        while True:
+            with self._lock:
+                self._connection.execute("BEGIN")
+                try:
+                    result = func(FakeTransaction(self, transaction_tag), *args, **kwargs)
+                    self.requests.append(("commit", options.get("commit_request_options"), transaction_tag))
+                    self.fault("commit")
+                except api_exceptions.Aborted:
+                    self._connection.execute("ROLLBACK")
+                    if time.monotonic() >= deadline:
+                        raise
+                    continue
+                except BaseException:
+                    self._connection.execute("ROLLBACK")
+                    raise
+                self._connection.execute("COMMIT")
+                return result
+
+    def execute_partitioned_dml(self, sql: str, params=None, param_types=None, **kwargs) -> int:
+        # pylint: disable=unused-argument
+        self.requests.append(("execute_partitioned_dml", kwargs.get("request_options"), None))
+        return self.update(sql, params)
+
+    def update_ddl(self, statements: List[str], **kwargs) -> FakeOperation:
+        # pylint: disable=unused-argument
+        self._check()
+        with self._lock:
+            for n, sql in enumerate(statements):
+                try:
+                    self.apply_ddl(queryutils.clean(sql))
+                except (ValueError, sqlite3.Error) as e:
+                    return FakeOperation(statements[:n + 1], api_exceptions.FailedPrecondition(str(e)))
+                finally:
+                    self.fill_information_schema()
+        return FakeOperation(statements)
+
+    def apply_ddl(self, sql: str):
+        words = sql.split()
+        action = " ".join(words[:2]).upper()
+        schema = Schema([sql])
+        if action == "CREATE TABLE" and schema.tables:
+            table = next(iter(schema.tables.values()))
+            columns = [f"{quote(c.name)} {SQLITE_TYPES.get(base_type(c.spanner_type), 'TEXT')}"
+                       + ("" if c.nullable else " NOT NULL") for c in table.columns.values()]
+            columns.append(f"PRIMARY KEY ({quote_all([c for c, _ in table.primary_key])})")
+            self._connection.execute(f"CREATE TABLE {quote(table.name)} ({', '.join(columns)})")
+        elif action == "CREATE VIEW" and schema.tables:
+            view = next(iter(schema.tables.values()))
+            # CREATE VIEW name SQL SECURITY INVOKER AS query
+            query = next((t for t in queryutils.tokenize(sql) if t.text.upper() == "AS"), None)
+            if query is None:
+                raise ValueError(f"unsupported statement: {sql}")
+            self._connection.execute(f"CREATE VIEW {quote(view.name)} AS {sql[query.start + 2:]}")
+        elif words[0].upper() == "CREATE" and schema.indexes:
+            index = next(iter(schema.indexes.values()))
+            self._connection.execute(f"CREATE {'UNIQUE ' if index.unique else ''}INDEX {quote(index.name)}"
+                                     f" ON {quote(index.table)} ({quote_all([c for c, _ in index.columns])})")
+        elif action in ("DROP TABLE", "DROP INDEX", "DROP VIEW") and len(words) == 3:
+            name = words[2].strip("`")
+            self._connection.execute(f"{action} {quote(name)}")
+            # the table, or the index, and the indexes of the table
+            removed = {name} | {i.name for i in self.schema().indexes.values() if i.table == name}
+            self.ddl_statements = [s for s in self.ddl_statements if not defined_names(s) & removed]
+            return
+        else:
+            raise ValueError(f"unsupported statement: {sql}")
+        self.ddl_statements.append(sql)
+
+    def fill_information_schema(self):
+        schema = self.schema()
+        columns = []
+        indexes = []
+        for table in schema.tables.values():
+            schema_name, table_name = split_name(table.name)
+            if table.view:
+                # the types of the columns of the view by SQLite
+                rows = self._connection.execute(f"PRAGMA table_info({quote(table.name)})").fetchall()
+                columns.extend(("", schema_name, table_name, r[1], n, None, "YES",
+                                SPANNER_TYPES.get(r[2], "STRING(MAX)")) for n, r in enumerate(rows, 1))
+                continue
+            columns.extend(("", schema_name, table_name, c.name, n, c.default, "YES" if c.nullable else "NO",
+                            c.spanner_type) for n, c in enumerate(table.columns.values(), 1))
+            indexes.append(("", schema_name, table_name, "PRIMARY_KEY", "PRIMARY_KEY", None))
+        for index in schema.indexes.values():
+            indexes.append(("", *split_name(index.table), index.name, "INDEX", "READ_WRITE"))
+        self._connection.execute("DELETE FROM INFORMATION_SCHEMA.COLUMNS")
+        self._connection.execute("DELETE FROM INFORMATION_SCHEMA.INDEXES")
+        self._connection.executemany("INSERT INTO INFORMATION_SCHEMA.COLUMNS VALUES (?, ?, ?, ?, ?, ?, ?, ?)", columns)
+        self._connection.executemany("INSERT INTO INFORMATION_SCHEMA.INDEXES VALUES (?, ?, ?, ?, ?, ?)", indexes)
+
+    def create(self) -> FakeOperation:
+        if self.database_id in self.instance.databases:
+            raise api_exceptions.AlreadyExists(f"Database already exists: {self.name}")
+        self.instance.databases[self.database_id] = self
+        return FakeOperation([])
+
+    def drop(self):
+        self._check()
+        del self.instance.databases[self.database_id]
+
+
+class FakeInstance(object):
+    def __init__(self, client: "FakeClient", instance_id: str):
+        self.client = client
+        self.instance_id = instance_id
+        self.name = f"projects/{client.project}/instances/{instance_id}"
+        self.display_name = instance_id
+        self.databases: Dict[str, FakeDatabase] = {}
+
+    def database(self, database_id: str, ddl_statements=(), pool=None, **kwargs) -> FakeDatabase:
+        # pylint: disable=unused-argument
+        found = self.databases.get(database_id)
+        if found is not None:
+            return found
+        # not created yet
+        return FakeDatabase(self, database_id, self.client.latency, self.client.rows_per_second)
+
+    def list_databases(self) -> List[FakeDatabase]:
+        return list(self.databases.values())
+
+
+class FakeDatabaseAdminApi(object):
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+
+    def get_database_ddl(self, database: str, **kwargs):
+        # pylint: disable=unused-argument
+        for instance in self.client.instances.values():
+            for d in instance.databases.values():
+                if d.name == database:
+                    return admin_types.GetDatabaseDdlResponse(statements=d.ddl_statements)
+        raise api_exceptions.NotFound(f"Database not found: {database}")
+
+
+class FakeClient(object):
+    """
+    :param latency: seconds to wait for each call to the databases
+    :param rows_per_second: rate to stream the rows of the results, None for no limit
+    """
+
+    def __init__(self, project: str = "fake-project", latency: float = 0.0, rows_per_second: Optional[float] = None):
+        self.project = project
+        self.latency = latency
+        self.rows_per_second = rows_per_second
+        self.instances: Dict[str, FakeInstance] = {}
+        self.database_admin_api = FakeDatabaseAdminApi(self)
+
+    def instance(self, instance_id: str, **kwargs) -> FakeInstance:
+        # pylint: disable=unused-argument
+        return self.instances.setdefault(instance_id, FakeInstance(self, instance_id))
+
+    def create_database(self, instance_id: str, database_id: str, ddl_statements: List[str] = ()) -> FakeDatabase:
+        """database with the schema, ready to use"""
+        database = self.instance(instance_id).database(database_id)
+        database.create()
+        operation = database.update_ddl(list(ddl_statements))
+        operation.result()
+        return database
@@ -0,0 +1,94 @@
+import fnmatch
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from spannercli import jobs, structures
+
+DATABASE_COLUMN = "database"
+
+
+class DatabaseResult(object):
+    """result of the query on a database"""
+
+    def __init__(self, database_id: str):
+        self.database_id = database_id
+        self.header: List[str] = []
+        self.types: List[str] = []
+        self.rows: List = []
+        self.elapsed = 0.0
+        self.error: Optional[Exception] = None
+
+    def summary(self) -> str:
+        if self.error is not None:
+            return f"{self.database_id}: error, {self.error}"
+        return f"{self.database_id}: {len(self.rows):,} rows, {self.elapsed * 1000:.1f} msecs"
+
+
+def filter_databases(database_ids: List[str], pattern: Optional[str]) -> List[str]:
+    if not pattern:
+        return sorted(database_ids)
+    return sorted(d for d in database_ids if fnmatch.fnmatchcase(d, pattern))
+
+
+def read_database(database_id: str, database, sql: str, request_options=None) -> DatabaseResult:
+    res = DatabaseResult(database_id)
+    started = time.monotonic()
+    try:
+        with database.snapshot() as snapshot:
+            result_set = snapshot.execute_sql(sql, request_options=request_options)
+            res.rows = list(result_set)
+            res.header = [f.name for f in result_set.fields]
+            res.types = structures.type_names(result_set.fields)
+    except Exception as e:  # pylint: disable=broad-except
+        # reported as the error of the database, the others go on
+        res.error = e
+    res.elapsed = time.monotonic() - started
+    return res
+
+
+def query(databases: Dict[str, object], sql: str, workers: int, request_options=None) -> structures.ResultContainer:
+    """Run a read query on every database concurrently, and merge the results.
+
+    :param databases: database_id to google.cloud.spanner_v1.database.Database
+    :param sql: read query
+    :param workers: max number of queries to run at the same time
+    :param request_options: google.cloud.spanner_v1.RequestOptions of the queries
+    :return: rows of all databases with the leading database column,
+        and the per database summary as message
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spanner-cli-fanout") as executor:
+        futures = [executor.submit(jobs.bind(read_database), database_id, database, sql, request_options)
+                   for database_id, database in databases.items()]
+        results = [f.result() for f in futures]
+    # the queries failed by the cancel are not reported as the errors of the databases
+    jobs.checkpoint(0)
+
+    header = []
+    types = []
+    for res in results:
+        if res.error is None:
+            header = res.header
+            types = res.types
+            break
+
+    data = []
+    for res in results:
+        if res.error is None and res.header != header:
+            res.error = ValueError(f"columns differ: {', '.join(res.header)}")
+        if res.error is not None:
+            continue
+        for row in res.rows:
+            data.append([res.database_id] + list(row))
+
+    failed = len([r for r in results if r.error is not None])
+    summary = [r.summary() for r in results]
+    summary.append(f"{len(results)} databases, {len(data):,} rows, {failed} failed, "
+                   f"max elapsed_time: {max((r.elapsed for r in results), default=0) * 1000:.1f} msecs")
+    return structures.ResultContainer(
+        data=data,
+        header=[DATABASE_COLUMN] + header,
+        types=["STRING"] + types,
+        message="\n".join(summary),
+        failed=failed,
+    )
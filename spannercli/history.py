@@ -0,0 +1,212 @@
+import datetime
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from prompt_toolkit.auto_suggest import AutoSuggest, Suggestion
+from prompt_toolkit.document import Document
+from prompt_toolkit.history import History
+from prompt_toolkit.key_binding import KeyBindings
+
+from spannercli.config import Constants
+
+#: lengths of the indexed prefixes of the text, longest first.
+#: the entries in an index are in the order of the id for each prefix, so a search reads the entries sharing
+#: the longest indexed prefix of the input from the most recent, and stops at the first matches.
+PREFIX_LENGTHS = (16, 4, 1)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS history ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " text TEXT NOT NULL,"
+    " created REAL NOT NULL,"
+    " database TEXT,"
+    " duration REAL,"
+    " rows INTEGER)",
+    # replaced by the prefix indexes, a range of the text had to be sorted by the id
+    "DROP INDEX IF EXISTS history_text",
+) + tuple(f"CREATE INDEX IF NOT EXISTS history_prefix{n} ON history (substr(text, 1, {n}))" for n in PREFIX_LENGTHS)
+
+
+def prefix_query(columns: str, prefix: str, before: Optional[int] = None, skip: Optional[str] = None) -> Tuple:
+    """SELECT of the entries starting with prefix, the most recent first, with the parameters except LIMIT
+
+    :param before: only the entries older than the id
+    :param skip: text of the entries to skip
+    """
+    conditions = []
+    params = []
+    length = next((n for n in PREFIX_LENGTHS if len(prefix) >= n), 0)
+    if length:
+        # the same expression as the index
+        conditions.append(f"substr(text, 1, {length}) = ?")
+        params.append(prefix[:length])
+    if len(prefix) > length:
+        conditions.append("substr(text, 1, ?) = ?")
+        params.extend((len(prefix), prefix))
+    if before is not None:
+        conditions.append("id < ?")
+        params.append(before)
+    if skip is not None:
+        conditions.append("text <> ?")
+        params.append(skip)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {columns} FROM history{where} ORDER BY id DESC LIMIT ?", params
+
+
+def parse_history_file(path: str) -> Iterable[Tuple[str, float]]:
+    """read entries of prompt_toolkit.history.FileHistory file, oldest first
+
+    # 2020-01-01 12:34:56.789012
+    +SELECT *
+    +FROM t
+    """
+    created = 0.0
+    lines = []
+    with open(path, "rb") as f:
+        for line_bytes in f:
+            line = line_bytes.decode("utf-8", errors="replace")
+            if line.startswith("+"):
+                lines.append(line[1:])
+                continue
+            if lines:
+                yield "".join(lines)[:-1], created
+                lines = []
+            if line.startswith("# "):
+                try:
+                    created = datetime.datetime.fromisoformat(line[2:].strip()).timestamp()
+                except ValueError:
+                    pass
+    if lines:
+        yield "".join(lines)[:-1], created
+
+
+class SQLiteHistory(History):
+    """History stored in SQLite, indexed by the prefixes of the text.
+
+    Only the recent `load_size` entries are loaded into the prompt, older entries are searched through the index.
+    Each entry can have the database, duration and rows of the query.
+    """
+
+    def __init__(self, path: str, load_size: int = Constants.HISTORY_LOAD_SIZE):
+        super().__init__()
+        self.path = path
+        self.load_size = load_size
+        self.last_id: Optional[int] = None
+        self._lock = threading.Lock()
+        # prompt_toolkit loads history in another thread
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            for sql in SCHEMA:
+                self._conn.execute(sql)
+
+    def load_history_strings(self) -> Iterable[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT text FROM history ORDER BY id DESC LIMIT ?",
+                                      (self.load_size,)).fetchall()
+        for row in rows:
+            yield row[0]
+
+    def store_string(self, string: str) -> None:
+        with self._lock, self._conn:
+            cur = self._conn.execute("INSERT INTO history (text, created) VALUES (?, ?)", (string, time.time()))
+            self.last_id = cur.lastrowid
+
+    def record(self, database: str, duration: float, rows: int):
+        """set the result of the last stored entry"""
+        if self.last_id is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE history SET database = ?, duration = ?, rows = ? WHERE id = ?",
+                               (database, duration, rows, self.last_id))
+
+    def search(self, prefix: str, limit: int = 1) -> List[Tuple]:
+        """entries starting with prefix, the most recent first
+
+        :return: list of (text, created, database, duration, rows)
+        """
+        sql, params = prefix_query("text, created, database, duration, rows", prefix)
+        with self._lock:
+            return self._conn.execute(sql, (*params, limit)).fetchall()
+
+    def previous(self, prefix: str, before: Optional[int] = None, skip: Optional[str] = None) -> Optional[Tuple]:
+        """the most recent entry starting with prefix, older than the id `before`
+
+        :param skip: text to skip, e.g. the entry already shown
+        :return: (id, text)
+        """
+        sql, params = prefix_query("id, text", prefix, before, skip)
+        with self._lock:
+            return self._conn.execute(sql, (*params, 1)).fetchone()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def import_file(self, path: str) -> int:
+        """import entries of FileHistory file"""
+        entries = list(parse_history_file(path))
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO history (text, created) VALUES (?, ?)", entries)
+        self._loaded = False
+        return len(entries)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AutoSuggestFromIndexedHistory(AutoSuggest):
+    """Suggest the most recent entry starting with the input, looked up through the index"""
+
+    def get_suggestion(self, buffer, document) -> Optional[Suggestion]:
+        history = buffer.history
+        text = document.text
+        if not text.strip() or not isinstance(history, SQLiteHistory):
+            return None
+        for found in history.search(text, limit=1):
+            return Suggestion(found[0][len(text):])
+        return None
+
+
+class HistorySearch(object):
+    """Search backward the entries starting with the input through the index, instead of the loaded history.
+
+    Each search goes to an older entry, until the input is edited.
+    """
+
+    def __init__(self):
+        self.prefix = ""
+        #: (id, text) of the entry shown
+        self.shown: Optional[Tuple] = None
+
+    def previous(self, buffer) -> bool:
+        """replace the input with the previous entry, False if there is none"""
+        history = buffer.history
+        if not isinstance(history, SQLiteHistory):
+            return False
+        if self.shown is None or self.shown[1] != buffer.text:
+            self.prefix = buffer.text
+            self.shown = None
+        found = history.previous(self.prefix, before=self.shown and self.shown[0], skip=buffer.text)
+        if found is None:
+            return False
+        self.shown = found
+        buffer.document = Document(found[1], len(found[1]))
+        return True
+
+
+def history_key_bindings() -> KeyBindings:
+    """Alt-P searches the entries starting with the input through HistorySearch,
+    Ctrl-R is left to the incremental search of prompt_toolkit
+    """
+    bindings = KeyBindings()
+    search = HistorySearch()
+
+    @bindings.add("escape", "p")
+    def _(event):
+        if not search.previous(event.current_buffer):
+            event.app.output.bell()
+
+    return bindings
@@ -0,0 +1,202 @@
+import contextlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, List, Optional
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def current() -> Optional["Job"]:
+    """the job running on this thread"""
+    return getattr(_local, "job", None)
+
+
+def checkpoint(rows: int = 1):
+    """count read rows of the current job, and stop it here if cancelled"""
+    job = current()
+    if job is None:
+        return
+    if job.cancelled:
+        raise JobCancelled(f"job [{job.job_id}] cancelled")
+    job.rows += rows
+
+
+def report(progress: str):
+    """show the progress of the current job, instead of the number of rows"""
+    job = current()
+    if job is not None:
+        job.progress = progress
+
+
+def on_cancel(cancel: Callable[[], None]) -> Callable[[], None]:
+    """call `cancel` when the current job, or a scope entered on this thread, is cancelled,
+    e.g. to cancel the gRPC call the worker is blocked on.
+
+    :return: function to unregister it when the call is finished, a job may run many calls
+    """
+    scopes = [s for s in [current()] + getattr(_local, "scopes", []) if s is not None]
+    for scope in scopes:
+        scope.add_canceller(cancel)
+
+    def unregister():
+        for scope in scopes:
+            scope.remove_canceller(cancel)
+    return unregister
+
+
+@contextlib.contextmanager
+def entered(scope: "CancelScope"):
+    """the calls started on this thread in the block are cancelled with the scope"""
+    _local.scopes = getattr(_local, "scopes", []) + [scope]
+    try:
+        yield scope
+    finally:
+        _local.scopes = _local.scopes[:-1]
+
+
+def bind(func: Callable) -> Callable:
+    """run the function in the current job on another thread, e.g. a task of a ThreadPoolExecutor,
+    so that its calls are cancelled with the job
+    """
+    job = current()
+
+    def run(*args, **kwargs):
+        previous = current()
+        _local.job = job
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.job = previous
+    return run
+
+
+def track(rows: Iterable) -> Iterator:
+    for row in rows:
+        checkpoint()
+        yield row
+
+
+class CancelScope(object):
+    """the calls to cancel at once with a job or a cursor, registered by on_cancel"""
+
+    def __init__(self):
+        self.cancelled = False
+        self._cancellers: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def add_canceller(self, cancel: Callable[[], None]):
+        with self._lock:
+            if not self.cancelled:
+                self._cancellers.append(cancel)
+                return
+        cancel()
+
+    def remove_canceller(self, cancel: Callable[[], None]):
+        with self._lock:
+            if cancel in self._cancellers:
+                self._cancellers.remove(cancel)
+
+    def clear(self):
+        with self._lock:
+            self._cancellers.clear()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            cancellers, self._cancellers = self._cancellers, []
+        for cancel in cancellers:
+            cancel()
+
+
+class Job(CancelScope):
+    """A query running on a worker thread.
+
+    The worker stops at the next row read from the stream (or before commit) and releases its session.
+    The streaming calls registered by on_cancel are cancelled at once, so that a worker waiting for
+    a slow stream stops without waiting for the next row.
+    """
+
+    def __init__(self, job_id: int, sql: str, func: Callable):
+        super().__init__()
+        self.job_id = job_id
+        self.sql = sql
+        self.func = func
+        self.rows = 0
+        self.progress: Optional[str] = None
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"spanner-cli-job-{job_id}", daemon=True)
+
+    def start(self) -> "Job":
+        self.thread.start()
+        return self
+
+    def _run(self):
+        _local.job = self
+        try:
+            self.result = self.func()
+        except BaseException as e:  # pylint: disable=broad-except
+            self.error = e
+        finally:
+            self.finished = time.monotonic()
+            self.clear()
+            self.done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def status(self) -> str:
+        if self.cancelled:
+            return "cancelled"
+        if not self.done.is_set():
+            return "running"
+        if self.error is not None:
+            return "failed"
+        return "done"
+
+
+class JobManager(object):
+    """registry of the queries running in background"""
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def submit(self, sql: str, func: Callable, background: bool = False) -> Job:
+        with self._lock:
+            job = Job(self._next_id, sql, func)
+            self._next_id += 1
+            if background:
+                self._jobs[job.job_id] = job
+        return job.start()
+
+    def get(self, job_id: Optional[int] = None) -> Optional[Job]:
+        """the job by id, or the latest one"""
+        with self._lock:
+            if job_id is None:
+                return next(reversed(self._jobs.values()), None)
+            return self._jobs.get(job_id)
+
+    def remove(self, job: Job):
+        with self._lock:
+            self._jobs.pop(job.job_id, None)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel_all(self):
+        for job in self.list():
+            job.cancel()
@@ -0,0 +1,177 @@
+"""
+Point reads by primary key or index key with the Read API, without parsing and planning SQL
+https://cloud.google.com/spanner/docs/reads#read_data_using_the_read_api
+"""
+import csv
+import datetime
+import decimal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from google.cloud.spanner_v1 import KeyRange, KeySet
+
+from spannercli import jobs, structures
+from spannercli.schema import Schema, Table
+from spannercli.settings import parse_bool
+
+
+def base_type(spanner_type: str) -> str:
+    """STRING(MAX) -> STRING"""
+    return spanner_type.split("(", 1)[0].strip().upper()
+
+
+def parse_numeric(text: str) -> decimal.Decimal:
+    try:
+        return decimal.Decimal(text)
+    except decimal.InvalidOperation as e:
+        raise ValueError(f"invalid NUMERIC: {text}") from e
+
+
+def parse_timestamp(text: str) -> datetime.datetime:
+    value = datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+    return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+
+
+#: parser of the key value for each type, BYTES are base64 encoded as the client library expects
+PARSERS = {
+    "INT64": int,
+    "FLOAT64": float,
+    "FLOAT32": float,
+    "BOOL": parse_bool,
+    "NUMERIC": parse_numeric,
+    "DATE": datetime.date.fromisoformat,
+    "TIMESTAMP": parse_timestamp,
+    "STRING": str,
+    "BYTES": str,
+}
+
+
+def parse_value(text: str, spanner_type: str):
+    parser = PARSERS.get(base_type(spanner_type))
+    if parser is None:
+        raise ValueError(f"{spanner_type} is not supported as a key")
+    return parser(text)
+
+
+def parse_key(parts: List[str], key_types: List[str]) -> Tuple[List, bool]:
+    """
+    :param parts: values of the leading key columns
+    :param key_types: spanner types of the key columns
+    :return: the key values, and whether it is a prefix of the key
+    """
+    if not parts:
+        raise ValueError("empty key")
+    if len(parts) > len(key_types):
+        raise ValueError(f"too many key values, expected {len(key_types)}: {', '.join(parts)}")
+    try:
+        values = [parse_value(p, t) for p, t in zip(parts, key_types)]
+    except ValueError as e:
+        raise ValueError(f"invalid key {', '.join(parts)}: {e}") from e
+    return values, len(parts) < len(key_types)
+
+
+def key_set(keys: List[Tuple[List, bool]]) -> KeySet:
+    """full keys as keys, prefixes as the ranges of all keys starting with them"""
+    return KeySet(keys=[k for k, prefix in keys if not prefix],
+                  ranges=[KeyRange(start_closed=k, end_closed=k) for k, prefix in keys if prefix])
+
+
+def read_columns(schema: Schema, table: Table, index: Optional[str] = None) -> Tuple[List[str], List[str]]:
+    """
+    :return: spanner types of the key columns, and the columns to read.
+        an index read returns only the columns in the index, its keys, STORING and the primary key
+    """
+    if table.view:
+        raise ValueError(f"{table.name} is a view, only tables can be read by key")
+    if index is None:
+        return [table.columns[c].spanner_type for c, _ in table.primary_key], list(table.columns)
+    found = schema.indexes.get(index)
+    if found is None or found.table != table.name:
+        raise ValueError(f"Index not found on {table.name}: {index}")
+    columns = [c for c, _ in found.columns] + found.storing + [c for c, _ in table.primary_key]
+    return [table.columns[c].spanner_type for c, _ in found.columns], list(dict.fromkeys(columns))
+
+
+def read_key_file(path: str) -> Iterator[List[str]]:
+    """keys in the file, a key per line and the columns of the composite key separated by comma"""
+    with open(path, newline="", encoding="utf8") as f:
+        for parts in csv.reader(f):
+            if parts and any(p.strip() for p in parts):
+                yield [p.strip() for p in parts]
+
+
+def chunks(items: Iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_chunk(database, table: str, columns: List[str], keys: List[Tuple[List, bool]], index: Optional[str],
+               request_options=None):
+    """
+    :return: fields and rows of the keys
+    """
+    with database.snapshot() as snapshot:
+        result_set = snapshot.read(table, columns, key_set(keys), index=index or "", request_options=request_options)
+        rows = list(result_set)
+        return result_set.fields, rows
+
+
+def collect(future, requested: int):
+    fields, rows = future.result()
+    jobs.checkpoint(len(rows))
+    jobs.report(f"{requested:,} keys requested")
+    return fields, rows
+
+
+def lookup(database, table: str, columns: List[str], keys: Iterable[List[str]],
+           key_types: List[str], index: Optional[str], chunk_size: int, workers: int,
+           request_options=None) -> structures.ResultContainer:
+    """Read the rows of the keys, chunked into key sets read concurrently.
+
+    :param keys: the key values as text, consumed lazily
+    :param request_options: google.cloud.spanner_v1.RequestOptions of the reads
+    :return: rows in the order of the chunks, and the summary as message
+    """
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spanner-cli-lookup")
+    pending = []
+    results = []
+    requested = 0
+    try:
+        for chunk in chunks((parse_key(k, key_types) for k in keys), chunk_size):
+            requested += len(chunk)
+            pending.append(executor.submit(
+                jobs.bind(read_chunk), database, table, columns, chunk, index, request_options))
+            # keep a bounded number of chunks in flight, the rest of the keys are not read yet
+            while len(pending) >= workers * 2:
+                results.append(collect(pending.pop(0), requested))
+        while pending:
+            results.append(collect(pending.pop(0), requested))
+    finally:
+        # shutdown(cancel_futures=True) is not available before Python 3.9
+        for f in pending:
+            f.cancel()
+        executor.shutdown(wait=False)
+
+    message = f"{requested:,} keys in {len(results)} reads, {sum(len(r) for _, r in results):,} rows," \
+              f" elapsed_time: {(time.monotonic() - started) * 1000:.1f} msecs"
+    return merge(results, columns, message)
+
+
+def merge(results: List[Tuple], columns: List[str], message: str) -> structures.ResultContainer:
+    """rows of all chunks into a single result"""
+    fields = next((f for f, _ in results if f), None)
+    if fields is None:
+        return structures.ResultContainer(data=[], header=columns, message=message)
+    container = structures.ColumnarResultContainer.empty(fields, message=message)
+    for _, rows in results:
+        for row in rows:
+            container.append(row)
+    return container
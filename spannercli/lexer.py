@@ -1,10 +1,9 @@
 import re
+from typing import Iterable, Type
 
 from pygments.lexer import RegexLexer, words
 from pygments.token import Keyword, Text, Comment, Name, Number, Operator, String, Punctuation
 
-from spannercli import commands
-
 #: SQL Syntax https://cloud.google.com/spanner/docs/query-syntax#sql-syntax
 syntax = (
     "ORDER BY",
@@ -51,6 +50,7 @@ syntax = (
     "DEFAULT",
     "DELETE",
     "UPDATE",
+    "PARTITIONED",
 )
 
 #: Reserved Keywords https://cloud.google.com/spanner/docs/lexical#reserved-keywords
@@ -333,20 +333,16 @@ ddl = (
     "ADD COLUMN",
 )
 
+#: Leading keywords of statements, to classify them in queryutils
+dml_statements = ("INSERT", "UPDATE", "DELETE")
+ddl_statements = ("CREATE", "ALTER", "DROP", "GRANT", "REVOKE", "RENAME", "ANALYZE")
+#: client side prefix to execute the DML as Partitioned DML, `PARTITIONED UPDATE ...`
+partitioned_dml = "PARTITIONED"
 
-class SpannerLexer(RegexLexer):
-    """
-    Special lexer for Spanner.
-    http://pygments.org/docs/lexerdevelopment/
-    """
 
-    name = 'Spanner'
-    aliases = ['spanner']
-    mimetypes = ['text/x-spanner']
-
-    flags = re.IGNORECASE
-
-    tokens = {
+def _tokens(command_names: Iterable[str]) -> dict:
+    command_names = tuple(command_names)
+    return {
         'root': [
             (r'\s+', Text),
             (r'--.*\n?', Comment.Single),
@@ -356,8 +352,10 @@ class SpannerLexer(RegexLexer):
             (words(datatypes, suffix=r'\b'), Name.Builtin),
             (words(functions, suffix=r'\b'), Name.Function),
             (words(ddl, suffix=r'\b'), Keyword),
+        ] + ([
             # Client commands
-            (words(commands.keys(), suffix=r'\b'), Name.Builtin),
+            (words(command_names, suffix=r'\b'), Name.Builtin),
+        ] if command_names else []) + [
             (r'[+*/<>=~!@#%^&|`?-]', Operator),
             (r'\d+', Number.Integer),
             (r'(\d+\.\d*|\d*\.\d+)(e[+-]?[0-9]+)?', Number.Float),
@@ -374,6 +372,28 @@ class SpannerLexer(RegexLexer):
         ],
     }
 
+
+class SpannerLexer(RegexLexer):
+    """
+    Special lexer for Spanner.
+    http://pygments.org/docs/lexerdevelopment/
+    """
+
+    name = 'Spanner'
+    aliases = ['spanner']
+    mimetypes = ['text/x-spanner']
+
+    flags = re.IGNORECASE
+
+    tokens = _tokens(())
+
     # pylint: disable=no-self-argument
     def analyse_text(text) -> float:
         return 0.01
+
+
+def spanner_lexer(command_names: Iterable[str]) -> Type[SpannerLexer]:
+    """SpannerLexer which also highlights the client commands, e.g. spannercli.commands.keys().
+    the names are given by the caller, the commands depend on queryutils which uses this vocabulary
+    """
+    return type("SpannerLexer", (SpannerLexer,), {"tokens": _tokens(command_names)})
@@ -1,10 +1,16 @@
+import datetime
+import itertools
 import logging
 import os
+import sqlite3
 import sys
+import time
 import warnings
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from google.cloud import spanner
-from google.cloud.spanner_v1 import types
+from google.cloud.spanner_v1 import param_types, types
 from google.api_core import exceptions as api_exceptions
 from google.api_core.gapic_v1 import client_info
 import click
@@ -23,19 +29,39 @@ from prompt_toolkit.layout.processors import (HighlightMatchingBracketProcessor,
 from pygments.styles import get_style_by_name
 
 from spannercli import __version__
-from spannercli import config, commands, structures, lexer, queryutils
+from spannercli import (advisor, channel, config, commands, ddl, diff, fanout, jobs, keyread, replay, retry,
+                        structures, lexer, queryutils)
+from spannercli.connection import DatabaseManager
+from spannercli.cursor import ResultCursor
+from spannercli.operations import OperationManager, TrackedOperation
+from spannercli.querylog import QueryLog
+from spannercli import schema as schema_model
+from spannercli.schema import Schema
+from spannercli.settings import Settings
+from spannercli.history import SQLiteHistory, AutoSuggestFromIndexedHistory, history_key_bindings
+from spannercli.table import StreamingTableRenderer
 from spannercli.completion import SQLCompleter
 
 
-class SpannerCli(object):
+class SpannerCli(object):  # pylint: disable=too-many-public-methods
     client = None
     instance = None
     database = None
     project = None
     history = None
+    cursor = None
+    last_result: Optional[structures.ResultContainer] = None
+    ddl_batch: Optional[ddl.DdlBatch] = None
 
     def __init__(self, project=None, instance=None, database=None, credentials=None, with_pager=False,
-                 inp=None, output=None):
+                 inp=None, output=None, query_log=None, client=None, settings: Optional[Settings] = None,
+                 channel_options: Optional[channel.ChannelOptions] = None):
+        """
+        :param client: google.cloud.spanner.Client, or the backend with the same interface
+            e.g. spannercli.fake.FakeClient. a Client of the project is created by default
+        :param settings: initial values of the settings, the defaults if None
+        :param channel_options: gRPC channel of the Client, the client library defaults if None
+        """
         # setup environment variables
         # less option for pager
         if not os.environ.get(config.EnvironmentVariables.LESS):
@@ -44,31 +70,37 @@ class SpannerCli(object):
         self.logger = logging.getLogger('spanner-cli')
         self.logger.debug("Staring spanner-cli project=%s, instance=%s, database=%s", project, instance, database)
         self.project = project
-        with warnings.catch_warnings(record=True) as warns:
-            warnings.simplefilter("always")
-            self.client = spanner.Client(
-                project=self.project,
-                credentials=credentials,
-                client_info=client_info.ClientInfo(user_agent=__name__),
-            )
-            if len(warns) > 0:
-                for w in warns:
-                    self.logger.debug(w)
-                    click.echo(message=w.message, err=True, nl=True)
+        self.client = client if client is not None else self.create_client(credentials)
+        self.channel_options = channel_options or channel.ChannelOptions()
 
         self.instance = self.client.instance(instance)
-        self.database = self.instance.database(database)
+        self.connections = DatabaseManager(self.instance,
+                                           capacity=config.Constants.DATABASE_CACHE_SIZE,
+                                           idle_timeout=config.Constants.DATABASE_IDLE_TIMEOUT,
+                                           list_ttl=config.Constants.DATABASE_LIST_TTL,
+                                           on_open=self.open_database)
+        self.jobs = jobs.JobManager()
+        self.settings = settings or Settings()
+        self.operations = OperationManager(config.Constants.OPERATION_POLL_INTERVAL,
+                                           config.Constants.OPERATION_HISTORY_SIZE,
+                                           listener=self.on_operations_changed)
+        self.query_log = QueryLog(query_log)
+        conn = self.connections.use(database)
+        self.database = conn.database
         self.prompt_message = self.get_prompt_message()
-        self.completer = SQLCompleter()
+        conn.completer = SQLCompleter()
+        self.completer = conn.completer
         self.open_history_file()
         self.rehash()
         self.session = PromptSession(
             message=self.prompt_message,
-            lexer=PygmentsLexer(lexer.SpannerLexer),
+            lexer=PygmentsLexer(lexer.spanner_lexer(commands.keys())),
             completer=DynamicCompleter(lambda: self.completer),
             style=style_from_pygments_cls(get_style_by_name(config.get_pygment_style())),
             history=self.history,
-            auto_suggest=AutoSuggestFromHistory(),
+            auto_suggest=AutoSuggestFromIndexedHistory() if isinstance(self.history, SQLiteHistory)
+            else AutoSuggestFromHistory(),
+            key_bindings=history_key_bindings() if isinstance(self.history, SQLiteHistory) else None,
             input_processors=[ConditionalProcessor(
                 processor=HighlightMatchingBracketProcessor(
                     chars='[](){}'),
@@ -79,149 +111,446 @@ class SpannerCli(object):
         )
 
         self.formatter = tabular_output.TabularOutputFormatter('ascii')
+        self.renderer = StreamingTableRenderer()
+
+    def create_client(self, credentials) -> spanner.Client:
+        with warnings.catch_warnings(record=True) as warns:
+            warnings.simplefilter("always")
+            client = spanner.Client(
+                project=self.project,
+                credentials=credentials,
+                client_info=self.default_client_info(),
+            )
+            if len(warns) > 0:
+                for w in warns:
+                    self.logger.debug(w)
+                    click.echo(message=w.message, err=True, nl=True)
+        return client
+
+    def open_database(self, database):
+        """use the channel of the options for the database of google.cloud.spanner.Client"""
+        if isinstance(self.client, spanner.Client):
+            self.channel_options.apply(database, self.client.credentials, self.default_client_info(),
+                                       channel.client_endpoint(self.client))
+
+    @staticmethod
+    def default_client_info() -> client_info.ClientInfo:
+        return client_info.ClientInfo(user_agent=__name__)
 
     def rehash(self):
         """
         rehashing for completion
         """
         self.set_completion_databases()
-        self.set_completion_tables()
-        self.set_completion_columns()
+        self.set_completion_catalog()
 
     def set_completion_databases(self):
         data = self.list_databases()
         self.completer.set_databases(data)
 
-    def set_completion_tables(self):
-        sql = "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_CATALOG='' AND TABLE_SCHEMA='';"
-        res = self.read_query(sql)
-        tables = []
-        for d in res.data:
-            tables.append(d[0])
-        self.completer.set_tables(tables)
-
-    def set_completion_columns(self):
-        sql = "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_CATALOG='' AND TABLE_SCHEMA='' "
-        res = self.read_query(sql)
-        columns = []
-        for d in res.data:
-            columns.append(d[0])
-        self.completer.set_columns(columns)
+    def set_completion_catalog(self):
+        self.completer.set_catalog(self.schema().catalog())
+
+    def schema(self, refresh: bool = False, database_id: Optional[str] = None) -> Schema:
+        """schema model of the database (the current one by default),
+        read by a single GetDatabaseDdl, and the columns of the views, and cached until a DDL is applied
+        """
+        if database_id is None:
+            conn = self.connections.peek(self.database.database_id)
+            database = self.database
+        else:
+            conn = self.connections.get(database_id)
+            database = conn.database
+        if conn is not None and conn.schema is not None and not refresh:
+            return conn.schema
+        statements = self.client.database_admin_api.get_database_ddl(database=database.name).statements
+        model = Schema(list(statements))
+        for view in (t for t in model.tables.values() if t.view):
+            view.columns = OrderedDict((c.name, c) for c in self.table_columns(view.name, database))
+        if conn is not None:
+            conn.schema = model
+        return model
+
+    def table_columns(self, table: str, database=None) -> List[schema_model.Column]:
+        """columns of the table or the view in INFORMATION_SCHEMA, empty if it does not exist"""
+        schema_name, table_name = schema_model.split_name(table)
+        with (database or self.database).snapshot() as snapshot:
+            rows = snapshot.execute_sql(schema_model.COLUMNS_SQL, params={"schema": schema_name, "table": table_name},
+                                        param_types={"schema": param_types.STRING, "table": param_types.STRING})
+            return [schema_model.Column(name, spanner_type, nullable == "YES", default)
+                    for name, spanner_type, default, nullable in rows]
+
+    def index_states(self) -> Dict[Tuple[str, str], str]:
+        """INDEX_STATE of the indexes of the current database by the table and the index name, not cached"""
+        with self.database.snapshot() as snapshot:
+            rows = snapshot.execute_sql(schema_model.INDEX_STATES_SQL)
+            return {(schema_model.join_name(schema_name, table), index): state
+                    for schema_name, table, index, state in rows}
+
+    def apply_schema_changes(self, database_id: str, statements: List[str]):
+        """update the completion by the applied DDL, without reading the whole schema"""
+        conn = self.connections.peek(database_id)
+        if conn is None:
+            return
+        conn.schema = None
+        if conn.completer is None:
+            return
+        current = database_id == self.database.database_id
+        completer = conn.completer
+        for sql in statements:
+            for change in ddl.parse_change(sql):
+                if completer.apply(change):
+                    continue
+                if not current:
+                    # reloaded when the database is used again
+                    conn.completer = None
+                    return
+                if change.action == ddl.REFRESH_TABLE:
+                    # only the table, the schema model is read again when it is used
+                    columns = self.table_columns(change.table)
+                    if columns:
+                        completer.set_table(change.table, [c.name for c in columns])
+                    else:
+                        completer.drop_table(change.table)
+                elif change.action == ddl.REFRESH:
+                    self.set_completion_catalog()
+                    return
 
     def open_history_file(self):
         history_file = os.path.expanduser(os.environ.get(config.EnvironmentVariables.HISTORY_FILE,
                                                          config.Constants.HISTORY_FILE))
-        if os.path.exists(os.path.dirname(history_file)):
-            self.history = FileHistory(history_file)
-        else:
+        history_db = os.path.expanduser(os.environ.get(config.EnvironmentVariables.HISTORY_DB,
+                                                       config.Constants.HISTORY_DB))
+        if not os.path.exists(os.path.dirname(history_db)):
             self.history = None
+            return
+        try:
+            self.history = SQLiteHistory(history_db)
+        except sqlite3.Error as e:
+            self.logger.exception(e)
+            self.history = FileHistory(history_file) if os.path.exists(os.path.dirname(history_file)) else None
+            return
+        if self.history.count() == 0 and os.path.exists(history_file):
+            imported = self.history.import_file(history_file)
+            self.logger.debug("imported %d entries from %s", imported, history_file)
+
+    def record_history(self, duration: float, rows: int):
+        if isinstance(self.history, SQLiteHistory):
+            self.history.record(self.database.database_id, duration, rows)
 
     def get_prompt_message(self) -> str:
-        return f"Spanner [{self.project}/{self.instance.display_name}/{self.database.database_id}]:\n> "
+        prompt = "> " if self.ddl_batch is None else "ddl> "
+        return f"Spanner [{self.project}/{self.instance.display_name}/{self.database.database_id}]:\n{prompt}"
 
     def list_databases(self):
         data = []
         try:
-            databases = self.instance.list_databases()
-            for d in databases:
-                data.append(d.database_id)
+            data = self.connections.list_databases()
         except api_exceptions.GoogleAPIError as e:
             # google.api_core.exceptions.PermissionDenied, if does not have sufficient permission
             self.logger.exception(e)
         return data
 
     def change_database(self, dbname):
-        self.database = self.instance.database(dbname)
+        conn = self.connections.use(dbname)
+        self.database = conn.database
         self.prompt_message = self.get_prompt_message()
+        if conn.completer is None:
+            conn.completer = SQLCompleter()
+            self.completer = conn.completer
+            self.rehash()
+        else:
+            self.completer = conn.completer
+
+    def request_options(self) -> types.RequestOptions:
+        """priority and tag of the settings, for every request"""
+        return types.RequestOptions(priority=f"PRIORITY_{self.settings.priority}",
+                                    request_tag=self.settings.request_tag)
+
+    def transaction_options(self) -> dict:
+        """keyword arguments of run_in_transaction, the tag of the transaction and the priority of the commit"""
+        return {"transaction_tag": self.settings.transaction_tag or None,
+                "commit_request_options": types.RequestOptions(priority=f"PRIORITY_{self.settings.priority}")}
+
+    def retry_policy(self, hints: Optional[Dict[str, str]] = None) -> retry.RetryPolicy:
+        """deadline and retries of the settings, overridden by the hints of the statement"""
+        values = {name: getattr(self.settings, name) for name in retry.SETTINGS}
+        for name, value in (hints or {}).items():
+            if name not in retry.SETTINGS:
+                hint_names = ", ".join(queryutils.CLIENT_HINT_PREFIX + n.upper() for n in retry.SETTINGS)
+                raise ValueError(f"Unknown hint: {queryutils.CLIENT_HINT_PREFIX}{name.upper()}, one of {hint_names}")
+            values[name] = self.settings.parse(name, value)
+        return retry.RetryPolicy(**values)
+
+    def fanout_query(self, sql: str, pattern: Optional[str] = None) -> structures.ResultContainer:
+        """run a read query on all databases (matching to the glob pattern) in the instance"""
+        if queryutils.classify(sql, commands.is_command) != queryutils.QUERY:
+            raise ValueError("only read query is available to run on all databases.")
+        database_ids = fanout.filter_databases(self.list_databases(), pattern)
+        if not database_ids:
+            raise ValueError(f"no database matched to {pattern}")
+        # more databases than the cache keeps are not evicted while the queries are running
+        with self.connections.pinned(database_ids):
+            databases = {d: self.connections.get(d).database for d in database_ids}
+            return fanout.query(databases, queryutils.clean(sql), config.Constants.FANOUT_WORKERS,
+                                self.request_options())
+
+    def read_keys(self, table_name: str, keys: Iterable[List[str]],
+                  index: Optional[str] = None) -> structures.ResultContainer:
+        """read the rows of the keys (or key prefixes) by the Read API, with the index if given"""
+        schema = self.schema()
+        table = schema.table(table_name)
+        if table is None:
+            raise ValueError(f"Table not found: {table_name}")
+        key_types, columns = keyread.read_columns(schema, table, index)
+        return keyread.lookup(self.database, table.name, columns, keys, key_types, index,
+                              config.Constants.LOOKUP_CHUNK_SIZE, config.Constants.LOOKUP_WORKERS,
+                              self.request_options())
+
+    def diff_table(self, table_name: str, target: str) -> structures.ResultContainer:
+        """
+        compare the rows of the table with the table in another database, or another table
 
-    def query(self, sql) -> structures.ResultContainer:
+        :param target: database_id, or database_id.table. the same table name if omitted
+        """
+        target_database_id, _, target_name = target.partition(".")
+        source_table = self.schema().table(table_name)
+        if source_table is None:
+            raise ValueError(f"Table not found: {table_name}")
+        target_table = self.schema(database_id=target_database_id).table(target_name or source_table.name)
+        if target_table is None:
+            raise ValueError(f"Table not found: {target}")
+        key_columns, columns, notes = diff.compared_columns(source_table, target_table)
+        source = diff.Side(f"{self.database.database_id}.{source_table.name}", self.database, source_table.name)
+        target_side = diff.Side(f"{target_database_id}.{target_table.name}",
+                                self.connections.get(target_database_id).database, target_table.name)
+        table_diff = diff.TableDiff(source, target_side, key_columns, columns,
+                                    datetime.datetime.now(datetime.timezone.utc),
+                                    config.Constants.DIFF_ROW_LIMIT, config.Constants.DIFF_MAX_DIFFERENCES,
+                                    self.request_options())
+        return table_diff.run(config.Constants.DIFF_RANGES, config.Constants.DIFF_WORKERS, notes)
+
+    def query(self, sql, page_size: Optional[int] = config.Constants.MAX_RESULT) -> structures.ResultContainer:
         self.logger.debug("QUERY: %s", sql)
-        if queryutils.is_write_query(sql):
-            return self.write_query(sql)
-        if queryutils.is_ddl_query(sql):
-            return self.ddl_query(sql)
-        return self.read_query(sql)
-
-    def read_query(self, sql) -> structures.ResultContainer:
+        sql, hints = queryutils.client_hints(sql)
+        policy = self.retry_policy(hints)
+        statement = queryutils.parse(sql)
+        mode = statement.kind
+        if mode == queryutils.COMMAND:
+            mode = queryutils.QUERY
+        started = time.monotonic()
+        result = None
+        error = None
+        try:
+            if mode == queryutils.DML:
+                result = self.write_query(statement.text, policy)
+            elif mode == queryutils.PARTITIONED_DML:
+                result = self.partitioned_dml_query(statement.text)
+            elif mode == queryutils.DDL:
+                result = self.ddl_query(statement.text)
+            else:
+                result = self.read_query(sql, page_size, policy)
+            retries = policy.summary()
+            if retries is not None:
+                result.meta['retries'] = retries
+                message = result.meta.get('message')
+                result.meta['message'] = retries if not message else f"{message}\n{retries}"
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.log_query(sql, mode, time.monotonic() - started, result, error)
+
+    def log_query(self, sql: str, mode: str, elapsed: float, result: Optional[structures.ResultContainer],
+                  error: Optional[Exception]):
+        rows = None
+        query_stats = None
+        if result is not None:
+            rows = result.meta.get('row_count', len(result))
+            query_stats = result.meta.get('query_stats')
+        self.query_log.record(sql, self.database.database_id, mode, elapsed * 1000,
+                              rows=rows, query_stats=query_stats, error=error)
+
+    def read_query(self, sql, page_size: Optional[int] = config.Constants.MAX_RESULT,
+                   policy: Optional[retry.RetryPolicy] = None) -> structures.ResultContainer:
+        """
+        :param sql: query
+        :param page_size:
+            rows to read at first. when the query returns more rows,
+            the stream is kept open as `self.cursor` to fetch the rest later.
+            None to read all rows.
+        :param policy: deadline and retries of the query, of the settings by default
+        """
+        call_options = (policy or self.retry_policy()).call_options()
         meta = {}
-        if sql.strip().endswith('\\G'):
+        statement = queryutils.parse(sql)
+        if statement.vertical:
             meta['format'] = 'vertical'
-            sql = sql[:-2]
+        sql = statement.text
+
+        query_mode = types.spanner.ExecuteSqlRequest.QueryMode.PROFILE
+        if page_size is None:
+            with self.database.snapshot() as snapshot:
+                result_set = snapshot.execute_sql(sql, query_mode=query_mode, request_options=self.request_options(),
+                                                  **call_options)
+                result = structures.ColumnarResultContainer.from_result_set(result_set, jobs.track(result_set),
+                                                                            **meta)
+                result.meta['message'] = structures.format_query_stats(result_set.stats)
+                result.meta['query_stats'] = structures.parse_query_stats(result_set.stats)
+                return result
+
+        self.close_cursor()
+        cur = ResultCursor.open(self.database, sql, page_size, config.Constants.CURSOR_IDLE_TIMEOUT,
+                                query_mode=query_mode, request_options=self.request_options(), **call_options)
+        cur.meta = meta
+        try:
+            return self.fetch_page(cur)
+        except BaseException:
+            cur.close()
+            raise
 
+    def plan_query(self, sql: str) -> List[advisor.PlanNode]:
+        query_mode = types.spanner.ExecuteSqlRequest.QueryMode.PLAN
         with self.database.snapshot() as snapshot:
-            result_set = snapshot.execute_sql(sql,
-                                              query_mode=types.spanner.ExecuteSqlRequest.QueryMode.PROFILE)
-            data = []
-            limit = config.Constants.MAX_RESULT
-            count = 0
-            for row in result_set:
-                data.append(row)
-                count = count+1
-                if count > limit:
-                    break
-            header = []
-            for h in result_set.fields:
-                header.append(h.name)
-            message = ""
-            if result_set.stats:
-                # stats.query_stats
-                # {
-                #   'elapsed_time': string_value: "0.91 msecs",
-                #   'query_text': string_value: "select 1;"
-                #   'rows_scanned': string_value: "0",
-                #   'rows_returned': string_value: "1",
-                #   'cpu_time': string_value: "0.23 msecs",
-                #   'runtime_creation_time': string_value: "0 msecs",
-                #   'query_plan_creation_time': string_value: "0.23 msecs"
-                # }
-                message = "rows_returned: {returned:,}, " \
-                    "scanned: {scanned:}, " \
-                    "elapsed_time: {elapsed}, " \
-                    "cpu_time:{cpu}".format(
-                        returned=int(result_set.stats.query_stats['rows_returned']),
-                        scanned=int(result_set.stats.query_stats['rows_scanned']),
-                        elapsed=result_set.stats.query_stats['elapsed_time'],
-                        cpu=result_set.stats.query_stats['cpu_time'],
-                    )
-            if count > limit and message == "":
-                message = f"returns over limit: {limit}, aborted to read all results, stats is not available."
-            meta['message'] = message
+            result_set = snapshot.execute_sql(sql, query_mode=query_mode, request_options=self.request_options())
+            for _ in result_set:
+                pass
+            return advisor.parse_plan(result_set.stats.query_plan)
+
+    def advise(self, sql: str) -> List[advisor.Finding]:
+        """findings of the query plan, with the indexes of the database"""
+        nodes = self.plan_query(queryutils.parse(sql).text)
+        return advisor.advise(nodes, advisor.parse_indexes(self.schema().index_columns()))
+
+    def table_sizes(self) -> Dict[str, int]:
+        """used bytes of each table, empty if the statistics are not available"""
+        try:
+            result = self.read_query(advisor.TABLE_SIZES_SQL, page_size=None)
+        except api_exceptions.GoogleAPICallError as e:
+            self.logger.exception(e)
+            return {}
+        return {r[0]: r[1] for r in result.data}
+
+    def confirm_scan(self, sql: str) -> bool:
+        """ask before running a full scan of a large table when `scan_guard` is on"""
+        if not self.settings.scan_guard or queryutils.classify(sql, commands.is_command) != queryutils.QUERY:
+            return True
+        findings = self.advise(sql)
+        tables = advisor.full_scan_tables(findings)
+        if not tables:
+            return True
+        sizes = self.table_sizes()
+        # tables without statistics are treated as large
+        large = [t for t in tables if sizes.get(t) is None or sizes[t] >= self.settings.scan_guard_bytes]
+        if not large:
+            return True
+        for f in findings:
+            if f.is_full_scan():
+                click.secho(f"{f.kind} of {f.target}, {f.detail}" + (f", try: {f.suggestion}" if f.suggestion else ""),
+                            err=True, fg="yellow")
+        names = ", ".join(f"{t} ({advisor.format_bytes(sizes.get(t))})" for t in large)
+        return click.confirm(f"Run a full scan of {names}?", default=False, err=True)
+
+    def fetch_page(self, cur: ResultCursor, size: Optional[int] = None) -> structures.ResultContainer:
+        """read next rows from the cursor, it is kept as `self.cursor` while it has more rows"""
+        meta = dict(cur.meta)
+        data = cur.fetch(size)
+        if cur.has_more():
+            self.cursor = cur
+            meta['message'] = f"fetched {cur.fetched:,} rows, more rows are available. " \
+                              "type `\\more` or `\\next N` to fetch them."
+        else:
+            self.cursor = None
+            if cur.exhausted:
+                meta['message'] = structures.format_query_stats(cur.stats)
+                meta['query_stats'] = structures.parse_query_stats(cur.stats)
+            else:
+                meta['message'] = f"fetched {cur.fetched:,} rows, the stream was closed by idle timeout."
+        return structures.ColumnarResultContainer.from_rows(data, cur.fields, **meta)
 
-        return structures.ResultContainer(
-            data=data,
-            header=header,
-            **meta
-        )
+    def close_cursor(self):
+        if self.cursor is not None:
+            self.cursor.close()
+            self.cursor = None
 
-    def write_query(self, sql: str) -> structures.ResultContainer:
+    def write_query(self, sql: str, policy: Optional[retry.RetryPolicy] = None) -> structures.ResultContainer:
+        """
+        :param policy: deadline and retries of the DML and the transaction, of the settings by default
+        """
         meta = {}
+        policy = policy or self.retry_policy()
 
         def execute(transaction):
-            status, sequence = transaction.batch_update([sql])
+            status, sequence = transaction.batch_update([sql], request_options=self.request_options(),
+                                                        **retry.accepted(transaction.batch_update,
+                                                                         policy.call_options()))
             if status.code != 0:
                 raise ValueError(f"code={status.code}, {status.message}")
             meta['message'] = f"{sequence[0]} row affected."
+            meta['row_count'] = sequence[0]
+            # rollback if cancelled before commit
+            jobs.checkpoint(0)
 
-        self.database.run_in_transaction(execute)
+        policy.run_in_transaction(self.database, execute, **self.transaction_options())
         return structures.ResultContainer(
             data=[],
             header=[],
             **meta
         )
 
+    def partitioned_dml_query(self, sql: str) -> structures.ResultContainer:
+        """`PARTITIONED UPDATE ...` or `PARTITIONED DELETE ...`, the prefix is removed to execute as Partitioned DML"""
+        row_count = self.database.execute_partitioned_dml(sql.split(maxsplit=1)[1],
+                                                          request_options=self.request_options())
+        return structures.ResultContainer(
+            data=[],
+            header=[],
+            message=f"{row_count} row affected (lower bound).",
+            row_count=row_count,
+        )
+
     def ddl_query(self, sql: str) -> structures.ResultContainer:
         sql = queryutils.clean(sql)
-        if sql.upper().startswith("CREATE DATABASE") or sql.upper().startswith("DROP DATABASE"):
+        if self.ddl_batch is not None:
+            # CREATE DATABASE and DROP DATABASE are rejected, they would run ahead of the batch
+            self.ddl_batch.add(sql)
+            return structures.ResultContainer(
+                data=[],
+                header=[],
+                message=f"buffered, {len(self.ddl_batch.statements)} statements. type `\\ddl apply` to run them.",
+            )
+        if ddl.is_database_statement(sql):
             return self.create_or_drop_database(sql)
-        meta = {}
-        operation = self.database.update_ddl([sql])
+        return self.update_ddl([sql])
+
+    def update_ddl(self, statements: List[str]) -> structures.ResultContainer:
+        """apply the statements as a single schema change.
+        it runs in background with `async_operations`, or wait for it with the progress of each statement.
+        """
+        operation = self.database.update_ddl(statements)
+        if self.settings.async_operations:
+            op = self.operations.submit(self.database.database_id, statements, operation,
+                                        on_done=lambda op: self.apply_schema_changes(op.database_id,
+                                                                                     op.statements))
+            return self.operation_started(op)
+        try:
+            while not operation.done():
+                jobs.report(ddl.summary(ddl.progress(statements, operation.metadata)))
+                jobs.checkpoint(0)
+                time.sleep(config.Constants.DDL_POLL_INTERVAL)
+        except jobs.JobCancelled:
+            operation.cancel()
+            raise
         operation.result()
-        meta['message'] = "operation done."
-        self.rehash()
+        self.apply_schema_changes(self.database.database_id, statements)
+        data = []
+        for sql, percent, committed in ddl.progress(statements, operation.metadata):
+            data.append([sql, None if percent is None else f"{percent}%", "committed" if committed else None])
         return structures.ResultContainer(
-            data=[],
-            header=[],
-            **meta
+            data=data,
+            header=["Statement", "Progress", "Status"],
+            message="operation done.",
         )
 
     def create_or_drop_database(self, sql: str) -> structures.ResultContainer:
@@ -230,22 +559,56 @@ class SpannerCli(object):
         database = self.instance.database(database_id, [])
         if sql.startswith("CREATE"):
             operation = database.create()
+            if self.settings.async_operations:
+                op = self.operations.submit(database_id, [sql], operation, on_done=self.database_created)
+                return self.operation_started(op)
             operation.result()
             meta['message'] = f"Created database {database_id} on instance {self.instance.display_name}"
         elif sql.startswith("DROP"):
             database.drop()
+            self.connections.discard(database_id)
             meta['message'] = f"Drop database {database_id} on instance {self.instance.display_name}"
         else:
             raise NotImplementedError(f"NotImplemented operation: {sql}")
 
-        self.rehash()
+        self.connections.invalidate()
+        self.set_completion_databases()
         return structures.ResultContainer(
             data=[],
             header=[],
             **meta
         )
 
-    def interact(self):  # pylint: disable=too-many-return-statements
+    def operation_started(self, op: TrackedOperation) -> structures.ResultContainer:
+        return structures.ResultContainer(
+            data=[],
+            header=[],
+            message=f"operation [{op.op_id}] started, type `\\ops` to see the progress.",
+        )
+
+    def database_created(self, _: TrackedOperation):
+        self.connections.invalidate()
+        self.set_completion_databases()
+
+    def on_operations_changed(self):
+        """show the operations in the toolbar of the prompt, called on the polling thread"""
+        session = getattr(self, "session", None)
+        if session is None:
+            return
+        session.bottom_toolbar = self.operations.toolbar()
+        if session.app.is_running:
+            session.app.invalidate()
+
+    def notify_operations(self):
+        """show the finished operations and apply their changes, called before the prompt"""
+        finished = self.operations.pop_notifications()
+        for op in finished:
+            click.secho(f"operation {op.summary()}", err=True, fg="red" if op.error is not None else "green")
+        if finished:
+            self.on_operations_changed()
+
+    def interact(self):
+        self.notify_operations()
         try:
             text = self.session.prompt(self.prompt_message)
         except KeyboardInterrupt:
@@ -256,41 +619,91 @@ class SpannerCli(object):
             if not text.strip():
                 return
 
-        try:
-            # command
-            result = commands.execute(self, text)
+        started = time.monotonic()
+        rows = None
+        for statement in queryutils.split(text, commands.is_command):
+            if statement.kind == queryutils.COMMAND:
+                ok, result = self.run_command(statement.text)
+            else:
+                ok, result = self.run_statement(statement.text)
+                if result is not None:
+                    rows = (rows or 0) + len(result)
+            if not ok:
+                # stop the rest of the statements
+                break
             if result is not None:
+                if statement.vertical:
+                    result.meta['format'] = 'vertical'
                 self.output(result)
-            return
+        if rows is not None:
+            self.record_history(time.monotonic() - started, rows)
+
+    def run_command(self, text: str) -> Tuple[bool, Optional[structures.ResultContainer]]:
+        """
+        :return: succeeded or not, and the result
+        """
+        try:
+            return True, commands.execute(self, text)
         except api_exceptions.GoogleAPIError as e:
             self.logger.exception(e)
             print("\n", e, "\n")
-            return
         except EOFError as e:
             self.logger.exception(e)
             raise e
         except commands.CommandError as e:
             self.logger.exception(e)
             print("\n", e, "\n")
-            return
         except commands.CommandNotFound:
-            pass
+            return self.run_statement(text)
+        return False, None
 
+    def run_statement(self, sql: str) -> Tuple[bool, Optional[structures.ResultContainer]]:
+        """
+        :return: succeeded or not, and the result. not succeeded when cancelled
+        """
         try:
-            # query
-            result = self.query(text)
-            self.output(result)
-            return
+            if not self.confirm_scan(sql):
+                return False, None
+            result = self.run_job(sql)
+            return result is not None, result
         except api_exceptions.GoogleAPICallError as e:
             message = "\n" + bytes(e.message, "utf8").decode("unicode_escape") + "\n"
             click.secho(message=message, err=True, nl=True, fg="red")
             self.logger.exception(e)
-            return
         except Exception as e:  # pylint: disable=broad-except
             click.secho(message="\n" + str(e) + "\n", err=True, nl=True, fg="red")
             self.logger.exception(e)
+        return False, None
+
+    def run_job(self, sql: str) -> Optional[structures.ResultContainer]:
+        """run the query on a worker thread, Ctrl-C to cancel"""
+        job = self.jobs.submit(sql, lambda: self.query(sql))
+        return self.wait_job(job)
+
+    def wait_job(self, job: jobs.Job) -> Optional[structures.ResultContainer]:
+        """wait for the job with a spinner, and return its result. None if cancelled by Ctrl-C"""
+        spinner = itertools.cycle("|/-\\")
+        try:
+            while not job.wait(config.Constants.SPINNER_INTERVAL):
+                progress = job.progress or f"running... {job.rows:,} rows"
+                click.echo(f"\r\033[K{next(spinner)} {progress}, {job.elapsed():.1f}s", err=True, nl=False)
+        except KeyboardInterrupt:
+            job.cancel()
+            click.echo("\r\033[K", err=True, nl=False)
+            click.secho(f"\ncancelled, {job.rows:,} rows, {job.elapsed():.1f}s\n", err=True, fg="red")
+            return None
+        finally:
+            self.jobs.remove(job)
+        if job.elapsed() > config.Constants.SPINNER_INTERVAL:
+            click.echo("\r\033[K", err=True, nl=False)
+        if job.error is not None:
+            raise job.error
+        return job.result
 
     def output(self, result: structures.ResultContainer):
+        if result.meta.get('types') is not None:
+            # for \cell to show a whole value
+            self.last_result = result
         if len(result) > 0:
             opt = {
                 'dialect': 'unix',
@@ -299,13 +712,21 @@ class SpannerCli(object):
                 'column_types': str,
             }
             format_name = result.format()
-            if format_name is not None:
+            self.renderer.max_width = self.settings.cell_width
+            if format_name is None:
+                # ascii table, rendered in a single pass
+                formatted = self.renderer.render(result.data, result.header, result.meta.get('types'),
+                                                 result.column_widths())
+            else:
                 opt['format_name'] = format_name
-
-            formatted = self.formatter.format_output(
-                result.data, result.header, **opt)
+                data = result.data
+                if format_name == 'vertical':
+                    cell_types = result.meta.get('types') or [None] * len(result.header)
+                    data = ([self.renderer.cell_text(v, t) for v, t in zip(row, cell_types)] for row in data)
+                formatted = self.formatter.format_output(
+                    data, result.header, **opt)
             if self.with_pager:
-                click.echo_via_pager("\n".join(list(formatted)))
+                click.echo_via_pager(n + "\n" for n in formatted)
             else:
                 for n in formatted:
                     click.secho(n)
@@ -317,8 +738,17 @@ class SpannerCli(object):
                 self.interact()
         except EOFError:
             print("bye")
-
-    def batch(self, query):
+        finally:
+            self.jobs.cancel_all()
+            self.operations.close()
+            self.close_cursor()
+            self.connections.close()
+            self.channel_options.close()
+            self.query_log.close()
+
+    def batch(self, query, fanout_pattern=None):
+        # exit after the operations finished
+        self.settings.set("async_operations", "off")
         if query is None:
             buf = []
             for l in sys.stdin:
@@ -326,10 +756,21 @@ class SpannerCli(object):
             query = ''.join(buf)
         try:
             # query
-            result = self.query(query.strip())
-            result.meta['format'] = "tsv"
-            result.meta['message'] = None
-            self.output(result)
+            failed = False
+            for statement in queryutils.split(query, commands.is_command):
+                if fanout_pattern is not None:
+                    result = self.fanout_query(statement.text, fanout_pattern)
+                    click.echo(result.meta['message'], err=True)
+                else:
+                    result = self.query(statement.text, page_size=None)
+                    if result.meta.get('retries'):
+                        click.echo(result.meta['retries'], err=True)
+                result.meta['format'] = "tsv"
+                result.meta['message'] = None
+                self.output(result)
+                failed = failed or bool(result.meta.get('failed'))
+            if failed:
+                sys.exit(1)
             return
         except api_exceptions.InvalidArgument as e:
             message = "\n" + bytes(e.message, "utf8").decode("unicode_escape") + "\n"
@@ -341,6 +782,14 @@ class SpannerCli(object):
             self.logger.exception(e)
             sys.exit(1)
 
+    def replay(self, path: str, mode: str, concurrency: int, skip_dml: bool, speed: float):
+        """re-execute the recorded statements against the database, and print the latency differences"""
+        records = replay.load(path, commands.is_command)
+        result = replay.Replay(self.database, records, mode=mode, concurrency=concurrency, skip_dml=skip_dml,
+                               speed=speed, request_options=self.request_options(),
+                               transaction_options=self.transaction_options()).run()
+        self.output(result)
+
 
 def is_batch(execute):
     return execute is not None or not sys.stdin.isatty()
@@ -364,7 +813,27 @@ def initialize_logger(debug=False):
     logger.debug('Initialized the logger for debug')
 
 
-@click.command()
+#: keys of ctx.meta, the options grouped by the callbacks
+SETTINGS_META = "spannercli.settings"
+CHANNEL_META = "spannercli.channel"
+
+
+def setting_option(ctx, param, value):
+    """the option sets the setting of the same name, in the Settings of ctx.meta"""
+    settings = ctx.meta.setdefault(SETTINGS_META, Settings())
+    if value is not None:
+        try:
+            settings.set(param.name, value)
+        except ValueError as e:
+            raise click.BadParameter(str(e)) from e
+
+
+def channel_option(ctx, param, value):
+    """the option is the keyword argument of the same name of ChannelOptions, kept in ctx.meta"""
+    ctx.meta.setdefault(CHANNEL_META, {})[param.name] = value
+
+
+@click.group(invoke_without_command=True)
 @click.option("-p", "--project", envvar=config.EnvironmentVariables.GCP_PROJECT, required=True,
               help="Google Cloud Platform Project for spanner. ${GCP_PROJECT}")
 @click.option("-i", "--instance", envvar=config.EnvironmentVariables.SPANNER_INSTANCE_ID, required=True,
@@ -377,9 +846,40 @@ def initialize_logger(debug=False):
 @click.option('--pager/--no-pager', default=False, show_default=True,
               help="use ${PAGER} (default LESS) to print output.")
 @click.option("-e", "--execute", help="Execute command and quit.")
+@click.option("--fanout", "fanout_pattern", metavar="GLOB",
+              help="Execute the read query on all databases matching to GLOB ('*' for all) and quit.")
+@click.option("--query-log", envvar=config.EnvironmentVariables.QUERY_LOG, type=click.Path(dir_okay=False),
+              help="Append a JSON line for each statement to the file. ${SPANNER_CLI_QUERY_LOG}")
+@click.option("--priority", type=click.Choice(config.Constants.PRIORITIES, case_sensitive=False),
+              callback=setting_option, expose_value=False,
+              help="Priority of the requests and commits, same as `\\set priority`.")
+@click.option("--request-tag", callback=setting_option, expose_value=False,
+              help="Tag of the requests, same as `\\set request_tag`. 'off' for no tag.")
+@click.option("--transaction-tag", callback=setting_option, expose_value=False,
+              help="Tag of the transactions, same as `\\set transaction_tag`. 'off' for no tag.")
+@click.option("--timeout", metavar="SECONDS", callback=setting_option, expose_value=False,
+              help="Deadline of each query and DML, same as `\\set timeout`. e.g. 30, 500ms")
+@click.option("--max-retries", metavar="N", callback=setting_option, expose_value=False,
+              help="Retries of UNAVAILABLE calls and aborted transactions, same as `\\set max_retries`.")
+@click.option("--retry-delay", metavar="SECONDS", callback=setting_option, expose_value=False,
+              help="Wait before the first retry, multiplied for the following retries. `\\set retry_delay`")
+@click.option("--compression", type=click.Choice(tuple(channel.COMPRESSIONS)), default="none", show_default=True,
+              callback=channel_option, expose_value=False,
+              help="Compression of the gRPC messages, gzip for large results over a slow network.")
+@click.option("--max-receive-message-size", metavar="BYTES", type=click.IntRange(min=1),
+              callback=channel_option, expose_value=False,
+              help="Max size of a gRPC message to receive.  [default: no limit]")
+@click.option("--keepalive", metavar="SECONDS", type=click.FloatRange(min=0, min_open=True),
+              default=config.Constants.CHANNEL_KEEPALIVE, show_default=True,
+              callback=channel_option, expose_value=False,
+              help="Interval of the keepalive pings of the gRPC connections.")
+@click.option("--channels", metavar="N", type=click.IntRange(min=1), default=1, show_default=True,
+              callback=channel_option, expose_value=False,
+              help="Number of the gRPC channels to spread the calls over.")
 @click.option("-v", "--version", is_flag=True, help="show version.")
 @click.option("--debug", help="Debug mode.", is_flag=True)
-def main(project, instance, database, credential, pager, execute, version, debug):
+@click.pass_context
+def main(ctx, project, instance, database, credential, pager, execute, fanout_pattern, query_log, version, debug):
     """A Google Cloud Spanner terminal client with auto-completion and syntax highlighting.
 
     https://github.com/shoma/spanner-cli
@@ -388,16 +888,26 @@ def main(project, instance, database, credential, pager, execute, version, debug
         print('spanner-cli:', __version__)
         sys.exit(0)
     initialize_logger(debug)
-    batch_mode = is_batch(execute)
+    settings = ctx.meta.get(SETTINGS_META)
+    channel_options = channel.ChannelOptions(**ctx.meta[CHANNEL_META])
+    if ctx.invoked_subcommand is not None:
+        ctx.obj = {"project": project, "instance": instance, "database": database,
+                   "credentials": config.resolve_credential(credential), "query_log": query_log,
+                   "settings": settings, "channel_options": channel_options}
+        return
+    batch_mode = is_batch(execute) or fanout_pattern is not None
     if batch_mode:
         cli = SpannerCli(
             project=project,
             instance=instance,
             database=database,
             credentials=config.resolve_credential(credential),
-            inp=posix_pipe.PosixPipeInput()
+            inp=posix_pipe.PosixPipeInput(),
+            query_log=query_log,
+            settings=settings,
+            channel_options=channel_options,
         )
-        cli.batch(execute)
+        cli.batch(execute, fanout_pattern)
         sys.exit(0)
 
     cli = SpannerCli(
@@ -406,9 +916,35 @@ def main(project, instance, database, credential, pager, execute, version, debug
         database=database,
         credentials=config.resolve_credential(credential),
         with_pager=pager,
+        query_log=query_log,
+        settings=settings,
+        channel_options=channel_options,
     )
     cli.run()
 
 
+@main.command("replay")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--mode", type=click.Choice(replay.MODES), default=replay.PACED, show_default=True,
+              help="paced keeps the recorded intervals between the statements, fast runs them back to back.")
+@click.option("--concurrency", type=click.IntRange(min=1), default=1, show_default=True,
+              help="Max number of statements running at the same time.")
+@click.option("--speed", type=click.FloatRange(min=0, min_open=True), default=1.0, show_default=True,
+              help="Multiplier of the recorded pacing.")
+@click.option("--skip-dml", is_flag=True, help="Do not run DML. DDL and client commands are never replayed.")
+@click.pass_obj
+def replay_command(obj, file, mode, concurrency, speed, skip_dml):
+    """Re-execute the statements of the query log or the history FILE against the database,
+    and report the latency differences by statement fingerprint.
+    """
+    cli = SpannerCli(inp=posix_pipe.PosixPipeInput(), **obj)
+    try:
+        cli.replay(file, mode, concurrency, skip_dml, speed)
+    finally:
+        cli.connections.close()
+        cli.channel_options.close()
+        cli.query_log.close()
+
+
 if __name__ == '__main__':
     main()  # pylint: disable=no-value-for-parameter
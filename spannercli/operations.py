@@ -0,0 +1,207 @@
+"""
+Long-running operations (schema changes, database creation) tracked in background,
+so the prompt is not blocked while they run.
+"""
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, List, Optional
+
+from spannercli import ddl
+
+logger = logging.getLogger('spanner-cli')
+
+
+class TrackedOperation(object):
+    def __init__(self, op_id: int, database_id: str, statements: List[str], operation,
+                 on_done: Optional[Callable[["TrackedOperation"], None]] = None):
+        """
+        :param op_id: local id of the operation
+        :param database_id: target database
+        :param statements: DDL statements, or the CREATE DATABASE statement
+        :param operation: google.api_core.operation.Operation
+        :param on_done: called by OperationManager.pop_notifications when the operation succeeded,
+            on the thread of the prompt instead of the polling thread
+        """
+        self.op_id = op_id
+        self.database_id = database_id
+        self.statements = statements
+        self.operation = operation
+        self.on_done = on_done
+        self.metadata = None
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+        self.started = datetime.datetime.now()
+        self.started_monotonic = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    def poll(self) -> bool:
+        """refresh the state, and return True if the operation has just finished"""
+        if self.done:
+            return False
+        try:
+            done = self.operation.done()
+            self.metadata = self.operation.metadata
+            if done:
+                self.error = self.operation.exception()
+        except Exception as e:  # pylint: disable=broad-except
+            done = True
+            self.error = e
+        if done:
+            self.finished = time.monotonic()
+        return done
+
+    def cancel(self):
+        self.cancelled = True
+        self.operation.cancel()
+
+    def is_ddl(self) -> bool:
+        return self.metadata is not None and hasattr(self.metadata, "commit_timestamps")
+
+    def progress(self):
+        """progress of each statement, see ddl.progress"""
+        return ddl.progress(self.statements, self.metadata if self.is_ddl() else None)
+
+    def percent(self) -> Optional[int]:
+        if self.done and self.error is None:
+            return 100
+        if not self.is_ddl():
+            return None
+        states = self.progress()
+        return sum(p or 0 for _, p, _ in states) // len(states)
+
+    def status(self) -> str:
+        if self.cancelled:
+            return "cancelled"
+        if not self.done:
+            return "running"
+        if self.error is not None:
+            return "failed"
+        return "done"
+
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started_monotonic
+
+    def statement(self) -> str:
+        text = " ".join(self.statements[0].split()) if self.statements else ""
+        if len(self.statements) > 1:
+            text += f" (+{len(self.statements) - 1})"
+        return text
+
+    def summary(self) -> str:
+        line = f"[{self.op_id}] {self.status()} in {self.elapsed():.0f}s: {self.statement()}"
+        if self.error is not None and not self.cancelled:
+            line += f"\n{self.error}"
+        return line
+
+
+class OperationManager(object):
+    """registry of the long-running operations, polled on a background thread while any of them is running"""
+
+    def __init__(self, poll_interval: float, history_size: int, listener: Optional[Callable[[], None]] = None):
+        """
+        :param poll_interval: seconds between polls
+        :param history_size: number of finished operations to keep
+        :param listener: called on the polling thread when the state of operations changed
+        """
+        self.poll_interval = poll_interval
+        self.history_size = history_size
+        self.listener = listener
+        self._operations = OrderedDict()
+        self._notifications = deque()
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, database_id: str, statements: List[str], operation,
+               on_done: Optional[Callable[[TrackedOperation], None]] = None) -> TrackedOperation:
+        with self._lock:
+            op = TrackedOperation(self._next_id, database_id, statements, operation, on_done)
+            self._next_id += 1
+            self._operations[op.op_id] = op
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, name="spanner-cli-operations", daemon=True)
+                self._thread.start()
+        self._notify()
+        return op
+
+    def get(self, op_id: int) -> Optional[TrackedOperation]:
+        with self._lock:
+            return self._operations.get(op_id)
+
+    def list(self) -> List[TrackedOperation]:
+        with self._lock:
+            return list(self._operations.values())
+
+    def running(self) -> List[TrackedOperation]:
+        return [op for op in self.list() if not op.done]
+
+    def pop_notifications(self) -> List[TrackedOperation]:
+        """operations finished since the last call, after calling on_done of the succeeded ones"""
+        with self._lock:
+            finished = list(self._notifications)
+            self._notifications.clear()
+        for op in finished:
+            if op.error is None and op.on_done is not None:
+                try:
+                    op.on_done(op)
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.exception(e)
+        return finished
+
+    def toolbar(self) -> Optional[str]:
+        """one line status of the operations for the prompt, None if nothing to show"""
+        with self._lock:
+            finished = list(self._notifications)
+        items = [f"[{op.op_id}] {op.status()}" for op in finished]
+        for op in self.running():
+            percent = op.percent()
+            items.append(f"[{op.op_id}] {'running' if percent is None else f'{percent}%'} {op.statement()[:40]}")
+        if not items:
+            return None
+        return "operations: " + " | ".join(items)
+
+    def poll(self) -> bool:
+        """poll running operations once, return True if any of them is still running"""
+        changed = False
+        for op in self.running():
+            if op.poll():
+                changed = True
+                with self._lock:
+                    self._notifications.append(op)
+            elif op.is_ddl():
+                changed = True
+        with self._lock:
+            finished = sorted((op for op in self._operations.values() if op.done), key=lambda op: op.finished)
+            for op in finished[:max(0, len(finished) - self.history_size)]:
+                del self._operations[op.op_id]
+        if changed:
+            self._notify()
+        return bool(self.running())
+
+    def _poll(self):
+        while not self._closed.wait(self.poll_interval):
+            running = self.poll()
+            with self._lock:
+                if not running and not any(not op.done for op in self._operations.values()):
+                    self._thread = None
+                    return
+        with self._lock:
+            self._thread = None
+
+    def _notify(self):
+        if self.listener is not None:
+            try:
+                self.listener()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.exception(e)
+
+    def close(self):
+        self._closed.set()
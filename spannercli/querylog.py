@@ -0,0 +1,94 @@
+import datetime
+import json
+import logging
+import math
+import threading
+from collections import OrderedDict, deque
+from typing import List, Optional
+
+from spannercli import queryutils
+from spannercli.config import Constants
+from spannercli.structures import ResultContainer
+
+logger = logging.getLogger('spanner-cli')
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(p / 100.0 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class QueryLog(object):
+    """Structured log of executed statements.
+
+    Every record is kept in memory for `\\stats` of the session, and appended to `path` as a JSON line if given.
+    """
+
+    def __init__(self, path: Optional[str] = None, session_size: int = Constants.QUERY_LOG_SESSION_SIZE):
+        self.path = path
+        self.records = deque(maxlen=session_size)
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf8") if path else None  # pylint: disable=consider-using-with
+
+    def record(self, sql: str, database: str, mode: str, client_latency_ms: float, rows: Optional[int] = None,
+               query_stats: Optional[dict] = None, error: Optional[BaseException] = None) -> dict:
+        query_stats = query_stats or {}
+        entry = OrderedDict(
+            timestamp=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            database=database,
+            fingerprint=queryutils.fingerprint(sql),
+            fingerprint_id=queryutils.fingerprint_id(sql),
+            mode=mode,
+            rows=rows,
+            rows_scanned=query_stats.get('rows_scanned'),
+            client_latency_ms=round(client_latency_ms, 3),
+            server_latency_ms=query_stats.get('server_latency_ms'),
+            cpu_time_ms=query_stats.get('cpu_time_ms'),
+            error=None if error is None else str(error),
+            query=sql,
+        )
+        with self._lock:
+            self.records.append(entry)
+            if self._file is not None:
+                try:
+                    self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    self._file.flush()
+                except OSError as e:
+                    logger.exception(e)
+        return entry
+
+    def stats(self) -> ResultContainer:
+        """latency summary of the session by fingerprint, slowest first"""
+        groups = OrderedDict()
+        with self._lock:
+            for r in self.records:
+                groups.setdefault(r['fingerprint_id'], []).append(r)
+
+        data = []
+        for records in groups.values():
+            latencies = [r['client_latency_ms'] for r in records]
+            scanned = [r['rows_scanned'] for r in records if r['rows_scanned'] is not None]
+            returned = [r['rows'] for r in records if r['rows'] is not None]
+            data.append([
+                records[-1]['fingerprint'],
+                len(records),
+                len([r for r in records if r['error'] is not None]),
+                round(percentile(latencies, 50), 1),
+                round(percentile(latencies, 95), 1),
+                round(max(latencies), 1),
+                sum(scanned) if scanned else None,
+                sum(returned) if returned else None,
+            ])
+        data.sort(key=lambda d: d[5], reverse=True)
+        header = ["Fingerprint", "Count", "Errors", "p50(ms)", "p95(ms)", "max(ms)", "Rows scanned", "Rows returned"]
+        return ResultContainer(data=data, header=header)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
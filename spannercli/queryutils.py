@@ -1,14 +1,237 @@
+import hashlib
 import re
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from spannercli.lexer import ddl_statements, dml_statements, partitioned_dml
+
+QUERY = "query"
+DML = "dml"
+PARTITIONED_DML = "partitioned_dml"
+DDL = "ddl"
+COMMAND = "command"
+
+_comment = r"""(?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)"""
+_string = r"""(?P<string>[bBrR]{0,2}(?:'{3}(?:[^'\\]|\\.|'(?!''))*'{3}|"{3}(?:[^"\\]|\\.|"(?!""))*"{3}""" \
+          r"""|'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"))"""
+_quoted = r"""(?P<quoted>`(?:[^`\\]|\\.)*`)"""
+_vertical = r"""(?P<vertical>\\G(?!\w))"""
+_command = r"""(?P<command>\\[\w?]+)"""
+# unterminated string or comment consumes the rest of the text
+_unterminated = r"""(?P<unterminated>(?:['"`]|/\*).*)"""
+
+#: tokens of SQL and client commands, in a single pass
+_tokens = re.compile("|".join([
+    r"(?P<space>\s+)", _comment, _string, _quoted, _vertical, _command,
+    r"(?P<word>\w+)", r"(?P<semicolon>;)", r"(?P<open>[(\[{])", r"(?P<close>[)\]}])", _unterminated,
+    r"(?P<punct>.)",
+]), re.DOTALL)
+
+#: only the tokens which may contain or be a terminator, to split statements without tokenizing everything.
+#: each match consumes the plain text before the token, the other characters are matched one by one.
+_boundaries = re.compile(r"""[^-#/'"`\\;]*(?:""" + "|".join([
+    _comment, _string, _quoted, _vertical, _command, r"(?P<semicolon>;)", _unterminated, r"(?P<other>.)",
+]) + ")", re.DOTALL)
+
+_insignificant = ("space", "comment")
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    start: int
+
+
+class Statement(NamedTuple):
+    #: statement without the terminator and the leading comments
+    text: str
+    #: QUERY, DML, PARTITIONED_DML, DDL or COMMAND
+    kind: str
+    #: terminated by `\\G`
+    vertical: bool = False
+
+
+def tokenize(sql: str, significant: bool = True) -> Iterator[Token]:
+    """
+    :param sql: text to tokenize
+    :param significant: skip spaces and comments
+    """
+    for m in _tokens.finditer(sql):
+        kind = m.lastgroup
+        if significant and kind in _insignificant:
+            continue
+        yield Token(kind, m.group(), m.start())
+
+
+def join_paths(tokens: Iterable[Token]) -> List[Token]:
+    """names in a named schema, e.g. sch.T or `sch`.`T`, as a single token of the kind "path" """
+    joined = []
+    for token in tokens:
+        if token.kind in ("word", "quoted") and len(joined) > 1 and joined[-1].text == "." \
+                and joined[-2].kind in ("word", "quoted", "path"):
+            joined.pop()
+            head = joined.pop()
+            token = Token("path", f"{head.text}.{token.text}", head.start)
+        joined.append(token)
+    return joined
+
+
+def path_name(token: Token) -> str:
+    """name of a word, a quoted name or a path, without the backquotes"""
+    if token.kind == "quoted":
+        return token.text[1:-1]
+    if token.kind == "path":
+        return token.text.replace("`", "")
+    return token.text
+
+
+def _main_keyword(tokens: Iterator[Token]) -> Optional[str]:
+    """the keyword following the common table expressions of `WITH ...`"""
+    depth = 0
+    previous = None
+    for token in tokens:
+        if token.kind == "open":
+            depth += 1
+        elif token.kind == "close":
+            depth -= 1
+        elif depth == 0 and token.kind == "word" and previous is not None and previous.kind == "close":
+            return token.text.upper()
+        previous = token
+    return None
+
+
+def _skip_hints(token: Optional[Token], tokens: Iterator[Token]) -> Optional[Token]:
+    """skip statement hints `@{...}` and parentheses, to find the first keyword"""
+    depth = 0
+    while token is not None:
+        if depth:
+            if token.kind == "open":
+                depth += 1
+            elif token.kind == "close":
+                depth -= 1
+        elif token.text == "{":
+            depth = 1
+        elif token.text not in ("@", "("):
+            break
+        token = next(tokens, None)
+    return token
+
+
+def classify_tokens(tokens: Iterable[Token], text: str = "",  # pylint: disable=too-many-return-statements
+                    is_command: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    :param tokens: significant tokens of a statement, only the leading tokens are read in most cases
+    :param text: the statement, to find client commands
+    :param is_command: tells the text is a client command without a backslash, e.g. `SHOW TABLES`,
+        spannercli.commands.is_command. they are classified as QUERY if not given
+    """
+    tokens = iter(tokens)
+    first = next(tokens, None)
+    if first is not None and first.kind == "command":
+        return COMMAND
+    token = _skip_hints(first, tokens)
+    if token is None or token.kind != "word":
+        return QUERY
+
+    keyword = token.text.upper()
+    if keyword == "WITH":
+        keyword = _main_keyword(tokens)
+    if keyword in dml_statements:
+        return DML
+    if keyword == partitioned_dml:
+        following = next(tokens, None)
+        if following is not None and following.text.upper() in dml_statements:
+            return PARTITIONED_DML
+    if keyword in ddl_statements:
+        return DDL
+    if token is first and text and is_command is not None and is_command(text):
+        return COMMAND
+    return QUERY
+
+
+def split(sql: str, is_command: Optional[Callable[[str], bool]] = None) -> List[Statement]:
+    """split the text into statements by `;` and `\\G` in linear time.
+    client commands end at them as well, e.g. `\\watch 5 SELECT ...` may span lines.
+
+    :param is_command: see classify_tokens
+    """
+    statements = []
+    # span of the current statement
+    start = end = None
+    position = 0
+
+    def flush(vertical=False):
+        nonlocal start
+        if start is not None:
+            text = sql[start:end]
+            statements.append(Statement(text, classify_tokens(tokenize(text), text, is_command), vertical))
+        start = None
+
+    def gap(begin, stop):
+        # plain text between the boundary tokens
+        nonlocal start, end
+        text = sql[begin:stop]
+        if text and not text.isspace():
+            if start is None:
+                start = begin + len(text) - len(text.lstrip())
+            end = begin + len(text.rstrip())
+
+    for m in _boundaries.finditer(sql):
+        kind = m.lastgroup
+        if kind == "other":
+            gap(position, m.end())
+            position = m.end()
+            continue
+        gap(position, m.start(kind))
+        position = m.end()
+        if kind == "comment":
+            continue
+        if kind in ("semicolon", "vertical"):
+            flush(kind == "vertical")
+            continue
+        if start is None:
+            start = m.start(kind)
+        end = m.end()
+    gap(position, len(sql))
+    flush()
+    return statements
+
+
+def parse(sql: str, is_command: Optional[Callable[[str], bool]] = None) -> Statement:
+    """the first statement of the text"""
+    statements = split(sql, is_command)
+    if not statements:
+        return Statement("", QUERY)
+    return statements[0]
+
+
+def classify(sql: str, is_command: Optional[Callable[[str], bool]] = None) -> str:
+    return parse(sql, is_command).kind
 
 
 def is_write_query(sql: str) -> bool:
-    q = ["INSERT", "UPDATE", "DELETE"]
-    return True in [sql.upper().startswith(n) for n in q]
+    return classify(sql) in (DML, PARTITIONED_DML)
 
 
 def is_ddl_query(sql: str) -> bool:
-    q = ["CREATE", "ALTER", "DROP"]
-    return True in [sql.upper().startswith(n) for n in q]
+    return classify(sql) == DDL
+
+
+def last_statement(sql: str) -> Optional[List[Token]]:
+    """significant tokens of the last statement, to complete the input
+
+    :return: None if the text ends in a comment or an unterminated string
+    """
+    tokens = []
+    last = None
+    for token in tokenize(sql, significant=False):
+        last = token
+        if token.kind in ("semicolon", "vertical"):
+            tokens = []
+        elif token.kind not in _insignificant:
+            tokens.append(token)
+    if last is not None and (last.kind == "unterminated" or (last.kind == "comment" and not last.text.endswith("*/"))):
+        return None
+    return tokens
 
 
 def find_last_word(sql: str) -> str:
@@ -31,3 +254,141 @@ def clean(sql: str) -> str:
     if sql.endswith(';'):
         sql = sql[:-1]
     return sql
+
+
+#: numeric literal at a word starting with a digit, or at the dot of .5
+_number = re.compile(r"0[xX][0-9a-fA-F]+\b|(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\b")
+#: kinds of the tokens after which + and - are operators, not the sign of a number
+_operands = ("word", "quoted", "string", "number", "close", "path")
+_in_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def _literal_tokens(sql: str) -> Iterator[Token]:
+    """tokens of the text including spaces and comments, with each numeric literal and its sign
+    as a single token of the kind "number", e.g. 1.5e3 and -1 of `a = -1`, but not of `a - 1`
+    """
+    # kind of the last significant token
+    previous = None
+    end = 0
+    for m in _tokens.finditer(sql):
+        start = m.start()
+        if start < end:
+            # a part of the number, e.g. .5 of 1.5
+            continue
+        kind = m.lastgroup
+        text = m.group()
+        number = None
+        if kind == "word":
+            if text[0].isdigit():
+                number = _number.match(sql, start)
+        elif kind == "punct" and text in "+-." and previous not in _operands:
+            number = _number.match(sql, start + (text != "."))
+        if number is not None:
+            kind = "number"
+            text = sql[start:number.end()]
+            end = number.end()
+        if kind not in _insignificant:
+            previous = kind
+        yield Token(kind, text, start)
+
+
+def fingerprint(sql: str) -> str:
+    """normalize the query by replacing literals with `?`, to group the same kind of queries
+
+    SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'foo'
+    -> SELECT * FROM t WHERE id IN (?+) AND name = ?
+    """
+    replaced = {"space": " ", "comment": " ", "string": "?", "number": "?"}
+    sql = "".join(replaced.get(t.kind, t.text) for t in _literal_tokens(sql))
+    sql = _in_list.sub("(?+)", sql)
+    return clean(" ".join(sql.split()))
+
+
+def fingerprint_id(sql: str) -> str:
+    """short hash of the fingerprint"""
+    return hashlib.sha1(fingerprint(sql).encode("utf8")).hexdigest()[:16]
+
+
+#: the literal is compared to an expression, or is the number of rows of LIMIT and OFFSET
+_parameter_context = re.compile(r"(?:[=<>]|\bLIKE|\bLIMIT|\bOFFSET)\s*$", re.IGNORECASE)
+_escapes = {"\\": "\\", "'": "'", '"': '"', "n": "\n", "t": "\t", "r": "\r"}
+
+
+def _literal_value(token: Token):
+    """value of the literal, None when it should be kept in the text"""
+    text = token.text
+    if token.kind == "number":
+        if text.lstrip("+-").lower().startswith("0x"):
+            return int(text, 16)
+        return int(text) if text.lstrip("+-").isdigit() else float(text)
+    # raw, bytes and triple quoted strings are kept as they are
+    if text[0] not in "'\"" or text.startswith(("'''", '"""')):
+        return None
+    body = text[1:-1]
+    if re.search(r"\\[^\\'\"ntr]", body):
+        return None
+    return re.sub(r"\\(.)", lambda e: _escapes[e.group(1)], body)
+
+
+def parameterize(sql: str) -> (str, List):
+    """replace the literal values of the conditions and LIMIT with query parameters @p1, @p2, ...
+
+    the statement stays the same when only the values change, so the cached query plan is reused.
+
+    SELECT * FROM t WHERE id = 1 AND name LIKE 'a%' ORDER BY 1 LIMIT 10
+    -> SELECT * FROM t WHERE id = @p1 AND name LIKE @p2 ORDER BY 1 LIMIT @p3, [1, 'a%', 10]
+    """
+    values = []
+    out = []
+    position = 0
+    for token in _literal_tokens(sql):
+        if token.kind not in ("string", "number") or not _parameter_context.search(sql, position, token.start):
+            continue
+        value = _literal_value(token)
+        if value is None:
+            continue
+        values.append(value)
+        out.extend([sql[position:token.start], f"@p{len(values)}"])
+        position = token.start + len(token.text)
+    out.append(sql[position:])
+    return "".join(out), values
+
+
+#: prefix of the statement hints for the cli, removed before the statement is sent
+CLIENT_HINT_PREFIX = "CLI_"
+
+
+def client_hints(sql: str) -> Tuple[str, Dict[str, str]]:
+    """take the hints for the cli out of the leading statement hint, the other hints are kept
+
+    @{CLI_TIMEOUT=5s, USE_ADDITIONAL_PARALLELISM=TRUE} SELECT ...
+    -> @{USE_ADDITIONAL_PARALLELISM=TRUE} SELECT ..., {"timeout": "5s"}
+    """
+    tokens = tokenize(sql)
+    at = next(tokens, None)
+    brace = next(tokens, None)
+    if at is None or brace is None or at.text != "@" or brace.text != "{":
+        return sql, {}
+    depth = 1
+    for token in tokens:
+        depth += {"open": 1, "close": -1}.get(token.kind, 0)
+        if depth == 0:
+            end = token.start
+            break
+    else:
+        return sql, {}
+    hints = {}
+    kept = []
+    for hint in sql[brace.start + 1:end].split(","):
+        name, _, value = hint.partition("=")
+        name = name.strip()
+        if name.upper().startswith(CLIENT_HINT_PREFIX):
+            hints[name[len(CLIENT_HINT_PREFIX):].lower()] = value.strip()
+        elif hint.strip():
+            kept.append(hint.strip())
+    if not hints:
+        return sql, {}
+    rest = sql[end + 1:]
+    if kept:
+        return f"{sql[:at.start]}@{{{', '.join(kept)}}}{rest}", hints
+    return sql[:at.start] + rest.lstrip(), hints
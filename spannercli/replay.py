@@ -0,0 +1,214 @@
+"""
+Replay of recorded statements against a database.
+
+The statements are read from the structured query log (JSON lines), the SQLite history,
+or the prompt_toolkit history file. They are executed again with the recorded pacing or
+as fast as possible, and the latencies are compared with the recording by fingerprint.
+"""
+import datetime
+import functools
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+from google.cloud.spanner_v1 import types
+
+from spannercli import queryutils, structures
+from spannercli.history import parse_history_file
+from spannercli.querylog import percentile
+
+PACED = "paced"
+FAST = "fast"
+MODES = (PACED, FAST)
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+class Record(object):
+    """a recorded statement
+
+    :param created: unix time the statement was run
+    :param latency_ms: recorded latency, None if unknown
+    """
+
+    def __init__(self, text: str, kind: str, created: float, latency_ms: Optional[float] = None):
+        self.text = text
+        self.kind = kind
+        self.created = created
+        self.latency_ms = latency_ms
+        self.fingerprint = queryutils.fingerprint(text)
+        self.replay_ms: Optional[float] = None
+        self.error: Optional[Exception] = None
+
+
+def statements(text: str, created: float, latency_ms: Optional[float],
+               is_command: Optional[Callable[[str], bool]] = None) -> List[Record]:
+    """statements of an entry, the latency is known only for an entry of a single statement
+
+    :param is_command: see queryutils.classify_tokens
+    """
+    parsed = queryutils.split(text, is_command)
+    if len(parsed) != 1:
+        latency_ms = None
+    return [Record(s.text, s.kind, created, latency_ms) for s in parsed]
+
+
+def read_query_log(path: str, is_command: Optional[Callable[[str], bool]] = None) -> Iterable[Record]:
+    with open(path, encoding="utf8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            created = datetime.datetime.fromisoformat(entry["timestamp"]).timestamp()
+            latency_ms = entry.get("client_latency_ms") if entry.get("error") is None else None
+            yield from statements(entry["query"], created, latency_ms, is_command)
+
+
+def read_history_db(path: str, is_command: Optional[Callable[[str], bool]] = None) -> Iterable[Record]:
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT text, created, duration FROM history ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    for text, created, duration in rows:
+        yield from statements(text, created, None if duration is None else duration * 1000, is_command)
+
+
+def read_history_file(path: str, is_command: Optional[Callable[[str], bool]] = None) -> Iterable[Record]:
+    for text, created in parse_history_file(path):
+        yield from statements(text, created, None, is_command)
+
+
+def load(path: str, is_command: Optional[Callable[[str], bool]] = None) -> List[Record]:
+    """records of the query log, the SQLite history or the history file, oldest first
+
+    :param is_command: tells the client commands, which are not replayed. spannercli.commands.is_command
+    """
+    with open(path, "rb") as f:
+        head = f.read(len(SQLITE_MAGIC))
+    if head == SQLITE_MAGIC:
+        records = read_history_db(path, is_command)
+    elif head.lstrip().startswith(b"{"):
+        records = read_query_log(path, is_command)
+    else:
+        records = read_history_file(path, is_command)
+    return sorted(records, key=lambda r: r.created)
+
+
+def execute(database, record: Record, request_options=None, transaction_options: Optional[dict] = None):
+    """run the statement as the cli does, reading all rows of a query
+
+    :param transaction_options: keyword arguments of run_in_transaction
+    """
+    if record.kind == queryutils.DML:
+        database.run_in_transaction(
+            lambda transaction: transaction.execute_update(record.text, request_options=request_options),
+            **(transaction_options or {}))
+    elif record.kind == queryutils.PARTITIONED_DML:
+        database.execute_partitioned_dml(record.text.split(maxsplit=1)[1], request_options=request_options)
+    else:
+        with database.snapshot() as snapshot:
+            for _ in snapshot.execute_sql(record.text, query_mode=types.spanner.ExecuteSqlRequest.QueryMode.PROFILE,
+                                          request_options=request_options):
+                pass
+
+
+class Replay(object):
+    """
+    :param mode: PACED to keep the recorded intervals between the statements, FAST to run them back to back
+    :param concurrency: max number of statements running at the same time
+    :param skip_dml: not to run DML and Partitioned DML. DDL and client commands are never replayed
+    :param speed: multiplier of the recorded pacing
+    :param request_options: google.cloud.spanner_v1.RequestOptions of the statements
+    :param transaction_options: keyword arguments of run_in_transaction for DML
+    """
+
+    def __init__(self, database, records: List[Record], mode: str = FAST, concurrency: int = 1,
+                 skip_dml: bool = False, speed: float = 1.0, request_options=None,
+                 transaction_options: Optional[dict] = None, execute_func: Optional[Callable] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        if mode not in MODES:
+            raise ValueError(f"unknown mode: {mode}, one of {', '.join(MODES)}")
+        if concurrency < 1 or speed <= 0:
+            raise ValueError("concurrency and speed must be positive")
+        self.database = database
+        self.mode = mode
+        self.concurrency = concurrency
+        self.speed = speed
+        self.execute_func = execute_func or functools.partial(execute, request_options=request_options,
+                                                              transaction_options=transaction_options)
+        self.clock = clock
+        self.sleep = sleep
+        skipped_kinds = {queryutils.DDL, queryutils.COMMAND}
+        if skip_dml:
+            skipped_kinds |= {queryutils.DML, queryutils.PARTITIONED_DML}
+        self.records = [r for r in records if r.kind not in skipped_kinds]
+        self.skipped = len(records) - len(self.records)
+        self.elapsed = 0.0
+
+    def run_one(self, record: Record):
+        started = self.clock()
+        try:
+            self.execute_func(self.database, record)
+        except Exception as e:  # pylint: disable=broad-except
+            record.error = e
+        record.replay_ms = (self.clock() - started) * 1000
+
+    def run(self) -> structures.ResultContainer:
+        slots = threading.Semaphore(self.concurrency)
+
+        def task(record):
+            try:
+                self.run_one(record)
+            finally:
+                slots.release()
+
+        started = self.clock()
+        origin = self.records[0].created if self.records else 0.0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="spanner-cli-replay") as executor:
+            for record in self.records:
+                if self.mode == PACED:
+                    wait = (record.created - origin) / self.speed - (self.clock() - started)
+                    if wait > 0:
+                        self.sleep(wait)
+                slots.acquire()  # pylint: disable=consider-using-with
+                executor.submit(task, record)
+        self.elapsed = self.clock() - started
+        return self.report()
+
+    def report(self) -> structures.ResultContainer:
+        """latency of the recording and the replay by fingerprint, the largest regression first"""
+        groups = OrderedDict()
+        for r in self.records:
+            groups.setdefault(r.fingerprint, []).append(r)
+        data = []
+        for fingerprint, records in groups.items():
+            recorded = percentile([r.latency_ms for r in records if r.latency_ms is not None], 50)
+            replayed = percentile([r.replay_ms for r in records if r.error is None], 50)
+            delta = None if recorded is None or replayed is None else replayed - recorded
+            data.append([
+                fingerprint,
+                len(records),
+                len([r for r in records if r.error is not None]),
+                None if recorded is None else round(recorded, 1),
+                None if replayed is None else round(replayed, 1),
+                None if delta is None else round(delta, 1),
+                None if delta is None or not recorded else f"{delta / recorded * 100:+.0f}%",
+            ])
+        data.sort(key=lambda d: float("-inf") if d[5] is None else d[5], reverse=True)
+        header = ["Fingerprint", "Count", "Errors", "recorded p50(ms)", "replay p50(ms)", "delta(ms)", "delta(%)"]
+        return structures.ResultContainer(data=data, header=header, message="\n".join(self.summary()))
+
+    def summary(self) -> List[str]:
+        errors = [r for r in self.records if r.error is not None]
+        message = [f"replayed {len(self.records):,} statements in {self.elapsed:.1f}s, {self.mode},"
+                   f" concurrency {self.concurrency}"]
+        if self.skipped:
+            message.append(f"skipped {self.skipped:,} statements")
+        if errors:
+            message.append(f"{len(errors):,} errors, first: {errors[0].error}")
+        return message
@@ -0,0 +1,113 @@
+"""
+Deadlines and retries of the statements.
+
+The client library retries UNAVAILABLE calls and aborted transactions by its own defaults, for up to
+an hour and without telling anyone. A RetryPolicy bounds them by the `timeout`, `max_retries` and
+`retry_delay` settings, or the `@{CLI_...}` hints of a statement, and counts the retries to report
+them with the result.
+"""
+import inspect
+import time
+from typing import Callable, Optional
+
+from google.api_core import exceptions as api_exceptions
+from google.api_core.retry import Retry
+
+from spannercli.config import Constants
+
+#: settings of the policy, also available as the hints of a statement, e.g. @{CLI_TIMEOUT=5s}
+SETTINGS = ("timeout", "max_retries", "retry_delay")
+
+#: errors of a call to retry, the same as the client library
+RETRYABLE = (api_exceptions.ServiceUnavailable,)
+
+
+def accepted(func: Callable, options: dict) -> dict:
+    """the keyword arguments the function takes, e.g. batch_update has no retry and timeout in older versions"""
+    parameters = inspect.signature(func).parameters
+    if any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+        return options
+    return {k: v for k, v in options.items() if k in parameters}
+
+
+class RetriesExhausted(Exception):
+    """the transaction was aborted more than max_retries times"""
+
+
+class RetryPolicy(object):
+    """
+    Created for each statement, it keeps the numbers of the retries.
+
+    :param timeout: deadline of each call and the limit of the time retrying a transaction, in seconds.
+        None for the client library defaults
+    :param max_retries: retries of a call failed by UNAVAILABLE, and of an aborted transaction
+    :param retry_delay: seconds to wait before the first retry, multiplied by RETRY_MULTIPLIER
+        for each following retry up to RETRY_MAX_DELAY
+    """
+
+    def __init__(self, timeout: Optional[float] = None, max_retries: int = Constants.MAX_RETRIES,
+                 retry_delay: float = Constants.RETRY_DELAY, sleep: Callable[[float], None] = time.sleep):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.sleep = sleep
+        self.retries = 0
+        self.aborts = 0
+
+    def delay(self, attempt: int) -> float:
+        """seconds to wait before the n-th retry, 1 origin"""
+        return min(self.retry_delay * Constants.RETRY_MULTIPLIER ** (attempt - 1),
+                   max(self.retry_delay, Constants.RETRY_MAX_DELAY))
+
+    def should_retry(self, error: Exception) -> bool:
+        """predicate of the Retry, counting the retries"""
+        if not isinstance(error, RETRYABLE) or self.retries >= self.max_retries:
+            return False
+        self.retries += 1
+        return True
+
+    def call_options(self) -> dict:
+        """keyword arguments of execute_sql, read and batch_update"""
+        options = {"retry": Retry(predicate=self.should_retry, initial=self.retry_delay,
+                                  maximum=max(self.retry_delay, Constants.RETRY_MAX_DELAY),
+                                  multiplier=Constants.RETRY_MULTIPLIER, deadline=self.timeout)}
+        if self.timeout is not None:
+            options["timeout"] = self.timeout
+        return options
+
+    def run_in_transaction(self, database, func: Callable, **kwargs):
+        """
+        run_in_transaction of the database, with the backoff of the policy between the attempts.
+        RetriesExhausted is raised instead of running the function again after max_retries aborts.
+
+        :param kwargs: keyword arguments of run_in_transaction, e.g. transaction_tag
+        """
+        attempts = 0
+
+        def attempt(transaction, **unknown):
+            nonlocal attempts
+            # older client libraries pass default_retry_delay to the function, and always wait their own delay
+            backoff = "default_retry_delay" not in unknown
+            if attempts:
+                # the previous attempt was aborted
+                self.aborts += 1
+                if self.aborts > self.max_retries:
+                    raise RetriesExhausted(f"the transaction was aborted {self.aborts} times,"
+                                           f" gave up by max_retries={self.max_retries}")
+                if backoff:
+                    self.sleep(self.delay(self.aborts))
+            attempts += 1
+            return func(transaction)
+
+        if self.timeout is not None:
+            kwargs["timeout_secs"] = self.timeout
+        # the delay of the client library is replaced with the backoff above,
+        # except the delay requested by the server
+        kwargs["default_retry_delay"] = 0
+        return database.run_in_transaction(attempt, **kwargs)
+
+    def summary(self) -> Optional[str]:
+        """numbers of the retries to report with the result, None if nothing was retried"""
+        if not self.retries and not self.aborts:
+            return None
+        return f"retried {self.retries} times, aborted {self.aborts} times."
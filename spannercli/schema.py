@@ -0,0 +1,320 @@
+"""
+Schema model of a database, parsed from the DDL statements of GetDatabaseDdl
+https://cloud.google.com/spanner/docs/reference/rpc/google.spanner.admin.database.v1#getdatabaseddlrequest
+
+The DDL has no columns of the views and no states of the indexes, they are read from INFORMATION_SCHEMA.
+Tables in a named schema are named as `schema.table`.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from spannercli import queryutils
+from spannercli.queryutils import Token
+
+
+#: columns of a table or a view, with the parameters schema and table
+COLUMNS_SQL = "SELECT COLUMN_NAME, SPANNER_TYPE, COLUMN_DEFAULT, IS_NULLABLE FROM INFORMATION_SCHEMA.COLUMNS" \
+              " WHERE TABLE_CATALOG = '' AND TABLE_SCHEMA = @schema AND TABLE_NAME = @table ORDER BY ORDINAL_POSITION"
+
+#: states of the indexes, WRITE_ONLY while an index is backfilled
+INDEX_STATES_SQL = "SELECT TABLE_SCHEMA, TABLE_NAME, INDEX_NAME, INDEX_STATE FROM INFORMATION_SCHEMA.INDEXES" \
+                   " WHERE TABLE_CATALOG = '' AND INDEX_TYPE = 'INDEX'"
+
+
+def split_name(name: str) -> Tuple[str, str]:
+    """TABLE_SCHEMA and TABLE_NAME of the table, TABLE_SCHEMA is empty for the default schema"""
+    schema, _, table = name.rpartition(".")
+    return schema, table
+
+
+def join_name(schema: str, table: str) -> str:
+    return f"{schema}.{table}" if schema else table
+
+
+class Column(object):
+    def __init__(self, name: str, spanner_type: str, nullable: bool = True, default: Optional[str] = None):
+        self.name = name
+        self.spanner_type = spanner_type
+        self.nullable = nullable
+        self.default = default
+
+
+class ForeignKey(object):
+    def __init__(self, name: Optional[str], columns: List[str], referenced_table: str, referenced_columns: List[str]):
+        self.name = name
+        self.columns = columns
+        self.referenced_table = referenced_table
+        self.referenced_columns = referenced_columns
+
+
+class Table(object):
+    def __init__(self, name: str, ddl: str, view: bool = False):
+        self.name = name
+        self.ddl = ddl
+        self.view = view
+        self.columns: Dict[str, Column] = OrderedDict()
+        # list of (column name, ASC or DESC)
+        self.primary_key: List[Tuple[str, str]] = []
+        self.parent: Optional[str] = None
+        self.on_delete: Optional[str] = None
+        self.foreign_keys: List[ForeignKey] = []
+
+
+class Index(object):
+    def __init__(self, name: str, table: str, ddl: str, unique: bool = False, null_filtered: bool = False):
+        self.name = name
+        self.table = table
+        self.ddl = ddl
+        self.unique = unique
+        self.null_filtered = null_filtered
+        # list of (column name, ASC or DESC)
+        self.columns: List[Tuple[str, str]] = []
+        self.storing: List[str] = []
+        self.parent: Optional[str] = None
+
+
+def _name(token: Token) -> str:
+    return queryutils.path_name(token)
+
+
+def _upper(tokens: List[Token], i: int) -> str:
+    return tokens[i].text.upper() if i < len(tokens) else ""
+
+
+def _group(tokens: List[Token], i: int) -> Tuple[List[List[Token]], int]:
+    """split the parentheses starting at tokens[i] by top level commas
+
+    :return: list of the elements, and the index next to the closing parenthesis
+    """
+    elements = [[]]
+    depth = 0
+    angle = 0
+    for j in range(i, len(tokens)):
+        token = tokens[j]
+        if token.kind == "open":
+            depth += 1
+            if depth == 1:
+                continue
+        elif token.kind == "close":
+            depth -= 1
+            if depth == 0:
+                return [e for e in elements if e], j + 1
+        elif depth == 1 and token.text in ("<", ">"):
+            # ARRAY<STRUCT<a INT64, b STRING(MAX)>>
+            angle += 1 if token.text == "<" else -1
+        elif depth == 1 and angle == 0 and token.text == ",":
+            elements.append([])
+            continue
+        elements[-1].append(token)
+    return [e for e in elements if e], len(tokens)
+
+
+def _key_parts(element: List[Token]) -> Tuple[str, str]:
+    order = "DESC" if len(element) > 1 and element[-1].text.upper() == "DESC" else "ASC"
+    return _name(element[0]), order
+
+
+def _text(sql: str, tokens: List[Token]) -> str:
+    return sql[tokens[0].start:tokens[-1].start + len(tokens[-1].text)] if tokens else ""
+
+
+class Schema(object):
+    """tables, views and indexes of a database"""
+
+    def __init__(self, statements: List[str]):
+        self.statements = statements
+        self.tables: Dict[str, Table] = OrderedDict()
+        self.indexes: Dict[str, Index] = OrderedDict()
+        for sql in statements:
+            self._parse(sql)
+
+    def _parse(self, sql: str):
+        tokens = queryutils.join_paths(queryutils.tokenize(sql))
+        words = [_upper(tokens, i) for i in range(4)]
+        if words[:2] == ["CREATE", "TABLE"]:
+            self._parse_table(sql, tokens)
+        elif words[0] == "CREATE" and "INDEX" in words[1:4]:
+            self._parse_index(sql, tokens)
+        elif words[:2] == ["CREATE", "VIEW"] or words[:4] == ["CREATE", "OR", "REPLACE", "VIEW"]:
+            name = _name(tokens[2 if words[1] == "VIEW" else 4])
+            self.tables[name] = Table(name, sql, view=True)
+        elif words[:2] == ["ALTER", "TABLE"] and words[3] == "ADD":
+            table = self.tables.get(_name(tokens[2]))
+            if table is not None:
+                self._parse_constraint(tokens[4:], table)
+
+    def _parse_table(self, sql: str, tokens: List[Token]):
+        i = 2
+        if _upper(tokens, i) == "IF":
+            i += 3
+        table = Table(_name(tokens[i]), sql)
+        elements, i = _group(tokens, i + 1)
+        for element in elements:
+            if not self._parse_constraint(element, table):
+                column = self._parse_column(sql, element)
+                table.columns[column.name] = column
+        while i < len(tokens):
+            if _upper(tokens, i) == "PRIMARY" and _upper(tokens, i + 1) == "KEY":
+                keys, i = _group(tokens, i + 2)
+                table.primary_key = [_key_parts(k) for k in keys]
+            elif _upper(tokens, i) == "INTERLEAVE" and _upper(tokens, i + 2) == "PARENT":
+                table.parent = _name(tokens[i + 3])
+                i += 4
+                if _upper(tokens, i) == "ON" and _upper(tokens, i + 1) == "DELETE":
+                    table.on_delete = " ".join(t.text.upper() for t in tokens[i + 2:i + 4]
+                                               if t.text.upper() in ("CASCADE", "NO", "ACTION"))
+            else:
+                i += 1
+        self.tables[table.name] = table
+
+    @staticmethod
+    def _parse_column(sql: str, element: List[Token]) -> Column:
+        name = _name(element[0])
+        i = 1
+        depth = 0
+        while i < len(element):
+            token = element[i]
+            if token.kind == "open":
+                depth += 1
+            elif token.kind == "close":
+                depth -= 1
+            elif depth == 0 and token.text.upper() in ("NOT", "DEFAULT", "AS", "OPTIONS", "HIDDEN", "GENERATED"):
+                break
+            i += 1
+        column = Column(name, _text(sql, element[1:i]))
+        rest = [t.text.upper() for t in element[i:]]
+        for j, word in enumerate(rest):
+            if word == "NOT" and rest[j + 1:j + 2] == ["NULL"]:
+                column.nullable = False
+            elif word == "DEFAULT" and j + i + 1 < len(element):
+                # DEFAULT (expression), without the parentheses as COLUMN_DEFAULT
+                _, end = _group(element, i + j + 1)
+                column.default = _text(sql, element[i + j + 2:end - 1])
+        return column
+
+    @staticmethod
+    def _parse_constraint(element: List[Token], table: Table) -> bool:
+        """foreign key or check constraint in CREATE TABLE or ALTER TABLE ADD. False if it is a column"""
+        i = 0
+        name = None
+        if _upper(element, 0) == "CONSTRAINT":
+            name = _name(element[1])
+            i = 2
+        if _upper(element, i) == "CHECK":
+            return True
+        if not (_upper(element, i) == "FOREIGN" and _upper(element, i + 1) == "KEY"):
+            return name is not None
+        columns, i = _group(element, i + 2)
+        if _upper(element, i) != "REFERENCES":
+            return True
+        referenced = _name(element[i + 1])
+        referenced_columns, _ = _group(element, i + 2)
+        table.foreign_keys.append(ForeignKey(name, [_name(c[0]) for c in columns], referenced,
+                                             [_name(c[0]) for c in referenced_columns]))
+        return True
+
+    def _parse_index(self, sql: str, tokens: List[Token]):
+        words = [t.text.upper() for t in tokens[:6]]
+        i = words.index("INDEX") + 1
+        if _upper(tokens, i) == "IF":
+            i += 3
+        name = _name(tokens[i])
+        if _upper(tokens, i + 1) != "ON":
+            return
+        index = Index(name, _name(tokens[i + 2]), sql, unique="UNIQUE" in words, null_filtered="NULL_FILTERED" in words)
+        keys, i = _group(tokens, i + 3)
+        index.columns = [_key_parts(k) for k in keys]
+        while i < len(tokens):
+            if _upper(tokens, i) == "STORING":
+                storing, i = _group(tokens, i + 1)
+                index.storing = [_name(s[0]) for s in storing]
+            elif _upper(tokens, i) == "INTERLEAVE" and _upper(tokens, i + 1) == "IN":
+                index.parent = _name(tokens[i + 2])
+                i += 3
+            else:
+                i += 1
+        self.indexes[index.name] = index
+
+    def table(self, name: str) -> Optional[Table]:
+        table = self.tables.get(name)
+        if table is None:
+            # identifiers are case insensitive
+            table = next((t for t in self.tables.values() if t.name.lower() == name.lower()), None)
+        return table
+
+    def catalog(self) -> Dict[str, List[str]]:
+        """table name to column names, for completion"""
+        return OrderedDict((t.name, list(t.columns)) for t in self.tables.values())
+
+    def show_tables(self) -> List[List]:
+        return [[t.name] for t in self.tables.values()]
+
+    def describe(self, table: Table) -> List[List]:
+        """same columns as INFORMATION_SCHEMA.COLUMNS, COLUMN_NAME, SPANNER_TYPE, COLUMN_DEFAULT, IS_NULLABLE"""
+        return [[c.name, c.spanner_type, c.default, "YES" if c.nullable else "NO"] for c in table.columns.values()]
+
+    def show_index(self, table: Optional[Table] = None, states: Optional[Dict[Tuple[str, str], str]] = None) \
+            -> List[List]:
+        """same columns as SHOW INDEX on INFORMATION_SCHEMA.INDEX_COLUMNS and INDEXES.
+
+        :param states: INDEX_STATE by the table and the index name, which is not in the DDL. None for the primary keys
+        """
+        states = states or {}
+        data = []
+        for t in self.tables.values():
+            if t.view or (table is not None and t is not table):
+                continue
+            # PARENT_TABLE_NAME, IS_UNIQUE, IS_NULL_FILTERED and INDEX_STATE follow the columns
+            indexes = [("PRIMARY_KEY", "PRIMARY_KEY", t.primary_key, [], t.parent or "", True, False, None)]
+            indexes.extend((i.name, "INDEX", i.columns, i.storing, i.parent or "", i.unique, i.null_filtered,
+                            states.get((t.name, i.name))) for i in self.indexes.values() if i.table == t.name)
+            for name, index_type, keys, storing, *attributes in sorted(indexes, key=lambda i: i[0]):
+                for column_name, ordering in list(keys) + [(c, None) for c in storing]:
+                    column = t.columns.get(column_name)
+                    data.append([t.name, name, index_type, column_name,
+                                 column.spanner_type if column else None,
+                                 ("YES" if column.nullable else "NO") if column else None,
+                                 ordering, *attributes])
+        return data
+
+    def index_columns(self) -> List[List]:
+        """TABLE_NAME, INDEX_NAME, INDEX_TYPE, COLUMN_NAME, ORDINAL_POSITION as INFORMATION_SCHEMA.INDEX_COLUMNS,
+        ORDINAL_POSITION is None for the STORING columns
+        """
+        rows = []
+        position = 0
+        for n, r in enumerate(self.show_index()):
+            if n == 0 or rows[-1][:2] != r[:2]:
+                position = 0
+            position += 1
+            rows.append([r[0], r[1], r[2], r[3], None if r[6] is None else position])
+        return rows
+
+    def show_create_table(self, table: Table) -> str:
+        statements = [table.ddl]
+        statements.extend(i.ddl for i in self.indexes.values() if i.table == table.name)
+        return ";\n\n".join(statements) + ";"
+
+    def interleave_tree(self) -> List[str]:
+        """tables as a tree of interleaving"""
+        children = OrderedDict()
+        for t in self.tables.values():
+            if not t.view:
+                children.setdefault(t.parent if t.parent in self.tables else None, []).append(t)
+
+        lines = []
+
+        def walk(parent: Optional[str], prefix: str):
+            nodes = children.get(parent, [])
+            for n, t in enumerate(nodes):
+                last = n == len(nodes) - 1
+                label = t.name + (f" (ON DELETE {t.on_delete})" if t.on_delete else "")
+                if parent is None:
+                    lines.append(label)
+                    walk(t.name, "")
+                else:
+                    lines.append(prefix + ("└── " if last else "├── ") + label)
+                    walk(t.name, prefix + ("    " if last else "│   "))
+
+        walk(None, "")
+        return lines
@@ -0,0 +1,141 @@
+import getpass
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+from spannercli.config import Constants
+
+
+def parse_bool(value: str) -> bool:
+    v = value.lower()
+    if v in ("on", "true", "yes", "1"):
+        return True
+    if v in ("off", "false", "no", "0"):
+        return False
+    raise ValueError(f"expected on or off: {value}")
+
+
+def parse_positive_int(value: str) -> int:
+    n = int(value)
+    if n <= 0:
+        raise ValueError(f"expected positive number: {value}")
+    return n
+
+
+def parse_count(value: str) -> int:
+    n = int(value)
+    if n < 0:
+        raise ValueError(f"expected zero or positive number: {value}")
+    return n
+
+
+def parse_seconds(value: str) -> Optional[float]:
+    """seconds of a duration, e.g. `30`, `1.5s`, `500ms`. `off` or 0 for none"""
+    v = value.lower().strip()
+    if v in ("off", "none"):
+        return None
+    scale = 1.0
+    if v.endswith("ms"):
+        v, scale = v[:-2], 0.001
+    elif v.endswith("s"):
+        v = v[:-1]
+    try:
+        seconds = float(v) * scale
+    except ValueError:
+        raise ValueError(f"expected seconds, e.g. 30, 1.5s or 500ms: {value}") from None
+    if seconds < 0:
+        raise ValueError(f"expected zero or positive seconds: {value}")
+    return seconds or None
+
+
+def parse_delay(value: str) -> float:
+    seconds = parse_seconds(value)
+    if seconds is None:
+        raise ValueError(f"expected positive seconds: {value}")
+    return seconds
+
+
+def parse_priority(value: str) -> str:
+    v = value.upper()
+    if v not in Constants.PRIORITIES:
+        raise ValueError(f"expected one of {', '.join(Constants.PRIORITIES)}: {value}")
+    return v
+
+
+def parse_tag(value: str) -> str:
+    """request and transaction tags are printable ascii, `off` for no tag"""
+    if value.lower() in ("off", "none", "''"):
+        return ""
+    if len(value) > Constants.TAG_MAX_LENGTH or not all(32 <= ord(c) <= 126 for c in value):
+        raise ValueError(f"expected up to {Constants.TAG_MAX_LENGTH} printable ascii characters: {value}")
+    return value
+
+
+def default_tag() -> str:
+    """app=spanner-cli,user=<login name>"""
+    try:
+        user = getpass.getuser()
+    except (KeyError, OSError):
+        user = "unknown"
+    tag = f"app=spanner-cli,user={''.join(c for c in user if 32 <= ord(c) <= 126)}"
+    return tag[:Constants.TAG_MAX_LENGTH]
+
+
+class Setting(object):
+    def __init__(self, name: str, default: Any, parser: Callable[[str], Any], description: str):
+        self.name = name
+        self.default = default
+        self.parser = parser
+        self.description = description
+
+
+#: available settings, changed by `\set name value`
+DEFINITIONS = OrderedDict((s.name, s) for s in (
+    Setting("scan_guard", False, parse_bool,
+            "Ask before running a query with a full scan of a large table."),
+    Setting("scan_guard_bytes", Constants.SCAN_GUARD_BYTES, parse_positive_int,
+            "Tables larger than this are guarded by scan_guard."),
+    Setting("async_operations", True, parse_bool,
+            "Run schema changes and CREATE DATABASE in background, see \\ops."),
+    Setting("cell_width", Constants.TABLE_MAX_COLUMN_WIDTH, parse_positive_int,
+            "Max width of the cells in the table and vertical output, see \\cell for a whole value."),
+    Setting("priority", "UNSPECIFIED", parse_priority,
+            "Priority of the requests and commits, LOW, MEDIUM or HIGH."),
+    Setting("request_tag", default_tag(), parse_tag,
+            "Tag of the requests in SPANNER_SYS statistics, off for no tag."),
+    Setting("transaction_tag", default_tag(), parse_tag,
+            "Tag of the read-write transactions in SPANNER_SYS statistics, off for no tag."),
+    Setting("timeout", None, parse_seconds,
+            "Deadline of each query and DML in seconds, off for the client library defaults."),
+    Setting("max_retries", Constants.MAX_RETRIES, parse_count,
+            "Retries of a call failed by UNAVAILABLE and of an aborted transaction, 0 to fail at once."),
+    Setting("retry_delay", Constants.RETRY_DELAY, parse_delay,
+            "Seconds to wait before the first retry, multiplied for each following retry."),
+))
+
+
+class Settings(object):
+    """session settings of the cli"""
+
+    def __init__(self):
+        self.values = OrderedDict((name, s.default) for name, s in DEFINITIONS.items())
+
+    def __getattr__(self, name):
+        values = self.__dict__.get("values", {})
+        if name in values:
+            return values[name]
+        raise AttributeError(name)
+
+    @staticmethod
+    def parse(name: str, value: str) -> Any:
+        """value of the setting, without changing it"""
+        setting = DEFINITIONS.get(name.lower())
+        if setting is None:
+            raise KeyError(f"Unknown setting: {name}")
+        return setting.parser(value)
+
+    def set(self, name: str, value: str) -> Any:
+        self.values[name.lower()] = self.parse(name, value)
+        return self.values[name.lower()]
+
+    def rows(self) -> List[List]:
+        return [[name, self.values[name], s.description] for name, s in DEFINITIONS.items()]
@@ -0,0 +1,81 @@
+"""
+Queries to the built-in statistics tables
+https://cloud.google.com/spanner/docs/introspection
+"""
+from typing import List, Tuple
+
+#: order of top queries, name: expression
+QUERY_ORDERS = {
+    "CPU": "AVG_CPU_SECONDS * EXECUTION_COUNT",
+    "LATENCY": "AVG_LATENCY_SECONDS",
+    "ROWS": "AVG_ROWS_SCANNED * EXECUTION_COUNT",
+}
+
+QUERY_COLUMNS = [
+    "TEXT_FINGERPRINT",
+    "EXECUTION_COUNT",
+    "AVG_LATENCY_SECONDS",
+    "AVG_CPU_SECONDS",
+    "AVG_ROWS_SCANNED",
+    "AVG_ROWS",
+    "AVG_BYTES",
+    "SUBSTR(TEXT, 0, 120) AS TEXT",
+]
+
+TXN_COLUMNS = [
+    "FPRINT",
+    "COMMIT_ATTEMPT_COUNT",
+    "COMMIT_ABORT_COUNT",
+    "COMMIT_RETRY_COUNT",
+    "AVG_TOTAL_LATENCY_SECONDS",
+    "AVG_COMMIT_LATENCY_SECONDS",
+    "ARRAY_TO_STRING(READ_COLUMNS, ', ') AS READ_COLUMNS",
+    "ARRAY_TO_STRING(WRITE_CONSTRUCTIVE_COLUMNS, ', ') AS WRITE_COLUMNS",
+]
+
+LOCK_COLUMNS = [
+    "CAST(ROW_RANGE_START_KEY AS STRING) AS ROW_RANGE_START_KEY",
+    "LOCK_WAIT_SECONDS",
+    "ARRAY_LENGTH(SAMPLE_LOCK_REQUESTS) AS SAMPLE_LOCK_REQUESTS",
+]
+
+
+def column_names(columns: List[str]) -> List[str]:
+    return [c.split(" AS ")[-1] for c in columns]
+
+
+def latest_interval(table: str) -> str:
+    """statistics of the latest interval"""
+    return f"INTERVAL_END = (SELECT MAX(INTERVAL_END) FROM {table})"
+
+
+def top_queries_sql(order: str = "CPU", period: str = "MINUTE", limit: str = "@limit") -> str:
+    table = f"SPANNER_SYS.QUERY_STATS_TOP_{period}"
+    return f"SELECT {', '.join(QUERY_COLUMNS)} FROM {table} WHERE {latest_interval(table)}" \
+           f" ORDER BY {QUERY_ORDERS[order]} DESC LIMIT {limit}"
+
+
+def top_transactions_sql(period: str = "MINUTE", limit: str = "@limit") -> str:
+    table = f"SPANNER_SYS.TXN_STATS_TOP_{period}"
+    return f"SELECT {', '.join(TXN_COLUMNS)} FROM {table} WHERE {latest_interval(table)}" \
+           f" ORDER BY COMMIT_ABORT_COUNT DESC, COMMIT_ATTEMPT_COUNT DESC LIMIT {limit}"
+
+
+def top_locks_sql(period: str = "MINUTE", limit: str = "@limit") -> str:
+    table = f"SPANNER_SYS.LOCK_STATS_TOP_{period}"
+    return f"SELECT {', '.join(LOCK_COLUMNS)} FROM {table} WHERE {latest_interval(table)}" \
+           f" ORDER BY LOCK_WAIT_SECONDS DESC LIMIT {limit}"
+
+
+def dashboard_sql(order: str = "CPU") -> Tuple[str, List[Tuple[str, List[str]]]]:
+    """single statement to read all the panels of the dashboard, each panel is an ARRAY<STRUCT> column
+
+    :return: sql, and list of (panel title, column names)
+    """
+    panels = [
+        (f"Top queries by {order}", top_queries_sql(order), QUERY_COLUMNS),
+        ("Top transactions by aborts", top_transactions_sql(), TXN_COLUMNS),
+        ("Hottest lock keys", top_locks_sql(), LOCK_COLUMNS),
+    ]
+    selects = [f"ARRAY(SELECT AS STRUCT {sql[len('SELECT '):]})" for _, sql, _ in panels]
+    return "SELECT " + ", ".join(selects), [(title, column_names(columns)) for title, _, columns in panels]
@@ -1,4 +1,7 @@
-from typing import List
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Sequence
+from typing import Iterable, Iterator, List, Optional
 
 
 class ResultContainer(object):
@@ -17,3 +20,300 @@ class ResultContainer(object):
 
     def __len__(self):
         return len(self.data)
+
+    def column_widths(self) -> Optional[List[Optional[int]]]:
+        """display width of each column if it is known without formatting all cells"""
+        return None
+
+
+def type_names(fields) -> List[str]:
+    """TypeCode names of result_set.fields, e.g. ["INT64", "STRING"]"""
+    return [f.type_.code.name for f in fields]
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """milliseconds of the duration in query stats, e.g. "0.91 msecs", "1.2 secs" """
+    try:
+        number, unit = str(value).split()
+        number = float(number)
+    except ValueError:
+        return None
+    return number * {"secs": 1000.0, "msecs": 1.0, "usecs": 0.001}.get(unit, 1.0)
+
+
+def parse_query_stats(stats) -> dict:
+    """numbers of ResultSetStats in PROFILE mode, empty if not available"""
+    if not stats or not stats.query_stats:
+        return {}
+    # stats.query_stats
+    # {
+    #   'elapsed_time': string_value: "0.91 msecs",
+    #   'query_text': string_value: "select 1;"
+    #   'rows_scanned': string_value: "0",
+    #   'rows_returned': string_value: "1",
+    #   'cpu_time': string_value: "0.23 msecs",
+    #   'runtime_creation_time': string_value: "0 msecs",
+    #   'query_plan_creation_time': string_value: "0.23 msecs"
+    # }
+    return {
+        'rows_returned': int(stats.query_stats['rows_returned']),
+        'rows_scanned': int(stats.query_stats['rows_scanned']),
+        'elapsed_time': stats.query_stats['elapsed_time'],
+        'cpu_time': stats.query_stats['cpu_time'],
+        'server_latency_ms': parse_duration(stats.query_stats['elapsed_time']),
+        'cpu_time_ms': parse_duration(stats.query_stats['cpu_time']),
+    }
+
+
+def format_query_stats(stats) -> str:
+    """one line summary of ResultSetStats in PROFILE mode"""
+    parsed = parse_query_stats(stats)
+    if not parsed:
+        return ""
+    return "rows_returned: {returned:,}, " \
+        "scanned: {scanned:}, " \
+        "elapsed_time: {elapsed}, " \
+        "cpu_time:{cpu}".format(
+            returned=parsed['rows_returned'],
+            scanned=parsed['rows_scanned'],
+            elapsed=parsed['elapsed_time'],
+            cpu=parsed['cpu_time'],
+        )
+
+
+#: display width of NULL, same as spannercli.table.NULL
+NULL_WIDTH = len("<null>")
+
+
+class Column(object):
+    """values of a column, kept as they are"""
+
+    def __init__(self):
+        self.values = []
+
+    def append(self, value):
+        self.values.append(value)
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.values)
+
+    def display_width(self) -> Optional[int]:
+        return None
+
+
+class NullableColumn(Column, ABC):
+    """Column with a null bitmap, bit i is set when i-th value is NULL"""
+
+    def __init__(self):
+        super().__init__()
+        self.nulls = bytearray()
+        self.null_count = 0
+
+    def append(self, value):
+        n = len(self)
+        if n % 8 == 0:
+            self.nulls.append(0)
+        if value is None:
+            self.nulls[n >> 3] |= 1 << (n & 7)
+            self.null_count += 1
+        self.store(value)
+
+    @abstractmethod
+    def store(self, value):
+        """keep the value, a placeholder if it is None"""
+
+    @abstractmethod
+    def load(self, i):
+        """i-th value, which is not NULL"""
+
+    def is_null(self, i) -> bool:
+        return bool(self.nulls[i >> 3] & (1 << (i & 7)))
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if self.null_count and self.is_null(i):
+            return None
+        return self.load(i)
+
+    def __iter__(self) -> Iterator:
+        for i in range(len(self)):
+            yield self[i]
+
+    def null_width(self) -> int:
+        return NULL_WIDTH if self.null_count else 0
+
+
+class ArrayColumn(NullableColumn):
+    """fixed width values in a typed array"""
+
+    def __init__(self, typecode: str):
+        super().__init__()
+        self.values = array(typecode)
+
+    def store(self, value):
+        self.values.append(0 if value is None else value)
+
+    def load(self, i):
+        return self.values[i]
+
+    def __iter__(self) -> Iterator:
+        if not self.null_count:
+            return iter(self.values)
+        return super().__iter__()
+
+    def display_width(self) -> Optional[int]:
+        if len(self.values) == self.null_count:
+            return self.null_width()
+        if self.values.typecode == "q":
+            # the widest integer is either the smallest or the largest one
+            return max(len(str(min(self.values))), len(str(max(self.values))), self.null_width())
+        return max(max(len(str(v)) for v in self.values), self.null_width())
+
+
+class BoolColumn(ArrayColumn):
+    def __init__(self):
+        super().__init__("b")
+
+    def load(self, i):
+        return bool(self.values[i])
+
+    def __iter__(self) -> Iterator:
+        for i in range(len(self)):
+            yield self[i]
+
+    def display_width(self) -> Optional[int]:
+        widths = [self.null_width()]
+        for i, v in enumerate(self.values):
+            if not (self.null_count and self.is_null(i)):
+                widths.append(len(str(bool(v))))
+        return max(widths)
+
+
+class StringColumn(NullableColumn):
+    """variable length values, encoded into a single buffer with the offsets of each value"""
+
+    def __init__(self, binary: bool = False):
+        super().__init__()
+        self.binary = binary
+        self.buffer = bytearray()
+        self.offsets = array("q", [0])
+        # display width is the length of the value, if all values are single line ascii.
+        # bytes are displayed as they are only when they are printable, hex encoded otherwise
+        self.plain = True
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def store(self, value):
+        if value is not None:
+            if self.binary:
+                encoded = value
+                self.plain = self.plain and value.isascii() and value.decode("ascii").isprintable()
+            else:
+                encoded = value.encode("utf8")
+                self.plain = self.plain and value.isascii() and "\n" not in value
+            self.buffer += encoded
+        self.offsets.append(len(self.buffer))
+
+    def load(self, i):
+        value = bytes(self.buffer[self.offsets[i]:self.offsets[i + 1]])
+        if self.binary:
+            return value
+        return value.decode("utf8")
+
+    def display_width(self) -> Optional[int]:
+        if not self.plain:
+            return None
+        width = self.null_width()
+        for i in range(len(self)):
+            width = max(width, self.offsets[i + 1] - self.offsets[i])
+        return width
+
+
+def new_column(type_name: str) -> Column:
+    if type_name == "INT64":
+        return ArrayColumn("q")
+    if type_name in ("FLOAT64", "FLOAT32"):
+        return ArrayColumn("d")
+    if type_name == "BOOL":
+        return BoolColumn()
+    if type_name == "STRING":
+        return StringColumn()
+    if type_name == "BYTES":
+        return StringColumn(binary=True)
+    return Column()
+
+
+class RowView(Sequence):
+    """read only rows of ColumnarResultContainer"""
+
+    def __init__(self, columns: List[Column]):
+        self.columns = columns
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        return len(self.columns[0])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[n] for n in range(*i.indices(len(self)))]
+        return [c[i] for c in self.columns]
+
+    def __iter__(self) -> Iterator:
+        return zip(*self.columns)
+
+
+class ColumnarResultContainer(ResultContainer):
+    """ResultContainer storing the result column by column.
+
+    INT64, FLOAT64 and BOOL values are kept in typed arrays and STRING, BYTES values in a
+    single buffer per column, instead of a Python list per row.
+    """
+
+    def __init__(self, columns: List[Column], header, **kwargs):
+        # rows are views of the columns, appended values are visible in data as well
+        super().__init__(RowView(columns), header, **kwargs)
+        self.columns = columns
+
+    @classmethod
+    def empty(cls, fields, **kwargs) -> "ColumnarResultContainer":
+        types = type_names(fields)
+        return cls(columns=[new_column(t) for t in types], header=[f.name for f in fields], types=types, **kwargs)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable, fields, **kwargs) -> "ColumnarResultContainer":
+        container = cls.empty(fields, **kwargs)
+        for row in rows:
+            container.append(row)
+        return container
+
+    @classmethod
+    def from_result_set(cls, result_set, rows: Optional[Iterable] = None, **kwargs) -> "ColumnarResultContainer":
+        """consume streamed result set, fields are available after the first row is read
+
+        :param result_set: StreamedResultSet
+        :param rows: rows of the result_set, e.g. wrapped to track the progress
+        """
+        it = iter(result_set if rows is None else rows)
+        first = next(it, None)
+        container = cls.empty(result_set.fields, **kwargs)
+        if first is not None:
+            container.append(first)
+            for row in it:
+                container.append(row)
+        return container
+
+    def append(self, row):
+        for c, v in zip(self.columns, row):
+            c.append(v)
+
+    def column_widths(self) -> Optional[List[Optional[int]]]:
+        return [c.display_width() for c in self.columns]
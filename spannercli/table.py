@@ -0,0 +1,244 @@
+import codecs
+import json
+import random
+import unicodedata
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from cli_helpers.utils import to_string
+from google.cloud.spanner_v1 import JsonObject
+
+from spannercli.config import Constants
+
+NULL = "<null>"
+ELLIPSIS = "..."
+
+#: width hints for fixed width Spanner types, keyed by TypeCode name.
+#: rows outside of the sample are usually as wide as these.
+TYPE_WIDTHS = {
+    "BOOL": 5,
+    "INT64": 20,
+    "FLOAT32": 16,
+    "FLOAT64": 24,
+    "DATE": 10,
+    "TIMESTAMP": 32,
+    "NUMERIC": 40,
+    "UUID": 36,
+}
+
+
+def display_width(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    return sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+
+
+def cell_to_string(value) -> str:
+    if value is None:
+        return NULL
+    return to_string(value)
+
+
+def json_value(value):
+    """plain value of JsonObject, which keeps null, arrays and scalars outside of the dict"""
+    if not isinstance(value, JsonObject):
+        return value
+    if getattr(value, "_is_null", False):
+        return None
+    if getattr(value, "_is_array", False):
+        return list(value)
+    if getattr(value, "_is_scalar_value", False):
+        return next(iter(value.values()))
+    return value
+
+
+def bytes_text(value: bytes, limit: int) -> str:
+    """the text of cli_helpers.utils.to_string, only the first `limit` characters or a little more.
+    the value is decoded, or hex encoded when it is not printable, up to the prefix"""
+    prefix = value[:limit * 4 + 4]
+    try:
+        text = codecs.getincrementaldecoder("utf8")().decode(prefix, final=len(prefix) == len(value))
+        if text.isprintable():
+            return text
+    except UnicodeDecodeError:
+        pass
+    return "0x" + value[:limit // 2 + 1].hex()
+
+
+def value_chunks(value, limit: int, type_name: Optional[str] = None, nested: bool = False) -> Iterator[str]:
+    """pieces of the text of the value, formatted lazily to stop at any point.
+    values in ARRAY and STRUCT are in their repr, the same as str() of the list.
+    """
+    if type_name == "JSON" or isinstance(value, JsonObject):
+        # the pure python encoder yields the pieces one by one
+        yield from json.JSONEncoder(sort_keys=True, separators=(",", ":")).iterencode(json_value(value))
+    elif isinstance(value, (list, tuple)):
+        yield "[" if isinstance(value, list) else "("
+        for n, v in enumerate(value):
+            if n:
+                yield ", "
+            yield from value_chunks(v, limit, nested=True)
+        yield "]" if isinstance(value, list) else ")"
+    elif nested:
+        yield repr(value)
+    elif value is None:
+        yield NULL
+    elif isinstance(value, bytes):
+        yield bytes_text(value, limit)
+    elif isinstance(value, str):
+        yield value[:limit + 1]
+    else:
+        yield str(value)
+
+
+def preview(value, limit: int, type_name: Optional[str] = None) -> str:
+    """text of the value to display, cut to `limit` characters with ELLIPSIS without formatting the rest"""
+    pieces = []
+    size = 0
+    for piece in value_chunks(value, limit, type_name):
+        pieces.append(piece)
+        size += len(piece)
+        if size > limit:
+            return "".join(pieces)[:limit] + ELLIPSIS
+    return "".join(pieces)
+
+
+def full_text(value, type_name: Optional[str] = None) -> str:
+    """the whole value, JSON is indented"""
+    if value is None:
+        return NULL
+    if type_name == "JSON" or isinstance(value, JsonObject):
+        return json.dumps(json_value(value), sort_keys=True, indent=2, ensure_ascii=False)
+    return cell_to_string(value)
+
+
+def truncate(text: str, width: int) -> str:
+    if display_width(text) <= width:
+        return text
+    suffix = ELLIPSIS if width > len(ELLIPSIS) else ""
+    budget = width - len(suffix)
+    out = []
+    for c in text:
+        w = display_width(c)
+        if w > budget:
+            break
+        budget -= w
+        out.append(c)
+    return "".join(out) + suffix
+
+
+def wrap(text: str, width: int) -> List[str]:
+    if display_width(text) <= width:
+        return [text]
+    lines = []
+    current = []
+    used = 0
+    for c in text:
+        w = display_width(c)
+        if used + w > width:
+            lines.append("".join(current))
+            current = []
+            used = 0
+        current.append(c)
+        used += w
+    lines.append("".join(current))
+    return lines
+
+
+def pad(text: str, width: int) -> str:
+    return text + " " * (width - display_width(text))
+
+
+class StreamingTableRenderer(object):
+    """Render rows as an ascii table in a single pass.
+
+    Column widths are estimated from a sample of rows (the first rows of an iterator,
+    or a random sample of a sequence) and the column types, then every row is streamed
+    out and cells wider than the estimated width are truncated or wrapped.
+    Only the sample is held in memory.
+    """
+
+    def __init__(self, sample_size: int = Constants.TABLE_SAMPLE_ROWS,
+                 max_width: int = Constants.TABLE_MAX_COLUMN_WIDTH, overflow: str = "truncate"):
+        if overflow not in ("truncate", "wrap"):
+            raise ValueError(f"unknown overflow mode: {overflow}")
+        self.sample_size = sample_size
+        self.max_width = max_width
+        self.overflow = overflow
+
+    def sample(self, rows: Iterable) -> Tuple[List, Iterable, bool]:
+        """
+        :return:
+            rows used to estimate the column widths
+            all the rows to render
+            the sample covers all the rows or not
+        """
+        if isinstance(rows, Sequence):
+            if len(rows) <= self.sample_size:
+                return rows, rows, True
+            return random.sample(rows, self.sample_size), rows, False
+        it = iter(rows)
+        head = list(islice(it, self.sample_size))
+        if len(head) < self.sample_size:
+            return head, head, True
+        return head, chain(head, it), False
+
+    def cell_text(self, value, type_name: Optional[str] = None) -> str:
+        """text of the cell, long values are cut before formatting all of them"""
+        return preview(value, self.max_width * Constants.TABLE_CELL_MAX_LINES, type_name)
+
+    def estimate_widths(self, sample: Iterable, header: List[str], types: Optional[List[str]] = None,
+                        hints: bool = True) -> List[int]:
+        """
+        :param types: TypeCode names of the columns
+        :param hints: widen the columns of fixed width types to their usual width
+        """
+        widths = [display_width(cell_to_string(h)) for h in header]
+        for row in sample:
+            for i, v in enumerate(row):
+                for line in self.cell_text(v, types[i] if types else None).splitlines() or [""]:
+                    widths[i] = max(widths[i], display_width(line))
+        if types and hints:
+            for i, t in enumerate(types):
+                widths[i] = max(widths[i], TYPE_WIDTHS.get(t, 0))
+        return [max(1, min(w, self.max_width)) for w in widths]
+
+    def render(self, rows: Iterable, header: List[str], types: Optional[List[str]] = None,
+               widths: Optional[List[Optional[int]]] = None) -> Iterator[str]:
+        """
+        :param rows: rows to render
+        :param header: column names
+        :param types: TypeCode names of the columns
+        :param widths: known display width of the columns, None for the columns to estimate
+        """
+        if widths is None or None in widths:
+            sample, rows, complete = self.sample(rows)
+            # type hints are only needed for the rows we have not seen yet
+            estimated = self.estimate_widths(sample, header, types, hints=not complete)
+            del sample
+            if widths is not None:
+                estimated = [e if w is None else w for e, w in zip(estimated, widths)]
+            widths = estimated
+        widths = [max(1, min(max(w, display_width(h)), self.max_width)) for w, h in zip(widths, header)]
+        separator = "+" + "+".join("-" * (w + 2) for w in widths) + "+"
+        yield separator
+        yield from self.render_row(header, widths)
+        yield separator
+        for row in rows:
+            yield from self.render_row(row, widths, types)
+        yield separator
+
+    def render_row(self, row: Sequence, widths: List[int], types: Optional[List[str]] = None) -> Iterator[str]:
+        cells = []
+        for i, (v, w) in enumerate(zip(row, widths)):
+            lines = []
+            for line in self.cell_text(v, types[i] if types else None).splitlines() or [""]:
+                if self.overflow == "wrap":
+                    lines.extend(wrap(line, w))
+                else:
+                    lines.append(truncate(line, w))
+            cells.append(lines)
+        height = max((len(c) for c in cells), default=1)
+        for n in range(height):
+            parts = [pad(c[n] if n < len(c) else "", w) for c, w in zip(cells, widths)]
+            yield "| " + " | ".join(parts) + " |"
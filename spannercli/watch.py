@@ -0,0 +1,171 @@
+"""
+`\\watch`, run a query at an interval and redraw only the changed lines of the table in place.
+
+The literals of the query are replaced with parameters once, and every refresh runs the same
+statement on a dedicated session, so neither the query plan nor the session is created again.
+"""
+import datetime
+import time
+from typing import Callable, List, Optional, Tuple
+
+from google.cloud.spanner_v1 import param_types, types
+
+from spannercli import queryutils, structures
+from spannercli.table import display_width, pad, preview, truncate
+
+#: cells changed since the previous refresh, in reverse video
+HIGHLIGHT = "\033[7m{0}\033[27m"
+CLEAR_SCREEN = "\033[H\033[J"
+CLEAR_LINE = "\033[K"
+CLEAR_BELOW = "\033[J"
+HIDE_CURSOR = "\033[?25l"
+SHOW_CURSOR = "\033[?25h"
+
+#: lines above the table, the status and the cost
+HEADER_LINES = 3
+
+_param_types = {int: param_types.INT64, float: param_types.FLOAT64, str: param_types.STRING}
+
+
+def move_to(line: int) -> str:
+    """cursor to the beginning of the line, 0 origin"""
+    return f"\033[{line + 1};1H"
+
+
+def one_line(value, limit: int) -> str:
+    return " ".join(preview(value, limit).splitlines())
+
+
+class DeltaRenderer(object):
+    """Keeps the lines on the screen, and writes only the lines which differ from them.
+
+    Column widths only grow, so the table does not shift when a narrower value comes back.
+    """
+
+    def __init__(self, max_width: int):
+        self.max_width = max_width
+        self.screen: List[str] = []
+        self.widths: List[int] = []
+        self.header: List[str] = []
+        self.cells: List[List[str]] = []
+
+    def table(self, header: List[str], rows: List, height: int) -> List[str]:
+        """lines of the table, the cells changed since the previous table are highlighted"""
+        cells = [[one_line(v, self.max_width) for v in row] for row in rows]
+        if header != self.header:
+            self.header = header
+            self.widths = [0] * len(header)
+            self.cells = []
+        for row in [header] + cells:
+            self.widths = [max(w, min(display_width(c), self.max_width)) for w, c in zip(self.widths, row)]
+        separator = "+" + "+".join("-" * (w + 2) for w in self.widths) + "+"
+        lines = [separator, self.render_row(header, [False] * len(header)), separator]
+        shown = cells if len(cells) <= height - 4 else cells[:max(0, height - 5)]
+        for n, row in enumerate(shown):
+            previous = self.cells[n] if n < len(self.cells) else None
+            lines.append(self.render_row(row, [previous is not None and previous[i] != c for i, c in enumerate(row)]))
+        lines.append(separator)
+        if len(shown) < len(cells):
+            lines.append(f"{len(cells) - len(shown):,} more rows")
+        self.cells = cells
+        return lines
+
+    def render_row(self, row: List[str], changed: List[bool]) -> str:
+        parts = []
+        for text, width, highlight in zip(row, self.widths, changed):
+            text = pad(truncate(text, width), width)
+            parts.append(HIGHLIGHT.format(text) if highlight else text)
+        return "| " + " | ".join(parts) + " |"
+
+    def update(self, lines: List[str]) -> Tuple[str, int]:
+        """
+        :return: output to turn the screen into the lines, and the number of the lines written
+        """
+        if not self.screen:
+            self.screen = lines
+            return CLEAR_SCREEN + "\n".join(lines), len(lines)
+        out = [move_to(n) + line + CLEAR_LINE for n, line in enumerate(lines)
+               if n >= len(self.screen) or self.screen[n] != line]
+        written = len(out)
+        if len(lines) < len(self.screen):
+            # clear the rest of the previous table
+            out.append(move_to(len(lines)) + CLEAR_BELOW)
+        out.append(move_to(len(lines)))
+        self.screen = lines
+        return "".join(out), written
+
+
+class Watch(object):
+    """
+    :param database: google.cloud.spanner_v1.database.Database
+    :param sql: read query
+    :param interval: seconds between the refreshes
+    :param request_options: google.cloud.spanner_v1.RequestOptions of the query
+    """
+
+    def __init__(self, database, sql: str, interval: float, max_width: int,
+                 terminal_height: Callable[[], int], request_options=None):
+        self.database = database
+        self.sql, values = queryutils.parameterize(sql)
+        self.params = {f"p{n + 1}": v for n, v in enumerate(values)}
+        self.types = {k: _param_types[type(v)] for k, v in self.params.items()}
+        self.interval = interval
+        self.terminal_height = terminal_height
+        self.request_options = request_options
+        self.renderer = DeltaRenderer(max_width)
+        self.session = None
+        self.refreshes = 0
+        # cost of the previous refresh on the terminal, lines and bytes written
+        self.written: Optional[Tuple[int, int]] = None
+
+    def execute(self) -> Tuple[List[str], List, dict]:
+        if self.session is None:
+            self.session = self.database.session()
+            self.session.create()
+        result_set = self.session.snapshot().execute_sql(
+            self.sql, params=self.params, param_types=self.types,
+            query_mode=types.spanner.ExecuteSqlRequest.QueryMode.PROFILE, request_options=self.request_options)
+        rows = list(result_set)
+        return [f.name for f in result_set.fields], rows, structures.parse_query_stats(result_set.stats)
+
+    def status(self, elapsed: float, stats: dict, rows: int) -> List[str]:
+        spanner_cost = f"spanner: {elapsed * 1000:.0f} msecs round trip"
+        if stats:
+            spanner_cost += f", {stats['elapsed_time']} elapsed, {stats['cpu_time']} cpu," \
+                            f" {stats['rows_scanned']:,} rows scanned"
+        terminal_cost = "terminal: full redraw" if self.written is None else \
+            f"terminal: {self.written[0]} lines, {self.written[1]:,} bytes written"
+        return [
+            f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} every {self.interval:g}s,"
+            f" refresh #{self.refreshes}, {rows:,} rows. Ctrl-C to quit.",
+            f"{spanner_cost} | {terminal_cost}",
+            "",
+        ]
+
+    def refresh(self) -> str:
+        """run the query, and the output to update the screen"""
+        started = time.monotonic()
+        header, rows, stats = self.execute()
+        elapsed = time.monotonic() - started
+        self.refreshes += 1
+        lines = self.status(elapsed, stats, len(rows))
+        lines.extend(self.renderer.table(header, rows, self.terminal_height() - HEADER_LINES - 1))
+        out, written = self.renderer.update(lines)
+        self.written = (written, len(out.encode("utf8")))
+        return out
+
+    def run(self, write: Callable[[str], None], sleep: Callable[[float], None] = time.sleep):
+        """refresh until interrupted"""
+        write(HIDE_CURSOR)
+        try:
+            while True:
+                write(self.refresh())
+                sleep(self.interval)
+        finally:
+            write(SHOW_CURSOR + "\n")
+            self.close()
+
+    def close(self):
+        if self.session is not None:
+            self.session.delete()
+            self.session = None
@@ -0,0 +1,70 @@
+from spannercli import advisor
+from spannercli.advisor import PlanNode
+
+
+def scalar(index, description):
+    return PlanNode(index, "SCALAR", "Reference", {}, [], description)
+
+
+def full_scan_plan():
+    # SELECT * FROM Singers WHERE LastName = 'x'
+    return [
+        PlanNode(0, "RELATIONAL", "Distributed Union", {}, [(1, "", "")]),
+        PlanNode(1, "RELATIONAL", "Filter Scan", {}, [(2, "", ""), (5, "Residual Condition", "")]),
+        PlanNode(2, "RELATIONAL", "Scan", {"scan_type": "TableScan", "scan_target": "Singers", "Full scan": "true"},
+                 [(3, "", "SingerId"), (4, "", "LastName"), (6, "", "FirstName")]),
+        scalar(3, "SingerId"),
+        scalar(4, "LastName"),
+        PlanNode(5, "SCALAR", "Function", {}, [], "($LastName = 'x')"),
+        scalar(6, "FirstName"),
+    ]
+
+
+def index_rows():
+    return [
+        ("Singers", "PRIMARY_KEY", "PRIMARY_KEY", "SingerId", 1),
+        ("Singers", "SingersByFirstName", "INDEX", "FirstName", 1),
+    ]
+
+
+def test_full_scan_suggests_index():
+    findings = advisor.advise(full_scan_plan(), advisor.parse_indexes(index_rows()))
+    assert len(findings) == 1
+    f = findings[0]
+    assert f.kind == advisor.FULL_TABLE_SCAN
+    assert f.target == "Singers"
+    assert f.detail == "filtered by LastName"
+    assert f.suggestion == "CREATE INDEX IX_Singers_LastName ON Singers (LastName) STORING (FirstName)"
+    assert advisor.full_scan_tables(findings) == ["Singers"]
+
+
+def test_full_scan_suggests_force_index():
+    rows = index_rows() + [("Singers", "SingersByLastName", "INDEX", "LastName", 1)]
+    findings = advisor.advise(full_scan_plan(), advisor.parse_indexes(rows))
+    assert findings[0].suggestion == "Singers@{FORCE_INDEX=SingersByLastName}"
+
+
+def test_back_join():
+    # SELECT FirstName, Birthday FROM Singers@{FORCE_INDEX=SingersByFirstName} WHERE FirstName = 'x'
+    nodes = [
+        PlanNode(0, "RELATIONAL", "Distributed Cross Apply", {}, [(1, "Input", ""), (4, "Map", "")]),
+        PlanNode(1, "RELATIONAL", "Scan", {"scan_type": "IndexScan", "scan_target": "SingersByFirstName"},
+                 [(2, "", "SingerId"), (3, "", "FirstName")]),
+        scalar(2, "SingerId"),
+        scalar(3, "FirstName"),
+        PlanNode(4, "RELATIONAL", "Scan", {"scan_type": "TableScan", "scan_target": "Singers"},
+                 [(5, "", "Birthday")]),
+        scalar(5, "Birthday"),
+    ]
+    rows = index_rows() + [("Singers", "SingersByFirstName", "INDEX", "Rank", None)]
+    findings = advisor.advise(nodes, advisor.parse_indexes(rows))
+    assert [f.kind for f in findings] == [advisor.BACK_JOIN, advisor.DISTRIBUTED_CROSS_APPLY]
+    assert findings[0].suggestion == "add STORING (Rank, Birthday) to SingersByFirstName"
+    assert findings[1].target == "SingersByFirstName, Singers"
+    assert advisor.full_scan_tables(findings) == []
+
+
+def test_format_bytes():
+    assert advisor.format_bytes(None) == "unknown size"
+    assert advisor.format_bytes(512) == "512 B"
+    assert advisor.format_bytes(3 * 1024 ** 3) == "3 GiB"
@@ -0,0 +1,43 @@
+import datetime
+
+from spannercli import analyze
+
+
+def test_estimate_distinct():
+    assert analyze.estimate_distinct([], 100) == 0
+    # whole table is sampled
+    assert analyze.estimate_distinct([1, 1, 2], 3) == 2
+    # all unique in the sample, likely unique in the table
+    assert analyze.estimate_distinct(list(range(100)), 10000) == 10000
+    # few values repeated many times
+    assert analyze.estimate_distinct([n % 5 for n in range(1000)], 100000) == 5
+
+
+def test_detect_pattern():
+    assert analyze.detect_pattern(list(range(1, 1001)), "INT64", 1000)[0] == "HIGH"
+    assert analyze.detect_pattern([1600000000000 + n for n in range(10)], "INT64", 10)[1].startswith("timestamp")
+    assert analyze.detect_pattern([n * 2 ** 50 for n in range(100)], "INT64", 100)[0] == "LOW"
+    assert analyze.detect_pattern([datetime.date(2020, 1, 1)], "DATE", 1)[0] == "HIGH"
+    assert analyze.detect_pattern(["2020-01-01T00:00:00Z", "2021-01-01"], "STRING(MAX)", 2)[0] == "HIGH"
+    assert analyze.detect_pattern(["0001", "0002"], "STRING(4)", 2)[0] == "HIGH"
+    assert analyze.detect_pattern([f"user-{n:x}" for n in range(100)], "STRING(MAX)", 100)[0] == "MEDIUM"
+    assert analyze.detect_pattern(["a", "b", "c"], "STRING(MAX)", 3)[0] == "LOW"
+
+
+def test_histogram():
+    assert analyze.histogram([0, 1, 2, 3], "INT64", buckets=2) == [("[0, 2)", 2), ("[2, 4)", 2)]
+    assert analyze.histogram(["apple", "apricot", "banana", None], "STRING(MAX)") == \
+        [("<null>", 1), ("ap", 2), ("ba", 1)]
+
+
+def test_analyze():
+    rows = [[n] for n in range(100)]
+    res = analyze.analyze("Singers", [("SingerId", "INT64")], None, rows, 100)
+    assert res.header[0] == "SingerId bucket"
+    assert sum(r[1] for r in res.data) == 100
+    assert "hotspot risk: HIGH" in res.meta["message"]
+
+
+def test_sample_sql():
+    assert analyze.sample_sql("sales.Orders", ["OrderId", "Order"], 10) == \
+        "SELECT `OrderId`, `Order` FROM `sales`.`Orders` TABLESAMPLE RESERVOIR (10 ROWS)"
@@ -0,0 +1,101 @@
+import inspect
+
+import grpc
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import spanner
+
+from spannercli import config, jobs
+from spannercli.channel import CancelWithJob, ChannelOptions, ChannelPool, client_endpoint
+
+
+class DummyChannel(object):
+    def __init__(self, name):
+        self.name = name
+
+    def unary_stream(self, method, **kwargs):
+        return lambda request: (self.name, method, request)
+
+
+def test_channel_pool():
+    sut = ChannelPool([DummyChannel("a"), DummyChannel("b")])
+    call = sut.unary_stream("/google.spanner.v1.Spanner/ExecuteStreamingSql")
+    assert [call(n)[0] for n in range(3)] == ["a", "b", "a"]
+    assert call(3)[1:] == ("/google.spanner.v1.Spanner/ExecuteStreamingSql", 3)
+
+
+def test_options():
+    options = dict(ChannelOptions("gzip", max_receive_message_size=1024, keepalive=30).grpc_options())
+    assert options["grpc.max_receive_message_length"] == 1024
+    assert options["grpc.keepalive_time_ms"] == 30000
+    with pytest.raises(ValueError):
+        ChannelOptions("zstd")
+    with pytest.raises(ValueError):
+        ChannelOptions(channels=0)
+
+
+def test_apply(monkeypatch):
+    monkeypatch.setenv(config.EnvironmentVariables.SPANNER_EMULATOR_HOST, "localhost:9010")
+    options = {}
+    if "disable_builtin_metrics" in inspect.signature(spanner.Client).parameters:
+        options["disable_builtin_metrics"] = True
+    client = spanner.Client(project="project", credentials=AnonymousCredentials(), **options)
+    database = client.instance("instance").database("db")
+    ChannelOptions().apply(database)
+    assert database._spanner_api is None  # pylint: disable=protected-access
+
+    sut = ChannelOptions("gzip", channels=2)
+    sut.apply(database)
+    other = client.instance("instance").database("other")
+    sut.apply(other)
+    try:
+        assert database.spanner_api is other.spanner_api
+        assert isinstance(database.spanner_api.transport.grpc_channel._channel,  # pylint: disable=protected-access
+                          ChannelPool)
+    finally:
+        sut.close()
+
+
+def test_api_endpoint(monkeypatch):
+    client = spanner.Client(project="project", credentials=AnonymousCredentials(),
+                            client_options={"api_endpoint": "us-central1-spanner.googleapis.com"})
+    assert client_endpoint(client) == "us-central1-spanner.googleapis.com"
+    hosts = []
+    monkeypatch.setattr(ChannelOptions, "create_channel", lambda self, host, **kwargs: hosts.append(host) or
+                        grpc.insecure_channel("localhost:1"))
+    for endpoint in (client_endpoint(client), "localhost:8443", None):
+        sut = ChannelOptions("gzip")
+        sut.spanner_api(AnonymousCredentials(), api_endpoint=endpoint)
+        sut.close()
+    assert hosts == ["us-central1-spanner.googleapis.com:443", "localhost:8443", "spanner.googleapis.com:443"]
+
+
+def test_cancel_with_job():
+    calls = []
+
+    class Call(object):
+        def __init__(self):
+            self.callbacks = []
+
+        def add_callback(self, callback):
+            self.callbacks.append(callback)
+            return True
+
+        def cancel(self):
+            calls.append("cancelled")
+
+    def run():
+        return CancelWithJob().intercept_unary_stream(lambda details, request: Call(), None, None)
+
+    def finished():
+        for callback in run().callbacks:
+            callback()
+
+    # the call finished before the job is cancelled
+    job = jobs.Job(1, "SELECT 1", lambda: (finished(), job.cancel()))
+    assert job.start().wait(5)
+    assert calls == []
+
+    job = jobs.Job(2, "SELECT 1", lambda: (run(), job.cancel()))
+    assert job.start().wait(5)
+    assert calls == ["cancelled"]
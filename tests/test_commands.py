@@ -1,5 +1,6 @@
 import pytest
-from spannercli import commands
+from spannercli import commands, queryutils
+from spannercli.table import StreamingTableRenderer
 
 
 def test_help_command():
@@ -71,3 +72,43 @@ def test_find_command():
         commands.find("BrOwSE")
     with pytest.raises(commands.CommandNotFound):
         commands.find("BROWSE")
+
+
+def test_is_command():
+    assert commands.is_command("show tables")
+    assert commands.is_command("\\fanout SELECT 1")
+    assert not commands.is_command("SELECT 1")
+    assert not commands.is_command("")
+    assert queryutils.classify("SHOW TABLES", commands.is_command) == queryutils.COMMAND
+
+
+def test_find_top_command():
+    cmd = commands.find("SHOW TOP QUERIES BY LATENCY")
+    assert type(cmd) is commands.TopQueriesCommand
+    cmd = commands.find("show top transactions")
+    assert type(cmd) is commands.TopTransactionsCommand
+    cmd = commands.find("\\top 10 rows")
+    assert type(cmd) is commands.TopCommand
+
+
+def test_top_panel_lines():
+    panels = [("Top queries", ["TEXT", "CPU"]), ("Top locks", ["KEY"])]
+    lines = commands.TopCommand.panel_lines(StreamingTableRenderer(), panels, [[["SELECT 1", 0.5]], []])
+    assert lines[:2] == ["", "Top queries"]
+    assert any("SELECT 1" in line for line in lines)
+    assert lines[-3:] == ["", "Top locks", "(no data)"]
+
+
+def test_find_longest_command():
+    cmd = commands.find("\\lookup Singers keys.csv")
+    assert type(cmd) is commands.LookupCommand
+    cmd = commands.find("\\l")
+    assert type(cmd) is commands.ListDatabaseCommand
+    cmd = commands.find("SHOW CREATE TABLE Singers")
+    assert type(cmd) is commands.ShowCreateTableCommand
+
+
+def test_split_index():
+    assert commands.split_index(["T", "1", "USING", "INDEX", "idx"]) == (["T", "1"], "idx")
+    assert commands.split_index(["T", "1", "using", "index", "idx"]) == (["T", "1"], "idx")
+    assert commands.split_index(["T", "1"]) == (["T", "1"], None)
@@ -0,0 +1,23 @@
+from spannercli import ddl
+from spannercli.completion import SQLCompleter
+
+
+def test_apply_schema_change():
+    sut = SQLCompleter()
+    sut.set_catalog({"Singers": ["SingerId", "Name"], "Albums": ["SingerId", "AlbumId"]})
+    assert sut.tables == ["Singers", "Albums"]
+    assert sut.columns == ["SingerId", "Name", "AlbumId"]
+
+    for sql in ["CREATE TABLE Songs (SongId INT64) PRIMARY KEY (SongId)",
+                "ALTER TABLE Singers ADD COLUMN Birthday DATE",
+                "ALTER TABLE Albums DROP COLUMN AlbumId",
+                "RENAME TABLE Albums TO Records",
+                "CREATE INDEX SingersByName ON Singers (Name)"]:
+        for change in ddl.parse_change(sql):
+            assert sut.apply(change)
+    assert sut.catalog == {"Singers": ["SingerId", "Name", "Birthday"], "Records": ["SingerId"], "Songs": ["SongId"]}
+    assert sut.columns == ["SingerId", "Name", "Birthday", "SongId"]
+
+    assert not sut.apply(ddl.SchemaChange(ddl.REFRESH_TABLE, "v"))
+    assert sut.apply(ddl.parse_change("DROP TABLE Songs")[0])
+    assert "Songs" not in sut.tables
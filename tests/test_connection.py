@@ -0,0 +1,77 @@
+from spannercli import connection
+
+
+class DummyPool:
+    def __init__(self):
+        self.cleared = False
+
+    def clear(self):
+        self.cleared = True
+
+
+class DummyDatabase:
+    def __init__(self, database_id):
+        self.database_id = database_id
+
+
+class DummyInstance:
+    def __init__(self, database_ids):
+        self.database_ids = database_ids
+        self.list_called = 0
+
+    def database(self, database_id, pool=None):
+        return DummyDatabase(database_id)
+
+    def list_databases(self):
+        self.list_called += 1
+        return [DummyDatabase(d) for d in self.database_ids]
+
+
+def test_lru_keeps_current():
+    sut = connection.DatabaseManager(DummyInstance([]), capacity=2, idle_timeout=60, list_ttl=60,
+                                     pool_factory=DummyPool)
+    current = sut.use("a")
+    b = sut.get("b")
+    assert sut.get("b") is b
+    sut.get("c")
+    sut.get("d")
+    # least recently used b is evicted, current database is kept
+    assert b.pool.cleared
+    assert sut.get("a") is current
+    assert not current.pool.cleared
+
+
+def test_idle_eviction():
+    sut = connection.DatabaseManager(DummyInstance([]), capacity=10, idle_timeout=0, list_ttl=60,
+                                     pool_factory=DummyPool)
+    sut.use("a")
+    b = sut.get("b")
+    sut.get("c")
+    assert b.pool.cleared
+
+
+def test_pinned():
+    sut = connection.DatabaseManager(DummyInstance([]), capacity=2, idle_timeout=60, list_ttl=60,
+                                     pool_factory=DummyPool)
+    with sut.pinned(["a", "b", "c"]):
+        conns = [sut.get(d) for d in ("a", "b", "c")]
+        other = sut.get("d")
+        # over capacity, the databases of the fan-out are kept
+        assert [c.pool.cleared for c in conns] == [False, False, False]
+        assert sut.get("a") is conns[0]
+    assert other.pool.cleared
+    # least recently used b is evicted after the fan-out
+    assert [c.pool.cleared for c in conns] == [False, True, False]
+
+
+def test_exists_with_cached_list():
+    instance = DummyInstance(["a", "b"])
+    sut = connection.DatabaseManager(instance, capacity=10, idle_timeout=60, list_ttl=60)
+    assert sut.exists("a")
+    assert sut.exists("b")
+    assert instance.list_called == 1
+    # refresh the list once for unknown database
+    assert not sut.exists("c")
+    assert instance.list_called == 2
+    instance.database_ids.append("c")
+    assert sut.exists("c")
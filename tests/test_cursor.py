@@ -0,0 +1,63 @@
+import time
+
+from spannercli import cursor
+from spannercli.fake import FakeClient
+
+
+class DummyCheckout:
+    def __init__(self):
+        self.released = False
+
+    def __exit__(self, *args):
+        self.released = True
+
+
+class DummyResultSet:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fields = []
+        self.stats = "stats"
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+def test_fetch_pages():
+    checkout = DummyCheckout()
+    sut = cursor.ResultCursor(checkout, DummyResultSet([[n] for n in range(5)]), page_size=2, idle_timeout=0)
+    assert sut.fetch() == [[0], [1]]
+    assert sut.has_more()
+    assert sut.stats is None
+    assert sut.fetch(3) == [[2], [3], [4]]
+    # exhausted by the prefetch of the next page
+    assert sut.fetch() == []
+    assert not sut.has_more()
+    assert sut.stats == "stats"
+    assert sut.fetched == 5
+    assert checkout.released
+
+
+def test_close_releases_session():
+    checkout = DummyCheckout()
+    sut = cursor.ResultCursor(checkout, DummyResultSet([[n] for n in range(5)]), page_size=2, idle_timeout=0)
+    sut.fetch()
+    sut.close()
+    assert checkout.released
+    # rows prefetched before close are still available
+    assert sut.fetch() in ([], [[2], [3]])
+    assert not sut.has_more()
+
+
+def test_close_cancels_prefetch():
+    # one row per 10 seconds, the prefetch of the second row is blocked on the stream
+    database = FakeClient(rows_per_second=0.1).create_database("instance", "db", [
+        "CREATE TABLE t (id INT64 NOT NULL) PRIMARY KEY (id)"])
+    database.run_in_transaction(lambda t: t.execute_update("INSERT INTO t VALUES (1), (2)"))
+    sut = cursor.ResultCursor.open(database, "SELECT id FROM t", page_size=1, idle_timeout=0)
+    assert sut.fetch() == [[1]]
+    time.sleep(0.1)
+    started = time.monotonic()
+    sut.close()
+    assert time.monotonic() - started < 1
+    assert sut.fetch() == []
+    assert not sut.has_more()
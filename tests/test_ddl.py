@@ -0,0 +1,56 @@
+from collections import namedtuple
+
+import pytest
+
+from spannercli import ddl
+
+Metadata = namedtuple("Metadata", ["commit_timestamps", "progress"])
+Progress = namedtuple("Progress", ["progress_percent"])
+
+
+def test_is_database_statement():
+    assert ddl.is_database_statement("CREATE DATABASE foo")
+    assert ddl.is_database_statement("/* x */ drop database foo")
+    assert not ddl.is_database_statement("CREATE TABLE foo (a INT64) PRIMARY KEY (a)")
+    assert not ddl.is_database_statement("DROP")
+
+
+def test_batch():
+    batch = ddl.DdlBatch("db")
+    assert batch.add("CREATE INDEX a ON t (a); CREATE INDEX b ON t (b)") == [
+        "CREATE INDEX a ON t (a)", "CREATE INDEX b ON t (b)"]
+    with pytest.raises(ValueError):
+        batch.add("DROP INDEX c; SELECT 1")
+    with pytest.raises(ValueError):
+        batch.add("DROP DATABASE db")
+    assert len(batch.statements) == 2
+
+
+def test_progress():
+    statements = ["CREATE INDEX a ON t (a)", "CREATE INDEX b ON t (b)", "DROP INDEX c"]
+    assert ddl.progress(statements, None) == [(s, None, False) for s in statements]
+    states = ddl.progress(statements, Metadata(["ts"], [Progress(100), Progress(42)]))
+    assert states == [(statements[0], 100, True), (statements[1], 42, False), (statements[2], None, False)]
+    assert ddl.summary(states) == "1/3 statements, 42% CREATE INDEX b ON t (b)"
+    assert ddl.summary([(s, 100, True) for s in statements]) == "3/3 statements"
+
+
+def test_parse_change():
+    assert ddl.parse_change(
+        "CREATE TABLE Singers (SingerId INT64 NOT NULL, `Name` STRING(MAX),"
+        " Info ARRAY<STRUCT<a INT64, b STRING(10)>>, CONSTRAINT fk FOREIGN KEY (Name) REFERENCES t (Name))"
+        " PRIMARY KEY (SingerId)") == [ddl.SchemaChange(ddl.CREATE_TABLE, "Singers", ("SingerId", "Name", "Info"))]
+    assert ddl.parse_change("DROP TABLE IF EXISTS t") == [ddl.SchemaChange(ddl.DROP_TABLE, "t")]
+    assert ddl.parse_change("ALTER TABLE t ADD COLUMN IF NOT EXISTS c INT64") == [
+        ddl.SchemaChange(ddl.ADD_COLUMN, "t", ("c",))]
+    assert ddl.parse_change("ALTER TABLE t DROP COLUMN c") == [ddl.SchemaChange(ddl.DROP_COLUMN, "t", ("c",))]
+    assert ddl.parse_change("ALTER TABLE `sch`.t ADD COLUMN c INT64") == [
+        ddl.SchemaChange(ddl.ADD_COLUMN, "sch.t", ("c",))]
+    assert ddl.parse_change("ALTER TABLE t ALTER COLUMN c STRING(MAX)") == [ddl.SchemaChange(ddl.NONE, "t")]
+    assert ddl.parse_change("RENAME TABLE a TO b, c TO d") == [
+        ddl.SchemaChange(ddl.RENAME_TABLE, "a", ("b",)), ddl.SchemaChange(ddl.RENAME_TABLE, "c", ("d",))]
+    assert ddl.parse_change("CREATE UNIQUE INDEX i ON t (c)") == [ddl.SchemaChange(ddl.NONE)]
+    assert ddl.parse_change("CREATE VIEW v SQL SECURITY INVOKER AS SELECT 1 AS a") == [
+        ddl.SchemaChange(ddl.REFRESH_TABLE, "v")]
+    assert ddl.parse_change("ALTER TABLE t ADD SYNONYM s") == [ddl.SchemaChange(ddl.REFRESH_TABLE, "t")]
+    assert ddl.parse_change("SOMETHING NEW") == [ddl.SchemaChange(ddl.REFRESH)]
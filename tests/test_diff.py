@@ -0,0 +1,97 @@
+import datetime
+
+import pytest
+
+from spannercli import diff
+from spannercli.schema import Schema
+
+
+def test_fingerprint():
+    assert diff.fingerprint(["a", "b"]) == "FARM_FINGERPRINT(FORMAT('%T|%T', `a`, `b`))"
+
+
+def test_range_condition():
+    assert diff.range_condition("k", None, None) == "TRUE"
+    assert diff.range_condition("k", None, 10) == "(`k` < @hi OR `k` IS NULL)"
+    assert diff.range_condition("k", 10, 20) == "`k` >= @lo AND `k` < @hi"
+    assert diff.range_condition("k", 20, None) == "`k` >= @lo"
+
+
+def test_split_points():
+    assert diff.split_points(list(range(100)) + [None], 4) == [25, 50, 75]
+    assert diff.split_points([1, 1, 1, 2], 4) == [1, 2]
+    assert diff.split_points([], 4) == []
+    ranges = diff.make_ranges([25, 50])
+    assert [(r.lo, r.hi) for r in ranges] == [(None, 25), (25, 50), (50, None)]
+    assert ranges[1].params("INT64")[0] == {"lo": 25, "hi": 50}
+
+
+def test_compare_rows():
+    source = {(1,): ["a", 1.0], (2,): ["b", float("nan")], (3,): ["c", 3.0]}
+    target = {(1,): ["a", 1.5], (2,): ["b", float("nan")], (4,): ["d", 4.0]}
+    assert diff.compare_rows(source, target, ["Name", "Score"], ("db1.T", "db2.T")) == [
+        ["changed", (1,), "Score"],
+        ["only in db1.T", (3,), ""],
+        ["only in db2.T", (4,), ""],
+    ]
+
+
+def test_compared_columns():
+    schema = Schema([
+        "CREATE TABLE A (Id INT64 NOT NULL, Name STRING(MAX), Old INT64) PRIMARY KEY (Id)",
+        "CREATE TABLE B (Id INT64 NOT NULL, Name STRING(MAX), New INT64) PRIMARY KEY (Id)",
+        "CREATE TABLE C (Code STRING(10) NOT NULL, Name STRING(MAX)) PRIMARY KEY (Code)",
+    ])
+    keys, columns, notes = diff.compared_columns(schema.table("A"), schema.table("B"))
+    assert keys == [("Id", "INT64")]
+    assert columns == ["Name"]
+    assert notes == ["not compared, only in A: Old", "not compared, only in B: New"]
+    with pytest.raises(ValueError):
+        diff.compared_columns(schema.table("A"), schema.table("C"))
+
+
+class FakeDiff(diff.TableDiff):
+    """rows of each side in memory instead of the queries"""
+
+    def sample(self, rows):
+        return [k[0] for k in self.sides[0].database]
+
+    def _rows(self, side, key_range, buckets=1, bucket=0):
+        return {k: v for k, v in side.database.items()
+                if (key_range.lo is None or k[0] >= key_range.lo) and (key_range.hi is None or k[0] < key_range.hi)
+                and hash(k) % buckets == bucket}
+
+    def hash_range(self, side, key_range):
+        rows = self._rows(side, key_range)
+        return len(rows), hash(frozenset((k, tuple(v)) for k, v in rows.items()))
+
+    def hash_buckets(self, side, key_range, buckets):
+        found = {}
+        for bucket in range(buckets):
+            rows = self._rows(side, key_range, buckets, bucket)
+            if rows:
+                found[bucket] = (len(rows), hash(frozenset((k, tuple(v)) for k, v in rows.items())))
+        return found
+
+    def read_rows(self, side, key_range, buckets=1, bucket=0):
+        return self._rows(side, key_range, buckets, bucket)
+
+
+def test_table_diff():
+    source = {(n,): [f"name{n}"] for n in range(1000)}
+    target = dict(source)
+    target[(10,)] = ["changed"]
+    del target[(500,)]
+    target[(2000,)] = ["new"]
+    table_diff = FakeDiff(diff.Side("db1.T", source, "T"), diff.Side("db2.T", target, "T"), [("Id", "INT64")],
+                          ["Name"], datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+                          row_limit=50, max_differences=100)
+    result = table_diff.run(range_count=8, workers=4, notes=["note"])
+    assert sorted(result.data) == [
+        ["changed", "10", "Name"],
+        ["only in db1.T", "500", ""],
+        ["only in db2.T", "2000", ""],
+    ]
+    message = result.meta["message"].split("\n")
+    assert message[1] == "8 ranges by Id, 3 mismatched"
+    assert message[2:] == ["db1.T: 1,000 rows", "db2.T: 1,000 rows", "3 differences", "note"]
@@ -0,0 +1,29 @@
+from google.api_core import exceptions as api_exceptions
+from google.cloud.spanner_v1 import KeyRange, KeySet
+import pytest
+
+from spannercli.fake import FakeClient
+
+
+def test_read_and_ddl():
+    client = FakeClient()
+    database = client.create_database("instance", "db", [
+        "CREATE TABLE Albums (SingerId INT64 NOT NULL, AlbumId INT64 NOT NULL, Title STRING(MAX))"
+        " PRIMARY KEY (SingerId, AlbumId)",
+        "CREATE INDEX AlbumsByTitle ON Albums (Title)",
+    ])
+    database.run_in_transaction(lambda t: t.execute_update(
+        "INSERT INTO Albums VALUES (1, 1, 'a'), (1, 2, 'b'), (2, 1, 'c')"))
+    with database.snapshot() as snapshot:
+        keyset = KeySet(keys=[[2, 1]], ranges=[KeyRange(start_closed=[1], end_closed=[1])])
+        assert sorted(snapshot.read("Albums", ["AlbumId", "Title"], keyset)) == [[1, "a"], [1, "c"], [2, "b"]]
+        assert list(snapshot.read("Albums", ["Title"], KeySet(all_=True), limit=1)) == [["a"]]
+
+    operation = database.update_ddl(["DROP TABLE Albums"])
+    assert operation.exception() is None
+    assert client.database_admin_api.get_database_ddl(database=database.name).statements == []
+    assert database.update_ddl(["ALTER TABLE Albums ADD COLUMN Year INT64"]).exception() is not None
+
+    database.drop()
+    with pytest.raises(api_exceptions.NotFound):
+        database.snapshot().execute_sql("SELECT 1")
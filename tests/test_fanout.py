@@ -0,0 +1,67 @@
+from collections import namedtuple
+
+from google.api_core import exceptions as api_exceptions
+
+from spannercli import fanout
+
+Code = namedtuple("Code", ["name"])
+Type = namedtuple("Type", ["code"])
+Field = namedtuple("Field", ["name", "type_"])
+
+
+class DummyResultSet:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.fields = [Field(c, Type(Code("INT64"))) for c in columns]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class DummySnapshot:
+    def __init__(self, result):
+        self.result = result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute_sql(self, sql, request_options=None):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class DummyDatabase:
+    def __init__(self, result):
+        self.result = result
+
+    def snapshot(self):
+        return DummySnapshot(self.result)
+
+
+def test_filter_databases():
+    assert fanout.filter_databases(["b", "a"], None) == ["a", "b"]
+    assert fanout.filter_databases(["tenant_1", "tenant_2", "admin"], "tenant_*") == ["tenant_1", "tenant_2"]
+
+
+def test_query():
+    databases = {
+        "a": DummyDatabase(DummyResultSet([[1], [2]], ["n"])),
+        "b": DummyDatabase(api_exceptions.NotFound("Table not found")),
+        "c": DummyDatabase(DummyResultSet([[3]], ["n"])),
+        "d": DummyDatabase(DummyResultSet([[4, 5]], ["n", "m"])),
+        "e": DummyDatabase(ValueError("bad value")),
+    }
+    res = fanout.query(databases, "SELECT n FROM t", workers=2)
+    assert res.header == ["database", "n"]
+    assert res.meta["types"] == ["STRING", "INT64"]
+    assert res.data == [["a", 1], ["a", 2], ["c", 3]]
+    assert res.meta["failed"] == 3
+    lines = res.meta["message"].splitlines()
+    assert lines[1].startswith("b: error")
+    assert lines[3] == "d: error, columns differ: n, m"
+    assert lines[4] == "e: error, bad value"
+    assert lines[5].startswith("5 databases, 3 rows, 3 failed")
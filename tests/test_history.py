@@ -0,0 +1,75 @@
+from prompt_toolkit.buffer import Buffer
+from prompt_toolkit.document import Document
+from prompt_toolkit.keys import Keys
+
+from spannercli import history
+
+
+def test_store_and_search(tmp_path):
+    sut = history.SQLiteHistory(str(tmp_path / "history.sqlite3"), load_size=2)
+    for text in ["SELECT 1", "SELECT 2", "UPDATE t SET a=1", "SELECT 3"]:
+        sut.store_string(text)
+    sut.record("db", 0.5, 1)
+
+    assert list(sut.load_history_strings()) == ["SELECT 3", "UPDATE t SET a=1"]
+    assert sut.count() == 4
+    found = sut.search("SELECT", limit=10)
+    assert [f[0] for f in found] == ["SELECT 3", "SELECT 2", "SELECT 1"]
+    assert found[0][2:] == ("db", 0.5, 1)
+    assert found[1][2:] == (None, None, None)
+    assert sut.search("DELETE") == []
+
+
+def test_import_file(tmp_path):
+    path = tmp_path / "history"
+    path.write_text("\n# 2020-01-01 12:34:56.789012\n+SELECT *\n+FROM t\n\n# 2020-01-02 00:00:00\n+SELECT 1\n")
+    sut = history.SQLiteHistory(str(tmp_path / "history.sqlite3"))
+    assert sut.import_file(str(path)) == 2
+    assert list(sut.load_history_strings()) == ["SELECT 1", "SELECT *\nFROM t"]
+
+
+def test_auto_suggest(tmp_path):
+    sut = history.SQLiteHistory(str(tmp_path / "history.sqlite3"))
+    sut.store_string("SELECT * FROM users")
+    buffer = Buffer(history=sut)
+    suggestion = history.AutoSuggestFromIndexedHistory().get_suggestion(buffer, Document("SELECT * F"))
+    assert suggestion.text == "ROM users"
+    assert history.AutoSuggestFromIndexedHistory().get_suggestion(buffer, Document("DELETE")) is None
+
+
+def test_search_plan(tmp_path):
+    sut = history.SQLiteHistory(str(tmp_path / "history.sqlite3"))
+    query = "SELECT * FROM Singers WHERE SingerId = "
+    for text in ["S", "SELECT 1", query + "1", query + "10"]:
+        sut.store_string(text)
+    for prefix, expected in [("", [query + "10"]), ("S", [query + "10"]), ("SELECT 1", ["SELECT 1"]),
+                             (query + "1", [query + "10"])]:
+        assert [f[0] for f in sut.search(prefix)] == expected
+        # the entries are read in the order of the id through the index, without sorting the matches
+        sql, params = history.prefix_query("text", prefix)
+        plan = " ".join(row[3] for row in sut._conn.execute(f"EXPLAIN QUERY PLAN {sql}", (*params, 1)))
+        assert "TEMP B-TREE" not in plan
+        assert prefix == "" or "USING INDEX history_prefix" in plan
+
+
+def test_history_search(tmp_path):
+    sut = history.SQLiteHistory(str(tmp_path / "history.sqlite3"))
+    for text in ["SELECT 1", "UPDATE t SET a=1", "SELECT 2", "SELECT 1"]:
+        sut.store_string(text)
+    buffer = Buffer(history=sut)
+    buffer.text = "SEL"
+    search = history.HistorySearch()
+    found = []
+    while search.previous(buffer):
+        found.append(buffer.text)
+    assert found == ["SELECT 1", "SELECT 2", "SELECT 1"]
+
+    buffer.text = "UP"
+    assert search.previous(buffer)
+    assert buffer.text == "UPDATE t SET a=1"
+
+
+def test_history_key_bindings():
+    keys = [b.keys for b in history.history_key_bindings().bindings]
+    # Ctrl-R stays the reverse incremental search
+    assert keys == [(Keys.Escape, "p")]
@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.api_core import exceptions as api_exceptions
+
+from spannercli import jobs
+from spannercli.fake import FakeClient
+
+
+def test_job_result():
+    sut = jobs.JobManager()
+    job = sut.submit("SELECT 1", lambda: sum(1 for _ in jobs.track(range(3))), background=True)
+    assert job.wait(5)
+    assert job.result == 3
+    assert job.rows == 3
+    assert job.status() == "done"
+    assert sut.get() is job
+    assert sut.get(job.job_id) is job
+    sut.remove(job)
+    assert sut.list() == []
+
+
+def test_job_cancel():
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def rows():
+        yield 1
+        started.set()
+        proceed.wait(5)
+        yield 2
+
+    sut = jobs.JobManager()
+    job = sut.submit("SELECT 1", lambda: list(jobs.track(rows())))
+    started.wait(5)
+    job.cancel()
+    proceed.set()
+    assert job.wait(5)
+    assert isinstance(job.error, jobs.JobCancelled)
+    assert job.status() == "cancelled"
+    assert job.rows == 1
+
+
+def test_checkpoint():
+    # no job on this thread
+    jobs.checkpoint()
+    assert list(jobs.track([1, 2])) == [1, 2]
+
+    job = jobs.Job(1, "SELECT 1", jobs.checkpoint)
+    job.cancel()
+    assert job.start().wait(5)
+    assert isinstance(job.error, jobs.JobCancelled)
+
+
+def test_cancel_stream():
+    # one row per 10 seconds, the stream is cancelled without waiting for the next row
+    database = FakeClient(rows_per_second=0.1).create_database("instance", "db", [
+        "CREATE TABLE t (id INT64 NOT NULL) PRIMARY KEY (id)"])
+    database.run_in_transaction(lambda t: t.execute_update("INSERT INTO t VALUES (1), (2)"))
+    started = threading.Event()
+
+    def query():
+        with database.snapshot() as snapshot:
+            for _ in jobs.track(snapshot.execute_sql("SELECT id FROM t")):
+                started.set()
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    sut = jobs.JobManager()
+    # on the thread of the job, and on a thread of an executor
+    for func in (query, lambda: executor.submit(jobs.bind(query)).result()):
+        started.clear()
+        job = sut.submit("SELECT id FROM t", func)
+        assert started.wait(5)
+        cancelled = time.monotonic()
+        job.cancel()
+        assert job.wait(5)
+        assert time.monotonic() - cancelled < 1
+        assert isinstance(job.error, api_exceptions.Cancelled)
+        assert job.status() == "cancelled"
+    executor.shutdown()
@@ -0,0 +1,96 @@
+import datetime
+from collections import namedtuple
+
+import pytest
+
+from spannercli import keyread
+from spannercli.schema import Schema
+
+Code = namedtuple("Code", ["name"])
+Type = namedtuple("Type", ["code"])
+Field = namedtuple("Field", ["name", "type_"])
+
+SCHEMA = Schema([
+    "CREATE TABLE Albums (SingerId INT64 NOT NULL, AlbumId INT64 NOT NULL, Title STRING(MAX),"
+    " Released DATE) PRIMARY KEY (SingerId, AlbumId)",
+    "CREATE INDEX AlbumsByTitle ON Albums (Title) STORING (Released)",
+])
+
+
+class DummyResultSet:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.fields = [Field(c, Type(Code("INT64"))) for c in columns]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class DummySnapshot:
+    def __init__(self, database):
+        self.database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def read(self, table, columns, keyset, index="", request_options=None):
+        self.database.reads.append((table, index, keyset))
+        rows = [[k[0], k[1]] for k in keyset.keys if k[0] in self.database.rows]
+        return DummyResultSet(rows, columns)
+
+
+class DummyDatabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.reads = []
+
+    def snapshot(self):
+        return DummySnapshot(self)
+
+
+def test_parse_key():
+    types = ["INT64", "STRING(MAX)", "DATE", "TIMESTAMP"]
+    assert keyread.parse_key(["1", "a"], types) == ([1, "a"], True)
+    values, prefix = keyread.parse_key(["1", "a", "2024-01-02", "2024-01-02T03:04:05Z"], types)
+    assert values[2] == datetime.date(2024, 1, 2)
+    assert values[3] == datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    assert not prefix
+    with pytest.raises(ValueError):
+        keyread.parse_key(["x"], types)
+    with pytest.raises(ValueError):
+        keyread.parse_key(["1", "a", "2024-01-02", "2024-01-02", "extra"], types)
+
+
+def test_key_set():
+    keyset = keyread.key_set([([1, 2], False), ([3], True)])
+    assert list(keyset.keys) == [[1, 2]]
+    assert [(r.start_closed, r.end_closed) for r in keyset.ranges] == [([3], [3])]
+
+
+def test_read_columns():
+    table = SCHEMA.table("Albums")
+    assert keyread.read_columns(SCHEMA, table) == (["INT64", "INT64"], ["SingerId", "AlbumId", "Title", "Released"])
+    assert keyread.read_columns(SCHEMA, table, "AlbumsByTitle") == (
+        ["STRING(MAX)"], ["Title", "Released", "SingerId", "AlbumId"])
+    with pytest.raises(ValueError):
+        keyread.read_columns(SCHEMA, table, "NoSuchIndex")
+
+
+def test_read_key_file(tmp_path):
+    path = tmp_path / "keys.csv"
+    path.write_text("1, 10\n\n2,\"20\"\n")
+    assert list(keyread.read_key_file(str(path))) == [["1", "10"], ["2", "20"]]
+
+
+def test_lookup():
+    database = DummyDatabase(rows={1, 3})
+    keys = ([str(n), str(n * 10)] for n in range(5))
+    result = keyread.lookup(database, "Albums", ["SingerId", "AlbumId"], keys, ["INT64", "INT64"], None,
+                            chunk_size=2, workers=2)
+    assert list(result.data) == [(1, 10), (3, 30)]
+    assert result.header == ["SingerId", "AlbumId"]
+    assert len(database.reads) == 3
+    assert result.meta["message"].startswith("5 keys in 3 reads, 2 rows")
@@ -0,0 +1,234 @@
+import contextlib
+
+import pytest
+from click.testing import CliRunner
+from google.api_core import exceptions as api_exceptions
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from spannercli import config, main, retry
+from spannercli.fake import FakeClient
+from spannercli.main import SpannerCli
+
+SCHEMA = [
+    "CREATE TABLE Singers (SingerId INT64 NOT NULL, Name STRING(MAX), Score FLOAT64) PRIMARY KEY (SingerId)",
+    "CREATE INDEX SingersByName ON Singers (Name)",
+]
+
+
+@contextlib.contextmanager
+def pipe_input():
+    # create_pipe_input of older prompt_toolkit is not a context manager
+    inp = create_pipe_input()
+    if hasattr(inp, "__enter__"):
+        with inp as entered:
+            yield entered
+    else:
+        try:
+            yield inp
+        finally:
+            inp.close()
+
+
+@pytest.fixture
+def cli(tmp_path, monkeypatch):
+    monkeypatch.setenv(config.EnvironmentVariables.HISTORY_DB, str(tmp_path / "history.sqlite3"))
+    monkeypatch.setenv(config.EnvironmentVariables.HISTORY_FILE, str(tmp_path / "history"))
+    client = FakeClient()
+    client.create_database("instance", "db", SCHEMA)
+    with pipe_input() as inp:
+        sut = SpannerCli(project=client.project, instance="instance", database="db", inp=inp, output=DummyOutput(),
+                         client=client)
+        yield sut
+        sut.connections.close()
+        sut.query_log.close()
+
+
+def test_write_and_read(cli, capsys):
+    result = cli.query("INSERT INTO Singers (SingerId, Name, Score) VALUES (1, 'Marc', 1.5), (2, 'Catalina', NULL)")
+    assert result.meta["row_count"] == 2
+    result = cli.query("SELECT SingerId, Name, Score FROM Singers ORDER BY SingerId")
+    assert list(result.data) == [(1, "Marc", 1.5), (2, "Catalina", None)]
+    assert result.meta["types"] == ["INT64", "STRING", "FLOAT64"]
+    assert result.meta["query_stats"]["rows_returned"] == 2
+
+    cli.output(result)
+    out = capsys.readouterr().out
+    assert "| Catalina" in out
+    assert "rows_returned: 2" in out
+
+
+def test_schema_commands(cli):
+    assert cli.completer.catalog["Singers"] == ["SingerId", "Name", "Score"]
+    ok, result = cli.run_command("SHOW TABLES")
+    assert ok and list(result.data) == [["Singers"]]
+    ok, result = cli.run_command("DESC Singers")
+    assert ok and result.data[0] == ["SingerId", "INT64", None, "NO"]
+
+    ok, result = cli.run_command("SHOW INDEX FROM Singers")
+    assert ok and [(r[1], r[10]) for r in result.data] == [("PRIMARY_KEY", None), ("SingersByName", "READ_WRITE")]
+
+    cli.settings.set("async_operations", "off")
+    cli.query("CREATE TABLE Albums (AlbumId INT64 NOT NULL) PRIMARY KEY (AlbumId)")
+    assert "Albums" in cli.completer.catalog
+    assert cli.schema().table("Albums") is not None
+
+    # the columns of a view are not in the DDL
+    cli.query("CREATE VIEW SingerNames SQL SECURITY INVOKER AS SELECT Name FROM Singers")
+    assert cli.completer.catalog["SingerNames"] == ["Name"]
+    ok, result = cli.run_command("DESC SingerNames")
+    assert ok and result.data == [["Name", "STRING(MAX)", None, "YES"]]
+
+
+def test_refresh_table(cli, monkeypatch):
+    assert [c.name for c in cli.table_columns("Singers")] == ["SingerId", "Name", "Score"]
+    cli.completer.set_table("Singers", [])
+
+    def get_database_ddl(**kwargs):
+        raise AssertionError("the whole schema is read")
+
+    # the columns of the table are read from INFORMATION_SCHEMA
+    monkeypatch.setattr(cli.client.database_admin_api, "get_database_ddl", get_database_ddl)
+    cli.apply_schema_changes("db", ["ALTER TABLE Singers ADD SYNONYM Performers"])
+    assert cli.completer.catalog["Singers"] == ["SingerId", "Name", "Score"]
+    cli.apply_schema_changes("db", ["CREATE VIEW Unknown SQL SECURITY INVOKER AS SELECT 1"])
+    assert "Unknown" not in cli.completer.catalog
+
+
+def test_ddl_batch_rejects_database(cli):
+    ok, _ = cli.run_command("\\ddl begin")
+    assert ok
+    with pytest.raises(ValueError, match="Cannot be batched"):
+        cli.query("DROP DATABASE db")
+    with pytest.raises(ValueError, match="Cannot be batched"):
+        cli.query("CREATE DATABASE other")
+    assert cli.ddl_batch.statements == []
+    assert list(cli.query("SELECT 1").data) == [(1,)]
+    ok, _ = cli.run_command("\\ddl abort")
+    assert ok and cli.ddl_batch is None
+
+
+def test_get(cli):
+    cli.query("INSERT INTO Singers (SingerId, Name) VALUES (1, 'Marc'), (2, 'Catalina')")
+    ok, result = cli.run_command("\\get Singers 2")
+    assert ok and list(result.data) == [(2, "Catalina", None)]
+
+
+def test_batch(cli, capsys):
+    with pytest.raises(SystemExit) as e:
+        cli.batch("INSERT INTO Singers (SingerId, Name) VALUES (1, 'Marc');"
+                  " SELECT SingerId, Name FROM Singers; SELECT * FROM NoSuchTable")
+    assert e.value.code == 1
+    captured = capsys.readouterr()
+    assert "SingerId\tName\n1\tMarc" in captured.out
+    assert "no such table" in captured.err
+
+
+def test_cell(cli, capsys):
+    cli.query(f"INSERT INTO Singers (SingerId, Name) VALUES (1, '{'x' * 500}')")
+    cli.settings.set("cell_width", "20")
+    cli.last_result = cli.query("SELECT SingerId, Name FROM Singers")
+    cli.last_result.meta["format"] = "vertical"
+    cli.output(cli.last_result)
+    assert "Name     | " + "x" * 200 + "...\n" in capsys.readouterr().out
+
+    ok, result = cli.run_command("\\cell 1 name")
+    assert ok and result.data == [["x" * 500]] and result.header == ["Name"]
+    ok, _ = cli.run_command("\\cell 2 Name")
+    assert not ok
+
+
+def test_request_options(cli):
+    database = cli.client.instance("instance").database("db")
+    cli.settings.set("priority", "LOW")
+    cli.settings.set("transaction_tag", "app=test")
+    cli.query("INSERT INTO Singers (SingerId, Name) VALUES (1, 'Marc')")
+    cli.query("SELECT * FROM Singers", page_size=None)
+    method, options, tag = database.requests[-1]
+    assert method == "execute_sql" and options.priority.name == "PRIORITY_LOW"
+    assert options.request_tag == cli.settings.request_tag
+    assert [(r[0], r[2]) for r in database.requests][-3:-1] == [("batch_update", "app=test"), ("commit", "app=test")]
+    assert database.requests[-2][1].priority.name == "PRIORITY_LOW"
+
+
+def test_timeout_and_retries(cli):
+    database = cli.client.instance("instance").database("db")
+    cli.settings.set("retry_delay", "1ms")
+    database.inject("execute_sql", api_exceptions.ServiceUnavailable("unavailable"))
+    result = cli.query("SELECT 1", page_size=None)
+    assert result.meta["retries"] == "retried 1 times, aborted 0 times."
+    assert result.meta["message"].endswith(result.meta["retries"])
+
+    database.inject("commit", api_exceptions.Aborted("aborted"))
+    with pytest.raises(retry.RetriesExhausted):
+        cli.query("@{CLI_MAX_RETRIES=0} INSERT INTO Singers (SingerId) VALUES (1)")
+    assert list(cli.query("SELECT COUNT(*) FROM Singers", page_size=None).data) == [(0,)]
+
+    database.latency = 0.05
+    with pytest.raises(api_exceptions.DeadlineExceeded):
+        cli.query("@{CLI_TIMEOUT=10ms} SELECT 1")
+    with pytest.raises(ValueError):
+        cli.query("@{CLI_PRIORITY=LOW} SELECT 1")
+
+
+def test_commands_run_as_jobs(cli, monkeypatch):
+    cli.query("INSERT INTO Singers (SingerId, Name) VALUES (1, 'Marc'), (2, 'Catalina')")
+    submitted = []
+    submit = cli.jobs.submit
+
+    def record(sql, func, background=False):
+        submitted.append(sql)
+        return submit(sql, func, background)
+
+    monkeypatch.setattr(cli.jobs, "submit", record)
+    ok, result = cli.run_command("\\fanout SELECT SingerId FROM Singers ORDER BY SingerId")
+    assert ok and list(result.data) == [["db", 1], ["db", 2]]
+    cli.read_query("SELECT SingerId FROM Singers ORDER BY SingerId", page_size=1)
+    ok, result = cli.run_command("\\more")
+    assert ok and [list(r) for r in result.data] == [[2]]
+    assert submitted == ["\\fanout SELECT SingerId FROM Singers ORDER BY SingerId", "\\more"]
+    cli.close_cursor()
+
+
+def test_main_options(monkeypatch):
+    started = {}
+
+    class Cli(object):
+        def __init__(self, **kwargs):
+            started.update(kwargs)
+
+        def run(self):
+            pass
+
+    monkeypatch.setattr(main, "SpannerCli", Cli)
+    monkeypatch.setattr(main, "is_batch", lambda _: False)
+    args = ["-p", "project", "-i", "instance", "-d", "db"]
+    result = CliRunner().invoke(main.main, args + ["--priority", "low", "--timeout", "5", "--channels", "2"])
+    assert result.exit_code == 0, result.output
+    assert (started["settings"].priority, started["settings"].timeout) == ("LOW", 5.0)
+    assert started["settings"].max_retries == config.Constants.MAX_RETRIES
+    assert started["channel_options"].channels == 2
+    assert not started["channel_options"].is_default()
+
+    result = CliRunner().invoke(main.main, args + ["--max-retries", "x"])
+    assert result.exit_code == 2
+    assert "Invalid value for '--max-retries'" in result.output
+
+
+def test_analyze_command(cli, monkeypatch, capsys):
+    cli.query("INSERT INTO Singers (SingerId, Name) VALUES (1, 'Marc'), (2, 'Catalina')")
+    read_query = cli.read_query
+    sampled = []
+
+    def sample(sql, **kwargs):
+        sampled.append(sql)
+        # the fake has no TABLESAMPLE
+        return read_query(sql.split(" TABLESAMPLE")[0], **kwargs)
+
+    monkeypatch.setattr(cli, "read_query", sample)
+    ok, result = cli.run_command("\\analyze singers")
+    assert ok
+    assert sampled == ["SELECT `SingerId` FROM `Singers` TABLESAMPLE RESERVOIR (10000 ROWS)"]
+    assert "primary key: SingerId INT64" in result.meta["message"]
+    assert cli.run_command("\\analyze Albums") == (False, None)
+    assert "Table not found: Albums" in capsys.readouterr().out
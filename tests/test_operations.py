@@ -0,0 +1,83 @@
+import threading
+from collections import namedtuple
+
+from spannercli.operations import OperationManager
+
+Metadata = namedtuple("Metadata", ["commit_timestamps", "progress"])
+Progress = namedtuple("Progress", ["progress_percent"])
+
+
+class FakeOperation(object):
+    def __init__(self, states, error=None):
+        # list of (done, metadata) returned by each poll
+        self.states = list(states)
+        self.error = error
+        self.metadata = None
+        self.cancelled = False
+
+    def done(self):
+        done, self.metadata = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        return done
+
+    def exception(self):
+        return self.error
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def test_poll():
+    manager = OperationManager(poll_interval=3600, history_size=1)
+    running = Metadata([], [Progress(50), Progress(0)])
+    finished = Metadata(["t1", "t2"], [Progress(100), Progress(100)])
+    done = []
+    ddl = manager.submit("db", ["CREATE INDEX a ON t (a)", "DROP INDEX b"],
+                         FakeOperation([(False, running), (True, finished)]), on_done=done.append)
+    failed = manager.submit("db2", ["CREATE DATABASE db2"], FakeOperation([(True, None)], error=ValueError("boom")))
+
+    assert manager.poll()
+    assert ddl.status() == "running"
+    assert ddl.percent() == 25
+    assert "[1] 25% CREATE INDEX a ON t (a) (+1)" in manager.toolbar()
+    assert failed.status() == "failed"
+    assert failed.percent() is None
+    assert [op.op_id for op in manager.pop_notifications()] == [2]
+
+    assert not manager.poll()
+    assert ddl.status() == "done"
+    assert ddl.percent() == 100
+    assert manager.toolbar() == "operations: [1] done"
+    # on_done is called by the thread taking the notifications
+    assert done == []
+    assert [op.op_id for op in manager.pop_notifications()] == [1]
+    assert done == [ddl]
+    assert manager.toolbar() is None
+    # only the latest finished operation is kept
+    assert manager.list() == [ddl]
+    manager.close()
+
+
+def test_polling_thread():
+    changed = threading.Event()
+    done = []
+    manager = OperationManager(poll_interval=0.01, history_size=10, listener=changed.set)
+    op = manager.submit("db", ["DROP INDEX a"], FakeOperation([(False, None), (True, None)]), on_done=done.append)
+    finished = []
+    while not finished:
+        assert changed.wait(5)
+        changed.clear()
+        finished = manager.pop_notifications()
+    assert finished == [op]
+    assert op.status() == "done"
+    assert done == [op]
+    manager.close()
+
+
+def test_cancel():
+    manager = OperationManager(poll_interval=3600, history_size=10)
+    operation = FakeOperation([(False, None)])
+    op = manager.submit("db", ["DROP INDEX a"], operation)
+    op.cancel()
+    assert operation.cancelled
+    assert op.status() == "cancelled"
+    manager.close()
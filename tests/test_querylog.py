@@ -0,0 +1,31 @@
+import json
+
+from spannercli import querylog
+
+
+def test_percentile():
+    assert querylog.percentile([], 50) is None
+    assert querylog.percentile([3, 1, 2], 50) == 2
+    assert querylog.percentile(list(range(1, 101)), 95) == 95
+    assert querylog.percentile([1], 95) == 1
+
+
+def test_record_and_stats(tmp_path):
+    path = tmp_path / "query.jsonl"
+    sut = querylog.QueryLog(str(path))
+    sut.record("SELECT * FROM t WHERE id = 1", "db", "query", 10.0, rows=1,
+               query_stats={'rows_scanned': 100, 'server_latency_ms': 5.0, 'cpu_time_ms': 4.0})
+    sut.record("SELECT * FROM t WHERE id = 2", "db", "query", 30.0, rows=1,
+               query_stats={'rows_scanned': 100, 'server_latency_ms': 5.0, 'cpu_time_ms': 4.0})
+    sut.record("UPDATE t SET a = 1", "db", "dml", 50.0, error=ValueError("failed"))
+    sut.close()
+
+    lines = [json.loads(n) for n in path.read_text().splitlines()]
+    assert len(lines) == 3
+    assert lines[0]["fingerprint"] == "SELECT * FROM t WHERE id = ?"
+    assert lines[0]["server_latency_ms"] == 5.0
+    assert lines[2]["error"] == "failed"
+
+    res = sut.stats()
+    assert res.data[0] == ["UPDATE t SET a = ?", 1, 1, 50.0, 50.0, 50.0, None, None]
+    assert res.data[1] == ["SELECT * FROM t WHERE id = ?", 2, 0, 10.0, 30.0, 30.0, 200, 2]
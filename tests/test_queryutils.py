@@ -50,3 +50,78 @@ def test_find_last_word():
 def test_clean():
     assert queryutils.clean(" SELECT 1 ") == "SELECT 1"
     assert queryutils.clean("SELECT 1;") == "SELECT 1"
+
+
+def test_fingerprint():
+    assert queryutils.fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'foo';") == \
+        "SELECT * FROM t WHERE id IN (?+) AND name = ?"
+    assert queryutils.fingerprint("SELECT a1, 1.5e3, -1, @p1, x.y FROM `t1` LIMIT 10") == \
+        "SELECT a1, ?, ?, @p1, x.y FROM `t1` LIMIT ?"
+    # comments, and comment characters in string
+    assert queryutils.fingerprint("SELECT b'#', \"--\" -- comment\n FROM t /* block */") == "SELECT ?, ? FROM t"
+    # sign of a number, not the operator
+    assert queryutils.fingerprint("SELECT a - 1, (-.5), 1e-5 FROM t WHERE b = -0x1F") == \
+        "SELECT a - ?, (?), ? FROM t WHERE b = ?"
+    # strings by the tokenizer, an unterminated string is kept
+    assert queryutils.fingerprint("SELECT '''it's''', 'it\\'s', 'open") == "SELECT ?, ?, 'open"
+    assert queryutils.fingerprint_id("SELECT 1") == queryutils.fingerprint_id("select 2".upper())
+
+
+def test_classify():
+    for sql, kind in [
+        ("-- comment\nUPDATE t SET a = 1 WHERE true", queryutils.DML),
+        ("/* ; */ INSERT INTO t (a) VALUES (1)", queryutils.DML),
+        ("WITH a AS (SELECT 1 AS x) INSERT INTO t (x) SELECT x FROM a", queryutils.DML),
+        ("WITH a AS (SELECT 'delete') SELECT * FROM a", queryutils.QUERY),
+        ("@{USE_ADDITIONAL_PARALLELISM=TRUE} SELECT 1", queryutils.QUERY),
+        ("(SELECT 1) UNION ALL (SELECT 2)", queryutils.QUERY),
+        ("PARTITIONED DELETE FROM t WHERE true", queryutils.PARTITIONED_DML),
+        ("create index a on t (b)", queryutils.DDL),
+        ("SHOW TABLES", queryutils.COMMAND),
+        ("\\fanout SELECT 1", queryutils.COMMAND),
+        ("", queryutils.QUERY),
+    ]:
+        assert queryutils.classify(sql, lambda text: text.upper().startswith("SHOW")) == kind, sql
+    # client commands without a backslash are unknown without the predicate
+    assert queryutils.classify("SHOW TABLES") == queryutils.QUERY
+
+
+def test_split():
+    statements = queryutils.split(
+        "SELECT ';' -- ;\n; UPDATE t SET a = '\\G' WHERE true\\G\n\\c db;\nSELECT '''a;\n''' # done")
+    assert [(s.text, s.kind, s.vertical) for s in statements] == [
+        ("SELECT ';'", queryutils.QUERY, False),
+        ("UPDATE t SET a = '\\G' WHERE true", queryutils.DML, True),
+        ("\\c db", queryutils.COMMAND, False),
+        ("SELECT '''a;\n'''", queryutils.QUERY, False),
+    ]
+    # a client command ends at `;` as a statement does, and may span lines
+    assert [s.text for s in queryutils.split("\\watch 5\nSELECT 1\nFROM t;\\bg\nSELECT 2")] == [
+        "\\watch 5\nSELECT 1\nFROM t", "\\bg\nSELECT 2"]
+    assert queryutils.split(" ;; -- nothing") == []
+    assert queryutils.parse("SELECT 'a;").text == "SELECT 'a;"
+
+
+def test_last_statement():
+    assert [t.text for t in queryutils.last_statement("SELECT 1; SEL")] == ["SEL"]
+    assert queryutils.last_statement("SELECT 1;") == []
+    assert queryutils.last_statement("SELECT 'ab") is None
+    assert queryutils.last_statement("SELECT -- ab") is None
+
+
+def test_parameterize():
+    assert queryutils.parameterize("SELECT * FROM t WHERE id = 1 AND name LIKE 'a%' ORDER BY 1 LIMIT 10") == \
+        ("SELECT * FROM t WHERE id = @p1 AND name LIKE @p2 ORDER BY 1 LIMIT @p3", [1, "a%", 10])
+    assert queryutils.parameterize("SELECT 'x', 2 FROM t WHERE a >= -1.5 AND b='it\\'s' AND d = 0x1F -- e = 3") == \
+        ("SELECT 'x', 2 FROM t WHERE a >= @p1 AND b=@p2 AND d = @p3 -- e = 3", [-1.5, "it's", 31])
+    assert queryutils.parameterize("SELECT * FROM t WHERE c = r'\\d' AND e = b'x'") == \
+        ("SELECT * FROM t WHERE c = r'\\d' AND e = b'x'", [])
+
+
+def test_client_hints():
+    assert queryutils.client_hints("@{CLI_TIMEOUT=5s, USE_ADDITIONAL_PARALLELISM=TRUE} SELECT 1") == \
+        ("@{USE_ADDITIONAL_PARALLELISM=TRUE} SELECT 1", {"timeout": "5s"})
+    assert queryutils.client_hints("-- job\n@{cli_max_retries = 0} UPDATE t SET a = 1 WHERE TRUE") == \
+        ("-- job\nUPDATE t SET a = 1 WHERE TRUE", {"max_retries": "0"})
+    for sql in ("SELECT 1", "@{FORCE_INDEX=_BASE_TABLE} SELECT 1", "SELECT '@{CLI_TIMEOUT=1}'"):
+        assert queryutils.client_hints(sql) == (sql, {})
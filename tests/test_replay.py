@@ -0,0 +1,94 @@
+import json
+import sqlite3
+
+import pytest
+
+from spannercli import replay
+from spannercli.fake import FakeClient
+
+SCHEMA = [
+    "CREATE TABLE Singers (SingerId INT64 NOT NULL, Name STRING(MAX)) PRIMARY KEY (SingerId)",
+]
+
+
+def test_load_query_log(tmp_path):
+    path = tmp_path / "query.jsonl"
+    entries = [
+        {"timestamp": "2024-01-01T00:00:01+00:00", "query": "SELECT 1", "client_latency_ms": 5.0, "error": None},
+        {"timestamp": "2024-01-01T00:00:00+00:00", "query": "SELECT * FROM t WHERE id = 1", "client_latency_ms": 10.0,
+         "error": None},
+        {"timestamp": "2024-01-01T00:00:02+00:00", "query": "SELECT x", "client_latency_ms": 1.0, "error": "boom"},
+    ]
+    path.write_text("".join(json.dumps(e) + "\n" for e in entries))
+    records = replay.load(str(path))
+    assert [r.text for r in records] == ["SELECT * FROM t WHERE id = 1", "SELECT 1", "SELECT x"]
+    assert [r.latency_ms for r in records] == [10.0, 5.0, None]
+    assert records[1].created - records[0].created == 1.0
+
+
+def test_load_history(tmp_path):
+    path = tmp_path / "history.sqlite3"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE history (id INTEGER PRIMARY KEY, text TEXT, created REAL, database TEXT,"
+                 " duration REAL, rows INTEGER)")
+    conn.executemany("INSERT INTO history (text, created, duration) VALUES (?, ?, ?)",
+                     [("SELECT 1", 1.0, 0.25), ("SELECT 2; SELECT 3", 2.0, 0.5), ("\\tables", 3.0, None)])
+    conn.commit()
+    conn.close()
+    records = replay.load(str(path))
+    assert [(r.text, r.latency_ms) for r in records] == [
+        ("SELECT 1", 250.0), ("SELECT 2", None), ("SELECT 3", None), ("\\tables", None)]
+
+    path = tmp_path / "history"
+    path.write_text("\n# 2024-01-01 00:00:00.000000\n+SELECT 1\n")
+    assert [r.text for r in replay.load(str(path))] == ["SELECT 1"]
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_paced_replay():
+    clock = FakeClock()
+    executed = []
+
+    def execute(database, record):
+        executed.append(record.text)
+        clock.now += 0.5
+
+    records = [replay.Record("SELECT 1", "query", 100.0, 400.0), replay.Record("SELECT 2", "query", 102.0, 400.0),
+               replay.Record("INSERT INTO t (a) VALUES (1)", "dml", 103.0),
+               replay.Record("CREATE TABLE t (a INT64) PRIMARY KEY (a)", "ddl", 104.0)]
+    sut = replay.Replay(None, records, mode=replay.PACED, skip_dml=True, speed=2.0, execute_func=execute,
+                        clock=clock, sleep=clock.sleep)
+    result = sut.run()
+    assert executed == ["SELECT 1", "SELECT 2"]
+    assert clock.sleeps == [0.5]
+    assert result.data == [["SELECT ?", 2, 0, 400.0, 500.0, 100.0, "+25%"]]
+    assert result.meta["message"].split("\n")[1] == "skipped 2 statements"
+
+    with pytest.raises(ValueError):
+        replay.Replay(None, records, mode="slow")
+
+
+def test_replay_fake():
+    client = FakeClient()
+    database = client.create_database("instance", "db", SCHEMA)
+    records = [replay.Record(f"INSERT INTO Singers (SingerId, Name) VALUES ({n}, 'n{n}')", "dml", n, 1.0)
+               for n in range(10)]
+    records += [replay.Record("SELECT * FROM Singers", "query", 10, 1.0),
+                replay.Record("SELECT * FROM Nope", "query", 11)]
+    result = replay.Replay(database, records, concurrency=4).run()
+    assert sum(d[1] for d in result.data) == 12
+    assert sum(d[2] for d in result.data) == 1
+    with database.snapshot() as snapshot:
+        assert list(snapshot.execute_sql("SELECT COUNT(*) FROM Singers")) == [[10]]
@@ -0,0 +1,59 @@
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from spannercli import fake, retry
+from spannercli.fake import FakeClient
+
+SCHEMA = [
+    "CREATE TABLE Singers (SingerId INT64 NOT NULL, Name STRING(MAX)) PRIMARY KEY (SingerId)",
+]
+
+
+@pytest.fixture
+def database():
+    return FakeClient().create_database("instance", "db", SCHEMA)
+
+
+def update(transaction):
+    return transaction.execute_update("UPDATE Singers SET Name = 'Marc' WHERE TRUE")
+
+
+def test_delay():
+    sut = retry.RetryPolicy(retry_delay=1.0)
+    assert sut.delay(1) == 1.0
+    assert sut.delay(2) == pytest.approx(1.3)
+    assert sut.delay(100) == 32.0
+
+
+@pytest.mark.parametrize("library_retry_delay", [True, False])
+def test_aborted_transaction(database, monkeypatch, library_retry_delay):
+    # older client libraries pass default_retry_delay to the function and wait their own delay, which is not replaced
+    if not library_retry_delay:
+        monkeypatch.setattr(fake, "TRANSACTION_OPTIONS",
+                            tuple(o for o in fake.TRANSACTION_OPTIONS if o != "default_retry_delay"))
+    sleeps = []
+    sut = retry.RetryPolicy(max_retries=2, retry_delay=1.0, sleep=sleeps.append)
+    database.inject("commit", api_exceptions.Aborted("aborted"), times=2)
+    assert sut.run_in_transaction(database, update) == 0
+    assert sleeps == ([1.0, pytest.approx(1.3)] if library_retry_delay else [])
+    assert sut.summary() == "retried 0 times, aborted 2 times."
+
+    sut = retry.RetryPolicy(max_retries=1, sleep=sleeps.append)
+    database.inject("commit", api_exceptions.Aborted("aborted"), times=2)
+    with pytest.raises(retry.RetriesExhausted):
+        sut.run_in_transaction(database, update)
+    assert sut.aborts == 2
+
+
+def test_unavailable(database):
+    sut = retry.RetryPolicy(max_retries=1, retry_delay=0.001)
+    database.inject("execute_sql", api_exceptions.ServiceUnavailable("unavailable"))
+    with database.snapshot() as snapshot:
+        assert list(snapshot.execute_sql("SELECT 1", **sut.call_options())) == [[1]]
+    assert sut.retries == 1
+
+    database.inject("execute_sql", api_exceptions.ServiceUnavailable("unavailable"), times=2)
+    with pytest.raises(api_exceptions.ServiceUnavailable):
+        with database.snapshot() as snapshot:
+            snapshot.execute_sql("SELECT 1", **sut.call_options())
+    assert sut.summary() == "retried 1 times, aborted 0 times."
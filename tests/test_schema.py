@@ -0,0 +1,96 @@
+from spannercli import advisor
+from spannercli.schema import Schema, split_name
+
+STATEMENTS = [
+    """CREATE TABLE Singers (
+  SingerId INT64 NOT NULL,
+  Name STRING(MAX) DEFAULT ('unknown'),
+  Tags ARRAY<STRUCT<Name STRING(64), Score INT64>>,
+) PRIMARY KEY (SingerId DESC)""",
+    "CREATE TABLE Albums (SingerId INT64 NOT NULL, AlbumId INT64 NOT NULL, Title STRING(MAX),"
+    " CONSTRAINT FK_Title FOREIGN KEY (Title) REFERENCES Titles (Title))"
+    " PRIMARY KEY (SingerId, AlbumId), INTERLEAVE IN PARENT Singers ON DELETE CASCADE",
+    "CREATE TABLE Songs (SingerId INT64 NOT NULL, AlbumId INT64 NOT NULL, SongId INT64 NOT NULL)"
+    " PRIMARY KEY (SingerId, AlbumId, SongId), INTERLEAVE IN PARENT Albums",
+    "CREATE TABLE Titles (Title STRING(MAX) NOT NULL) PRIMARY KEY (Title)",
+    "CREATE UNIQUE NULL_FILTERED INDEX AlbumsByTitle ON Albums (Title DESC) STORING (AlbumId),"
+    " INTERLEAVE IN Singers",
+    "CREATE VIEW SingerNames SQL SECURITY INVOKER AS SELECT Name FROM Singers",
+    "ALTER TABLE Songs ADD CONSTRAINT FK_Album FOREIGN KEY (SingerId, AlbumId) REFERENCES Albums (SingerId, AlbumId)",
+]
+
+
+def test_tables():
+    schema = Schema(STATEMENTS)
+    assert schema.show_tables() == [["Singers"], ["Albums"], ["Songs"], ["Titles"], ["SingerNames"]]
+    singers = schema.table("singers")
+    assert singers.primary_key == [("SingerId", "DESC")]
+    assert schema.describe(singers) == [
+        ["SingerId", "INT64", None, "NO"],
+        ["Name", "STRING(MAX)", "'unknown'", "YES"],
+        ["Tags", "ARRAY<STRUCT<Name STRING(64), Score INT64>>", None, "YES"],
+    ]
+    albums = schema.table("Albums")
+    assert (albums.parent, albums.on_delete) == ("Singers", "CASCADE")
+    assert [(f.name, f.columns, f.referenced_table) for f in albums.foreign_keys] == [("FK_Title", ["Title"], "Titles")]
+    assert list(albums.columns) == ["SingerId", "AlbumId", "Title"]
+    songs = schema.table("Songs")
+    assert [(f.name, f.referenced_columns) for f in songs.foreign_keys] == [("FK_Album", ["SingerId", "AlbumId"])]
+    assert schema.table("SingerNames").view
+    assert schema.table("Unknown") is None
+
+
+def test_show_index():
+    schema = Schema(STATEMENTS)
+    rows = schema.show_index(schema.table("Albums"))
+    assert [r[1:4] + [r[6]] for r in rows] == [
+        ["AlbumsByTitle", "INDEX", "Title", "DESC"],
+        ["AlbumsByTitle", "INDEX", "AlbumId", None],
+        ["PRIMARY_KEY", "PRIMARY_KEY", "SingerId", "ASC"],
+        ["PRIMARY_KEY", "PRIMARY_KEY", "AlbumId", "ASC"],
+    ]
+    assert rows[0][7:] == ["Singers", True, True, None]
+    rows = schema.show_index(schema.table("Albums"), {("Albums", "AlbumsByTitle"): "WRITE_ONLY"})
+    assert [r[10] for r in rows] == ["WRITE_ONLY", "WRITE_ONLY", None, None]
+    assert len(schema.show_index()) == 1 + 4 + 3 + 1
+
+    indexes = advisor.parse_indexes(schema.index_columns())
+    assert indexes["Albums"]["AlbumsByTitle"].columns == ["Title"]
+    assert indexes["Albums"]["AlbumsByTitle"].storing == ["AlbumId"]
+    assert indexes["Albums"]["PRIMARY_KEY"].columns == ["SingerId", "AlbumId"]
+
+
+def test_show_create_table():
+    schema = Schema(STATEMENTS)
+    assert schema.show_create_table(schema.table("Albums")) == STATEMENTS[1] + ";\n\n" + STATEMENTS[4] + ";"
+
+
+def test_interleave_tree():
+    schema = Schema(STATEMENTS)
+    assert schema.interleave_tree() == [
+        "Singers",
+        "└── Albums (ON DELETE CASCADE)",
+        "    └── Songs",
+        "Titles",
+    ]
+    assert schema.catalog()["Songs"] == ["SingerId", "AlbumId", "SongId"]
+
+
+def test_named_schema():
+    schema = Schema([
+        "CREATE SCHEMA sch",
+        "CREATE TABLE sch.Singers (SingerId INT64 NOT NULL) PRIMARY KEY (SingerId)",
+        "CREATE TABLE `sch`.`Albums` (SingerId INT64 NOT NULL, AlbumId INT64 NOT NULL)"
+        " PRIMARY KEY (SingerId, AlbumId), INTERLEAVE IN PARENT sch.Singers",
+        "CREATE INDEX sch.AlbumsById ON sch.Albums (AlbumId)",
+        "CREATE VIEW sch.SingerIds SQL SECURITY INVOKER AS SELECT SingerId FROM sch.Singers",
+    ])
+    assert schema.show_tables() == [["sch.Singers"], ["sch.Albums"], ["sch.SingerIds"]]
+    albums = schema.table("sch.albums")
+    assert list(albums.columns) == ["SingerId", "AlbumId"]
+    assert albums.parent == "sch.Singers"
+    assert schema.indexes["sch.AlbumsById"].table == "sch.Albums"
+    assert schema.table("sch.SingerIds").view
+    assert schema.interleave_tree() == ["sch.Singers", "└── sch.Albums"]
+    assert split_name("sch.Albums") == ("sch", "Albums")
+    assert split_name("Albums") == ("", "Albums")
@@ -0,0 +1,48 @@
+import pytest
+
+from spannercli.settings import Settings
+
+
+def test_settings():
+    settings = Settings()
+    assert settings.scan_guard is False
+    assert settings.set("SCAN_GUARD", "on") is True
+    assert settings.scan_guard is True
+    assert settings.set("scan_guard_bytes", "100") == 100
+    with pytest.raises(ValueError):
+        settings.set("scan_guard", "maybe")
+    with pytest.raises(ValueError):
+        settings.set("scan_guard_bytes", "0")
+    with pytest.raises(KeyError):
+        settings.set("unknown", "1")
+    with pytest.raises(AttributeError):
+        _ = settings.unknown
+
+
+def test_priority_and_tags():
+    settings = Settings()
+    assert settings.priority == "UNSPECIFIED"
+    assert settings.request_tag.startswith("app=spanner-cli,user=")
+    assert settings.set("priority", "low") == "LOW"
+    assert settings.set("request_tag", "off") == ""
+    assert settings.set("transaction_tag", "app=batch") == "app=batch"
+    with pytest.raises(ValueError):
+        settings.set("priority", "urgent")
+    with pytest.raises(ValueError):
+        settings.set("request_tag", "x" * 51)
+
+
+def test_retry_settings():
+    settings = Settings()
+    assert settings.timeout is None
+    assert settings.set("timeout", "30") == 30.0
+    assert settings.set("timeout", "500ms") == 0.5
+    assert settings.set("timeout", "1.5s") == 1.5
+    assert settings.set("timeout", "off") is None
+    assert settings.set("max_retries", "0") == 0
+    with pytest.raises(ValueError):
+        settings.set("max_retries", "-1")
+    with pytest.raises(ValueError):
+        settings.set("retry_delay", "off")
+    with pytest.raises(ValueError):
+        settings.set("timeout", "soon")
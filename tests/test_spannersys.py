@@ -0,0 +1,16 @@
+from spannercli import spannersys
+
+
+def test_top_queries_sql():
+    sql = spannersys.top_queries_sql("LATENCY", limit="5")
+    assert "FROM SPANNER_SYS.QUERY_STATS_TOP_MINUTE WHERE INTERVAL_END = (SELECT MAX(INTERVAL_END)" in sql
+    assert sql.endswith("ORDER BY AVG_LATENCY_SECONDS DESC LIMIT 5")
+
+
+def test_dashboard_sql():
+    sql, panels = spannersys.dashboard_sql("ROWS")
+    assert sql.startswith("SELECT ARRAY(SELECT AS STRUCT TEXT_FINGERPRINT, ")
+    assert sql.count("ARRAY(SELECT AS STRUCT") == 3
+    assert sql.count("LIMIT @limit") == 3
+    assert [p[0] for p in panels] == ["Top queries by ROWS", "Top transactions by aborts", "Hottest lock keys"]
+    assert panels[2][1] == ["ROW_RANGE_START_KEY", "LOCK_WAIT_SECONDS", "SAMPLE_LOCK_REQUESTS"]
@@ -0,0 +1,57 @@
+from collections import namedtuple
+
+import pytest
+
+from spannercli import structures
+from spannercli.table import StreamingTableRenderer
+
+Code = namedtuple("Code", ["name"])
+Type = namedtuple("Type", ["code"])
+Field = namedtuple("Field", ["name", "type_"])
+
+
+def fields(*columns):
+    return [Field(name, Type(Code(type_name))) for name, type_name in columns]
+
+
+def test_columnar_result_container():
+    rows = [
+        [1, 1.5, True, "foo", b"YWJj", "2020-01-01"],
+        [None, None, None, None, None, None],
+        [-100, 2.0, False, "ほげ", b"", "2020-01-02"],
+    ]
+    sut = structures.ColumnarResultContainer.from_rows(
+        rows, fields(("i", "INT64"), ("f", "FLOAT64"), ("b", "BOOL"), ("s", "STRING"), ("y", "BYTES"),
+                     ("d", "DATE")), message="done")
+    assert len(sut) == 3
+    assert sut.header == ["i", "f", "b", "s", "y", "d"]
+    assert sut.meta["types"] == ["INT64", "FLOAT64", "BOOL", "STRING", "BYTES", "DATE"]
+    assert [list(r) for r in sut.data] == rows
+    assert sut.data[2] == rows[2]
+    assert sut.data[-1] == rows[2]
+    assert sut.data[1:] == rows[1:]
+    assert list(sut.columns[0]) == [1, None, -100]
+    # width of non ascii string is unknown without formatting
+    assert sut.column_widths() == [6, 6, 6, None, 6, None]
+    with pytest.raises(TypeError):
+        structures.NullableColumn()  # pylint: disable=abstract-class-instantiated
+
+
+def test_columnar_render_same_as_rows():
+    rows = [[n, "x" * n, n % 2 == 0] for n in range(10)]
+    header = ["n", "s", "b"]
+    sut = structures.ColumnarResultContainer.from_rows(rows, fields(("n", "INT64"), ("s", "STRING"), ("b", "BOOL")))
+    renderer = StreamingTableRenderer()
+    assert list(renderer.render(sut.data, sut.header, widths=sut.column_widths())) == list(
+        renderer.render(rows, header))
+
+
+def test_binary_column_width():
+    renderer = StreamingTableRenderer()
+    # b"\x00\x01" is displayed as 0x0001, wider than the value
+    for values, width in (([b"ab", b"abcd"], 4), ([b"ab", b"\x00\x01"], None), ([b"a\tb"], None)):
+        rows = [[v] for v in values]
+        sut = structures.ColumnarResultContainer.from_rows(rows, fields(("y", "BYTES")))
+        assert sut.column_widths() == [width]
+        assert list(renderer.render(sut.data, sut.header, widths=sut.column_widths())) == list(
+            renderer.render(rows, ["y"]))
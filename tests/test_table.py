@@ -0,0 +1,65 @@
+from cli_helpers import tabular_output
+from google.cloud.spanner_v1 import JsonObject
+
+from spannercli import table
+
+
+def test_render_same_as_tabular_output():
+    data = [[1, "abc"], [None, "x"], [True, "あいう"]]
+    header = ["a", "bcd"]
+    expected = tabular_output.TabularOutputFormatter('ascii').format_output(
+        data, header, dialect='unix', disable_numparse=True, preserve_whitespace=True, column_types=str)
+    sut = table.StreamingTableRenderer()
+    assert list(sut.render(data, header)) == list(expected)
+
+
+def test_render_truncate_unsampled_rows():
+    rows = iter([["a"], ["b"], ["long value"]])
+    sut = table.StreamingTableRenderer(sample_size=2)
+    lines = list(sut.render(rows, ["col1"], ["STRING"]))
+    assert lines[0] == "+------+"
+    assert lines[-2] == "| l... |"
+
+
+def test_render_type_hint_width():
+    rows = iter([[1], [2], [12345678901]])
+    sut = table.StreamingTableRenderer(sample_size=2)
+    lines = list(sut.render(rows, ["n"], ["INT64"]))
+    assert "| 12345678901          |" in lines
+
+
+def test_render_wrap():
+    sut = table.StreamingTableRenderer(max_width=4, overflow="wrap")
+    lines = list(sut.render([["abcdefghij"]], ["c"]))
+    assert lines[3:6] == ["| abcd |", "| efgh |", "| ij   |"]
+
+
+def test_truncate():
+    assert table.truncate("abc", 3) == "abc"
+    assert table.truncate("abcdef", 5) == "ab..."
+    assert table.truncate("あいうえお", 7) == "あい..."
+
+
+def test_preview():
+    assert table.preview("abcdef", 4) == "abcd..."
+    assert table.preview("abc", 4) == "abc"
+    assert table.preview(None, 10) == table.NULL
+    assert table.preview(b"abc", 10) == "abc"
+    assert table.preview(b"\x00\x01" * 1000, 6) == "0x0001..."
+    assert table.preview(["a", None, [1, 2]], 100) == str(["a", None, [1, 2]])
+    assert table.preview(list(range(10 ** 6)), 10) == "[0, 1, 2, ..."
+    assert table.preview(JsonObject({"b": [1] * 10 ** 5, "a": "x"}), 12) == '{"a":"x","b"...'
+    assert table.preview(JsonObject(), 10) == "null"
+    assert table.full_text([1], "JSON") == "[\n  1\n]"
+    if getattr(JsonObject(), "_is_array", None) is not None:
+        # arrays of JsonObject are available in newer client libraries
+        assert table.full_text(JsonObject([1]), "JSON") == "[\n  1\n]"
+
+
+def test_render_cuts_large_cells():
+    sut = table.StreamingTableRenderer(max_width=5)
+    lines = list(sut.render([[b"\xff" * 10 ** 6, "x\n" * 100]], ["b", "s"], ["BYTES", "STRING"]))
+    assert lines[3] == "| 0x... | x   |"
+    # 5 * TABLE_CELL_MAX_LINES characters of the string, 2 characters a line
+    assert lines[-2] == "|       | ... |"
+    assert len(lines) == 4 + 25 + 1
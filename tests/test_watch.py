@@ -0,0 +1,62 @@
+from spannercli import watch
+from spannercli.fake import FakeClient
+
+SCHEMA = [
+    "CREATE TABLE Counters (Name STRING(MAX) NOT NULL, Value INT64) PRIMARY KEY (Name)",
+]
+
+
+def test_delta_renderer():
+    sut = watch.DeltaRenderer(max_width=10)
+    lines = sut.table(["Name", "Value"], [["a", 1], ["b", 2]], height=20)
+    assert lines[1] == "| Name | Value |"
+    out, written = sut.update(lines)
+    assert out.startswith(watch.CLEAR_SCREEN) and written == 6
+
+    lines = sut.table(["Name", "Value"], [["a", 1], ["b", 3]], height=20)
+    assert lines[3] == "| a    | 1     |"
+    assert lines[4] == "| b    | " + watch.HIGHLIGHT.format("3    ") + " |"
+    out, written = sut.update(lines)
+    assert written == 1
+    assert out == watch.move_to(4) + lines[4] + watch.CLEAR_LINE + watch.move_to(6)
+
+    # a shorter table clears the rest of the screen, the widths only grow
+    lines = sut.table(["Name", "Value"], [["a", 1]], height=20)
+    out, written = sut.update(lines)
+    assert written == 1
+    assert out == watch.move_to(4) + lines[4] + watch.CLEAR_LINE + watch.move_to(5) + watch.CLEAR_BELOW \
+        + watch.move_to(5)
+
+    lines = sut.table(["Name", "Value"], [[str(n), n] for n in range(10)], height=8)
+    assert len(lines) == 8 and lines[-1] == "7 more rows"
+
+
+def test_watch():
+    client = FakeClient()
+    database = client.create_database("instance", "db", SCHEMA)
+    database.update("INSERT INTO Counters (Name, Value) VALUES ('a', 1), ('b', 2)")
+    sut = watch.Watch(database, "SELECT Name, Value FROM Counters WHERE Value > 0 ORDER BY Name", 1.0,
+                      max_width=20, terminal_height=lambda: 24)
+    assert sut.sql == "SELECT Name, Value FROM Counters WHERE Value > @p1 ORDER BY Name"
+    assert sut.params == {"p1": 0}
+    out = sut.refresh()
+    assert out.startswith(watch.CLEAR_SCREEN) and "| b    | 2     |" in out
+
+    database.update("UPDATE Counters SET Value = 5 WHERE Name = 'b'")
+    out = sut.refresh()
+    # the status lines and the changed row
+    assert out.count(watch.CLEAR_LINE) == 3
+    assert watch.HIGHLIGHT.format("5    ") in out
+    assert "terminal: " in out
+
+    writes = []
+
+    def sleep(seconds):
+        raise KeyboardInterrupt
+
+    try:
+        sut.run(writes.append, sleep)
+    except KeyboardInterrupt:
+        pass
+    assert writes[0] == watch.HIDE_CURSOR and writes[-1].startswith(watch.SHOW_CURSOR)
+    assert sut.session is None